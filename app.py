@@ -4,106 +4,244 @@ import pandas as pd
 import altair as alt
 from pathlib import Path
 import calendar
-import datetime
+import time
+
+from data_loader import data_version, load_hourly, load_quarter_hourly
+from spread_engine import monthly_average_spread
+from scatter_binning import DEFAULT_BINS, RAW_POINT_LIMIT, bin_scatter, chart_payload_bytes, density_sample
+from capture_prices import CAPTURE_COLUMNS, capture_prices_from_sums
+from merit_order import curve_for, fit_curves
+from olap_cube import DAY_TYPES, load_cube, slice_cube
+from time_index import TimeIndex
+from monthly_aggregates import (AGGREGATES_FILE, load_current_aggregates,
+                                market_stats_from_aggregates, sufficient_statistics)
 
 # Config
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
+QUARTER_HOURLY_FILE = Path("quarter_hourly_german_residual_load_and_prices_2024_present.csv")
 
 st.set_page_config(page_title="Energy Charts Dashboard", layout="wide")
 
-@st.cache_data
-def load_data():
+def load_data(quarter_hourly=False):
+    if quarter_hourly:
+        return load_quarter_hourly(QUARTER_HOURLY_FILE) if QUARTER_HOURLY_FILE.exists() else None
     if not INPUT_FILE.exists():
         return None
-    df = pd.read_csv(INPUT_FILE)
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['year'] = df['datetime'].dt.year
-    df['month'] = df['datetime'].dt.month
-    df['date'] = df['datetime'].dt.date
-    return df
-
-def calculate_monthly_stats(df):
+    return load_hourly(INPUT_FILE)
+
+def load_aggregates(df, quarter_hourly=False):
+    # Materialized monthly table kept up to date by the fetch script;
+    # if it lags the CSV (or for 15-minute data), compute the same statistics
+    table = None if quarter_hourly else load_current_aggregates(INPUT_FILE)
+    if table is None:
+        table = sufficient_statistics(df)
+    return table
+
+def current_version(quarter_hourly=False):
+    # Size and mtime of the files the data products are derived from
+    if quarter_hourly:
+        return (data_version(QUARTER_HOURLY_FILE),)
+    return (data_version(INPUT_FILE), data_version(AGGREGATES_FILE))
+
+def calculate_monthly_stats(df, aggregates):
     # Reusing logic from monthly_stats.py
     
-    def daily_spread(g):
-        sorted_prices = g['day_ahead_price_eur_mwh'].sort_values()
-        if len(sorted_prices) < 8: return None
-        return sorted_prices.iloc[-4:].mean() - sorted_prices.iloc[:4].mean()
-
-    # Daily Spreads
-    daily_spreads = df.groupby(['year', 'month', 'date']).apply(lambda x: daily_spread(x)).reset_index(name='spread')
-    monthly_spread = daily_spreads.groupby(['year', 'month'])['spread'].mean().reset_index(name='avg_spread')
+    # Daily Spreads (top 4 - bottom 4), averaged per month
+    monthly_spread = monthly_average_spread(df, n=4)
     
     # Monthly Aggregates
-    def monthly_agg(g):
-        avg_price = g['day_ahead_price_eur_mwh'].mean()
-        neg_hours = (g['day_ahead_price_eur_mwh'] < 0).sum()
-        res_neg_price = g[g['residual_load_mw_avg'] < 0]['day_ahead_price_eur_mwh'].mean()
-        res_high_price = g[g['residual_load_mw_avg'] > 60000]['day_ahead_price_eur_mwh'].mean()
-        return pd.Series({
-            'avg_price': avg_price,
-            'neg_hours': neg_hours,
-            'avg_price_res_neg': res_neg_price,
-            'avg_price_res_high': res_high_price
-        })
-
-    monthly_stats = df.groupby(['year', 'month']).apply(monthly_agg).reset_index()
+    monthly_stats = market_stats_from_aggregates(aggregates)
     merged = pd.merge(monthly_stats, monthly_spread, on=['year', 'month'])
     return merged
 
-def calculate_capture_prices(df):
+def calculate_capture_prices(aggregates):
     # Reusing logic from solar_capture_prices.py
-    df = df.copy()
-    df['solar_revenue'] = df['solar_mw_avg'] * df['day_ahead_price_eur_mwh']
-    
-    # Positive Price Logic
-    df_pos = df[df['day_ahead_price_eur_mwh'] >= 0].copy()
-    
-    monthly_grouped = df.groupby(['year', 'month']).agg({
-        'solar_mw_avg': 'sum',
-        'solar_revenue': 'sum',
-        'day_ahead_price_eur_mwh': 'mean'
-    }).reset_index()
-    
-    monthly_pos = df_pos.groupby(['year', 'month']).agg({
-        'solar_mw_avg': 'sum',
-        'solar_revenue': 'sum'
-    }).reset_index().rename(columns={'solar_mw_avg': 'solar_mw_pos', 'solar_revenue': 'solar_rev_pos'})
-    
-    merged = pd.merge(monthly_grouped, monthly_pos, on=['year', 'month'], how='left')
-    
-    merged['pv_price'] = merged['solar_revenue'] / merged['solar_mw_avg']
-    merged['pv_price_pos'] = merged['solar_rev_pos'] / merged['solar_mw_pos']
-    merged['baseload_price'] = merged['day_ahead_price_eur_mwh']
-    merged['capture_rate'] = merged['pv_price'] / merged['baseload_price']
-    
-    return merged
+    return capture_prices_from_sums(aggregates, by=['year', 'month'])
+
+@st.cache_resource(show_spinner="Loading data...", max_entries=2)
+def load_frame(quarter_hourly, version):
+    """
+    Loads the dataset and indexes it by month. Cached per data version
+    (passed in only as the cache key) as a shared resource: reruns and
+    sessions get the same objects without copying, so callers must never
+    modify the frame or the slices the time index returns. Returns None if
+    the data file is missing.
+    """
+    timings = {}
+    started = time.perf_counter()
+    df = load_data(quarter_hourly)
+    timings['load data'] = time.perf_counter() - started
+    if df is None:
+        return None
+
+    started = time.perf_counter()
+    time_index = TimeIndex(df)
+    timings['time index'] = time.perf_counter() - started
+    return {'df': df, 'time_index': time_index, 'timings': timings}
+
+@st.cache_data(show_spinner="Preparing data...")
+def load_products(quarter_hourly, version):
+    """
+    Derives every table the tabs show from the loaded dataset. Cached per
+    data version, so widget reruns just filter and render; the tables are
+    small, so handing each rerun its own copy is cheap. Returns None if the
+    data file is missing.
+    """
+    frame = load_frame(quarter_hourly, version)
+    if frame is None:
+        return None
+    df = frame['df']
+    timings = {}
+
+    started = time.perf_counter()
+    aggregates = load_aggregates(df, quarter_hourly)
+    timings['monthly aggregates'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    monthly_stats = calculate_monthly_stats(df, aggregates)
+    monthly_stats['month_name'] = monthly_stats['month'].apply(lambda x: calendar.month_abbr[x])
+    timings['monthly statistics'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    capture_monthly = calculate_capture_prices(aggregates)
+    capture_yearly = capture_prices_from_sums(aggregates, by=['year']).set_index('year')[CAPTURE_COLUMNS].rename(columns={
+        'pv_price': 'PV Price',
+        'pv_price_pos': 'PV Price (Pos)',
+        'baseload_price': 'Baseload Price',
+        'capture_rate': 'Capture Rate'
+    })
+    timings['capture prices'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    merit_curves = fit_curves(df, by=['year', 'month'])
+    timings['merit-order curves'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cube = load_cube(QUARTER_HOURLY_FILE if quarter_hourly else INPUT_FILE, df)
+    timings['OLAP cube'] = time.perf_counter() - started
+
+    return {
+        'monthly_stats': monthly_stats,
+        'capture_monthly': capture_monthly,
+        'capture_yearly': capture_yearly,
+        'merit_curves': merit_curves,
+        'cube': cube,
+        'years': frame['time_index'].years(),
+        'latest_date': df['datetime'].max(),
+        'timings': timings,
+    }
+
+def show_timings(timings, elapsed):
+    with st.sidebar.expander("Debug: timings"):
+        st.caption(f"This run: {elapsed * 1000:.0f} ms to get the data products")
+        st.caption("Computed once per data version:")
+        st.dataframe(pd.DataFrame({
+            'step': list(timings),
+            'ms': [seconds * 1000 for seconds in timings.values()],
+        }).style.format({'ms': "{:.0f}"}), hide_index=True)
+
+# Pattern tab metrics: label -> (cube column, unit)
+PATTERN_METRICS = {
+    "Average Price": ('avg_price', "€/MWh"),
+    "Price Volatility (Std)": ('price_std', "€/MWh"),
+    "Negative Hours": ('neg_hours', "h"),
+    "PV Capture Price": ('pv_price', "€/MWh"),
+}
+
+SCATTER_MODES = ["Auto", "Points", "Binned", "Sample"]
+X_FIELD = 'residual_load_mw_avg'
+Y_FIELD = 'day_ahead_price_eur_mwh'
+
+def scatter_chart(data, mode, tooltip, label=None):
+    # Raw points only below RAW_POINT_LIMIT rows ("Auto"); otherwise a 2D
+    # histogram computed here or a density-preserving sample is sent
+    if mode == "Auto":
+        mode = "Points" if len(data) <= RAW_POINT_LIMIT else "Binned"
+    if mode == "Sample":
+        data = density_sample(data, X_FIELD, Y_FIELD)
+    if mode != "Binned":
+        color = alt.value('steelblue') if label is None else label
+        chart = alt.Chart(data).mark_circle(size=60).encode(
+            x=alt.X(X_FIELD, title='Residual Load (MW)'),
+            y=alt.Y(Y_FIELD, title='Price (€/MWh)'),
+            color=color,
+            tooltip=tooltip
+        )
+        return chart, mode, len(data)
+
+    bins = bin_scatter(data, X_FIELD, Y_FIELD, bins=DEFAULT_BINS, by=label)
+    if label is None:
+        chart = alt.Chart(bins).mark_rect().encode(
+            x=alt.X('x_start:Q', bin='binned', title='Residual Load (MW)'),
+            x2='x_end:Q',
+            y=alt.Y('y_start:Q', bin='binned', title='Price (€/MWh)'),
+            y2='y_end:Q',
+            color=alt.Color('count:Q', title='Rows', scale=alt.Scale(scheme='blues')),
+            tooltip=['x_mid:Q', 'y_mid:Q', 'count:Q']
+        )
+    else:
+        chart = alt.Chart(bins).mark_circle(opacity=0.6).encode(
+            x=alt.X('x_mid:Q', title='Residual Load (MW)'),
+            y=alt.Y('y_mid:Q', title='Price (€/MWh)'),
+            size=alt.Size('count:Q', title='Rows'),
+            color=label,
+            tooltip=[label, 'x_mid:Q', 'y_mid:Q', 'count:Q']
+        )
+    return chart, mode, len(bins)
+
+def curve_chart(curves, label=None):
+    # Fitted merit-order curve over the band between the 25th and 75th price percentile per load bin
+    color = alt.value('darkred') if label is None else label
+    x = alt.X('load_mw:Q', title='Residual Load (MW)')
+    band = alt.Chart(curves).mark_area(opacity=0.15).encode(
+        x=x, y=alt.Y('p25:Q', title='Price (€/MWh)'), y2='p75:Q', color=color)
+    line = alt.Chart(curves).mark_line(point=True, strokeWidth=2.5).encode(
+        x=x, y=alt.Y('fit:Q', title='Price (€/MWh)'), color=color,
+        tooltip=([label] if label else []) + ['load_mw:Q', 'rows:Q', 'p25:Q', 'p50:Q', 'p75:Q', 'fit:Q'])
+    return band + line
+
+def render_scatter(chart, mode, rows, marks):
+    started = time.perf_counter()
+    chart = chart.properties(height=600).interactive()
+    payload = chart_payload_bytes(chart)
+    st.altair_chart(chart, use_container_width=True)
+    # Server-side time to build and serialize the chart; drawing happens in the browser
+    st.caption(f"{mode}: {rows:,} rows → {marks:,} marks, {payload / 1024:,.0f} KB payload, "
+               f"{(time.perf_counter() - started) * 1000:.0f} ms to render")
 
 def main():
     st.title("🇩🇪 Energy Charts Dashboard")
     st.markdown("Analysis of German residual load, electricity prices, and solar capture rates.")
 
-    df = load_data()
-    if df is None:
+    resolution = st.sidebar.radio("Resolution", ["Hourly", "15 minutes"],
+                                  disabled=not QUARTER_HOURLY_FILE.exists())
+    quarter_hourly = resolution == "15 minutes"
+
+    started = time.perf_counter()
+    version = current_version(quarter_hourly)
+    frame = load_frame(quarter_hourly, version)
+    products = load_products(quarter_hourly, version)
+    if frame is None or products is None:
         st.error(f"Data file `{INPUT_FILE}` not found. Please run the fetch script.")
         return
+    show_timings({**frame['timings'], **products['timings']}, time.perf_counter() - started)
+    time_index = frame['time_index']
 
     # Info Header
-    latest_date = df['datetime'].max()
+    latest_date = products['latest_date']
     st.info(f"📅 **Latest Data Available:** {latest_date.strftime('%B %d, %Y - %H:%M')} (UTC)")
 
-    tab1, tab2, tab3 = st.tabs(["Monthly Statistics", "Solar Capture Prices", "Scatter Plots"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Monthly Statistics", "Solar Capture Prices", "Scatter Plots", "Patterns"])
 
     with tab1:
         st.header("Monthly Market Statistics")
-        stats_df = calculate_monthly_stats(df)
+        stats_df = products['monthly_stats']
         
         # Interactive formatting
         years = sorted(stats_df['year'].unique())
         selected_years = st.multiselect("Select Years", years, default=years)
         
-        show_df = stats_df[stats_df['year'].isin(selected_years)].copy()
-        show_df['month_name'] = show_df['month'].apply(lambda x: calendar.month_abbr[x])
+        show_df = stats_df[stats_df['year'].isin(selected_years)]
         
         # Pivot for better view? Or just show as list
         # Creating a similar pivot view as the PDF
@@ -118,27 +256,11 @@ def main():
 
     with tab2:
         st.header("Solar Capture Prices & Curtailment")
-        cap_df = calculate_capture_prices(df)
+        cap_df = products['capture_monthly']
         
         # Yearly Summary
         st.subheader("Yearly Overview")
-        yearly_df = df.copy()
-        yearly_df['solar_revenue'] = yearly_df['solar_mw_avg'] * yearly_df['day_ahead_price_eur_mwh']
-        yearly_pos = yearly_df[yearly_df['day_ahead_price_eur_mwh'] >= 0]
-        
-        y_grp = yearly_df.groupby('year').agg({
-            'solar_mw_avg': 'sum', 
-            'solar_revenue': 'sum',
-            'day_ahead_price_eur_mwh': 'mean'
-        })
-        y_pos_grp = yearly_pos.groupby('year').agg({'solar_mw_avg': 'sum', 'solar_revenue': 'sum'})
-        
-        y_res = pd.DataFrame({
-            'PV Price': y_grp['solar_revenue'] / y_grp['solar_mw_avg'],
-            'PV Price (Pos)': y_pos_grp['solar_revenue'] / y_pos_grp['solar_mw_avg'],
-            'Baseload Price': y_grp['day_ahead_price_eur_mwh'],
-        })
-        y_res['Capture Rate'] = y_res['PV Price'] / y_res['Baseload Price']
+        y_res = products['capture_yearly']
         
         st.dataframe(y_res.style.format({
             'PV Price': "{:.2f} €",
@@ -157,27 +279,30 @@ def main():
 
     with tab3:
         st.header("Residual Load vs. Price")
+        scatter_mode = st.radio("Display", SCATTER_MODES, horizontal=True,
+                                help=f"Auto sends raw points up to {RAW_POINT_LIMIT:,} rows and binned counts above.")
         
-        years = sorted(df['year'].unique())
+        years = products['years']
         c1, c2 = st.columns(2)
         sel_year = c1.selectbox("Year", years, index=len(years)-1) # Default last year
         sel_month = c2.selectbox("Month", list(calendar.month_name)[1:])
         
         month_idx = list(calendar.month_name).index(sel_month)
+        show_curves = st.checkbox("Overlay merit-order curve", value=True,
+                                  help="Monotone fit of the median price per residual load bin, "
+                                       "with the 25th to 75th percentile band.")
+        curves = products['merit_curves']
         
-        chart_data = df[(df['year'] == sel_year) & (df['month'] == month_idx)]
+        tooltip = ['datetime', X_FIELD, Y_FIELD, 'solar_mw_avg']
+        chart_data = time_index.month(sel_year, month_idx)[tooltip]
         
         if chart_data.empty:
             st.warning("No data for selection.")
         else:
-            chart = alt.Chart(chart_data).mark_circle(size=60).encode(
-                x=alt.X('residual_load_mw_avg', title='Residual Load (MW)'),
-                y=alt.Y('day_ahead_price_eur_mwh', title='Price (€/MWh)'),
-                color=alt.value('steelblue'),
-                tooltip=['datetime', 'residual_load_mw_avg', 'day_ahead_price_eur_mwh', 'solar_mw_avg']
-            ).properties(height=600).interactive()
-            
-            st.altair_chart(chart, use_container_width=True)
+            chart, mode, marks = scatter_chart(chart_data, scatter_mode, tooltip)
+            if show_curves:
+                chart = chart + curve_chart(curve_for(curves, year=sel_year, month=month_idx))
+            render_scatter(chart, mode, len(chart_data), marks)
             
         st.divider()
         st.subheader("Compare Months")
@@ -190,21 +315,58 @@ def main():
             y2 = st.selectbox("Year B", years, index=len(years)-1, key="y2")
             m2 = st.selectbox("Month B", list(calendar.month_name)[1:], index=0, key="m2")
             
-        d1 = df[(df['year'] == y1) & (df['month'] == list(calendar.month_name).index(m1))].copy()
-        d1['Label'] = f"{m1} {y1}"
-        d2 = df[(df['year'] == y2) & (df['month'] == list(calendar.month_name).index(m2))].copy()
-        d2['Label'] = f"{m2} {y2}"
-        
-        comp_data = pd.concat([d1, d2])
+        comp_tooltip = ['datetime', X_FIELD, Y_FIELD]
+        d1 = time_index.month(y1, list(calendar.month_name).index(m1))[comp_tooltip]
+        d2 = time_index.month(y2, list(calendar.month_name).index(m2))[comp_tooltip]
+        comp_data = pd.concat([d1.assign(Label=f"{m1} {y1}"), d2.assign(Label=f"{m2} {y2}")], ignore_index=True)
         
         if not comp_data.empty:
-            comp_chart = alt.Chart(comp_data).mark_circle(size=60).encode(
-                x=alt.X('residual_load_mw_avg', title='Residual Load (MW)'),
-                y=alt.Y('day_ahead_price_eur_mwh', title='Price (€/MWh)'),
-                color='Label',
-                tooltip=['datetime', 'residual_load_mw_avg', 'day_ahead_price_eur_mwh']
-            ).properties(height=600).interactive()
-            st.altair_chart(comp_chart, use_container_width=True)
+            comp_chart, mode, marks = scatter_chart(comp_data, scatter_mode, comp_tooltip, label='Label')
+            if show_curves:
+                comp_curves = pd.concat([
+                    curve_for(curves, year=y1, month=list(calendar.month_name).index(m1)).assign(Label=f"{m1} {y1}"),
+                    curve_for(curves, year=y2, month=list(calendar.month_name).index(m2)).assign(Label=f"{m2} {y2}"),
+                ], ignore_index=True)
+                comp_chart = comp_chart + curve_chart(comp_curves, label='Label')
+            render_scatter(comp_chart, mode, len(comp_data), marks)
+
+    with tab4:
+        st.header("Hourly and Day-Type Patterns")
+        cube = products['cube']
+        # Local calendar years, as in the cube
+        years = sorted(int(year) for year in cube['year'].unique())
+        c1, c2 = st.columns(2)
+        pattern_year = c1.selectbox("Year", ["All"] + years, index=len(years), key="pattern_year")
+        metric_label = c2.selectbox("Metric", list(PATTERN_METRICS))
+        metric, unit = PATTERN_METRICS[metric_label]
+        filters = {} if pattern_year == "All" else {'year': pattern_year}
+
+        # Both views are sums over cube cells; the hourly frame is not touched
+        started = time.perf_counter()
+        by_hour = slice_cube(cube, ['month', 'hour'], **filters)
+        by_hour['month_name'] = by_hour['month'].apply(lambda x: calendar.month_abbr[x])
+        by_day = slice_cube(cube, ['day_type'], **filters)
+        by_day['day'] = by_day['day_type'].map(dict(enumerate(DAY_TYPES)))
+        query_ms = (time.perf_counter() - started) * 1000
+
+        st.subheader(f"{metric_label} by Hour of Day (local time) and Month")
+        heatmap = alt.Chart(by_hour).mark_rect().encode(
+            x=alt.X('month_name:O', sort=list(calendar.month_abbr)[1:], title='Month'),
+            y=alt.Y('hour:O', title='Hour'),
+            color=alt.Color(f'{metric}:Q', title=unit, scale=alt.Scale(scheme='redyellowblue', reverse=True)),
+            tooltip=['month_name', 'hour', alt.Tooltip(f'{metric}:Q', format='.2f'), 'hours']
+        ).properties(height=500)
+        st.altair_chart(heatmap, use_container_width=True)
+
+        st.subheader(f"{metric_label} by Day Type")
+        bars = alt.Chart(by_day).mark_bar().encode(
+            x=alt.X('day:N', sort=DAY_TYPES, title=None),
+            y=alt.Y(f'{metric}:Q', title=unit),
+            tooltip=['day', alt.Tooltip(f'{metric}:Q', format='.2f'), 'hours']
+        )
+        st.altair_chart(bars, use_container_width=True)
+        st.caption(f"Answered from the pre-aggregated cube ({len(cube):,} cells) in {query_ms:.0f} ms. "
+                   "Months, hours and days are German local time; holidays are the nationwide German public holidays.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,197 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_hourly
+from hourly_store import HOUR, infer_resolution
+from spread_engine import PRICE_COLUMN, daily_price_matrix
+
+# Config
+INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
+OUTPUT_CSV = Path("battery_sweep_results.csv")
+# State-of-charge grid: steps per full-power slot (1 = only full-power moves)
+SOC_STEPS = 4
+# Configurations swept by main(): every combination of these
+POWER_MW = [1.0]
+DURATION_HOURS = [1, 2, 4]
+EFFICIENCIES = [0.85, 0.90]
+CYCLES_PER_DAY = [1, 2]
+# Worker processes for the sweep (default: one per CPU)
+SWEEP_WORKERS = int(os.environ.get("SWEEP_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def optimal_schedules(matrix, power_mw=1.0, energy_mwh=2.0, efficiency=0.85, cycles_per_day=1.0,
+                      slot_hours=1.0, soc_steps=SOC_STEPS):
+    """
+    Revenue-maximizing dispatch of a battery for every day of a days x slots
+    price matrix at once (EUR/MWh, NaN = no price, the battery idles).
+
+    Each day starts and ends empty. The state of charge moves on a grid of
+    `power_mw * slot_hours / soc_steps` MWh, at most `soc_steps` steps per
+    slot (the power limit applies to the stored energy), and the energy
+    discharged per day is limited to `cycles_per_day * energy_mwh`. The
+    round-trip `efficiency` is split evenly between charging and discharging.
+
+    A backward dynamic program over (state of charge, energy discharged so
+    far) runs for all days in parallel: per slot and move, one shifted slice
+    of the value array. Returns (revenue per day in EUR, grid energy per day
+    and slot in MWh, positive when charging, negative when discharging).
+    """
+    days, slots = matrix.shape
+    step = power_mw * slot_hours / soc_steps
+    levels = int(round(energy_mwh / step))
+    max_discharge = int(np.floor(cycles_per_day * energy_mwh / step + 1e-9))
+    charge_efficiency = discharge_efficiency = np.sqrt(efficiency)
+    # Idle first, so that ties keep the battery idle
+    moves = [0] + [sign * size for size in range(1, soc_steps + 1) for sign in (-1, 1)]
+
+    # value[d, s, c]: best revenue from here to the end of the day with s steps
+    # stored and c steps discharged so far; the day must end empty
+    value = np.full((days, levels + 1, max_discharge + 1), -np.inf)
+    value[:, 0, :] = 0.0
+    choices = np.zeros((slots, days, levels + 1, max_discharge + 1), dtype=np.int8)
+    for slot in range(slots - 1, -1, -1):
+        price = matrix[:, slot][:, None, None]
+        best = np.full_like(value, -np.inf)
+        best_move = np.zeros(value.shape, dtype=np.int8)
+        for move in moves:
+            discharged = max(-move, 0)
+            low, high = max(0, -move), min(levels, levels - move)
+            if low > high or discharged > max_discharge:
+                continue
+            if move > 0:
+                cash = -price * move * step / charge_efficiency
+            elif move < 0:
+                cash = price * discharged * step * discharge_efficiency
+            else:
+                cash = 0.0
+            target = (slice(None), slice(low, high + 1), slice(0, max_discharge + 1 - discharged))
+            candidate = value[:, low + move:high + move + 1, discharged:] + cash
+            # A NaN price makes every move but idling NaN, which never compares greater
+            better = candidate > best[target]
+            np.copyto(best[target], candidate, where=better)
+            best_move[target][better] = move
+        value = best
+        choices[slot] = best_move
+
+    # Forward pass from an empty battery to read off the schedules
+    day_index = np.arange(days)
+    soc = np.zeros(days, dtype=np.int64)
+    discharged = np.zeros(days, dtype=np.int64)
+    grid = np.zeros((days, slots))
+    for slot in range(slots):
+        move = choices[slot, day_index, soc, discharged].astype(np.int64)
+        grid[:, slot] = np.where(move > 0, move * step / charge_efficiency, move * step * discharge_efficiency)
+        soc += move
+        discharged += np.maximum(-move, 0)
+    return value[:, 0, 0], grid
+
+
+def simulate(df, power_mw=1.0, energy_mwh=2.0, efficiency=0.85, cycles_per_day=1.0, resolution=None,
+             soc_steps=SOC_STEPS):
+    """
+    Optimal daily arbitrage of one battery over the price series of `df`.
+    Returns one row per UTC day with `date`, `revenue_eur`, `charged_mwh`,
+    `discharged_mwh` (grid side) and `cycles` (stored energy discharged / capacity).
+    """
+    if resolution is None:
+        resolution = infer_resolution(df)
+    day_numbers, matrix, _ = daily_price_matrix(df, PRICE_COLUMN, resolution)
+    revenue, grid = optimal_schedules(matrix, power_mw, energy_mwh, efficiency, cycles_per_day,
+                                      resolution / HOUR, soc_steps)
+    discharged = -np.where(grid < 0, grid, 0.0).sum(axis=1)
+    return pd.DataFrame({
+        'date': day_numbers.astype('datetime64[D]').astype('datetime64[s]'),
+        'revenue_eur': revenue,
+        'charged_mwh': np.where(grid > 0, grid, 0.0).sum(axis=1),
+        'discharged_mwh': discharged,
+        'cycles': discharged / np.sqrt(efficiency) / energy_mwh,
+    })
+
+
+def summarize(revenue, grid, config, slot_hours=1.0):
+    """One result row for a configuration: totals, revenue per MW and year, average cycles per day."""
+    power_mw, energy_mwh, efficiency, cycles_per_day = config
+    days = len(revenue)
+    discharged = -np.where(grid < 0, grid, 0.0).sum()
+    total = float(revenue.sum())
+    return {
+        'power_mw': power_mw,
+        'energy_mwh': energy_mwh,
+        'efficiency': efficiency,
+        'cycles_per_day': cycles_per_day,
+        'days': days,
+        'revenue_eur': total,
+        'revenue_eur_per_mw_year': total / power_mw / days * 365 if days else np.nan,
+        'avg_cycles_per_day': discharged / np.sqrt(efficiency) / energy_mwh / days if days else np.nan,
+    }
+
+
+# Price matrix shared with the sweep workers, sent once per process
+_matrix = None
+_slot_hours = 1.0
+
+
+def _init_worker(matrix, slot_hours):
+    global _matrix, _slot_hours
+    _matrix = matrix
+    _slot_hours = slot_hours
+
+
+def _run_config(config):
+    revenue, grid = optimal_schedules(_matrix, *config, slot_hours=_slot_hours)
+    return summarize(revenue, grid, config, _slot_hours)
+
+
+def default_configs():
+    return [(power, power * hours, efficiency, cycles)
+            for power, hours, efficiency, cycles in product(POWER_MW, DURATION_HOURS, EFFICIENCIES, CYCLES_PER_DAY)]
+
+
+def sweep(df, configs=None, max_workers=SWEEP_WORKERS, resolution=None):
+    """
+    Simulates every (power_mw, energy_mwh, efficiency, cycles_per_day)
+    configuration over the full history in a process pool. The price matrix
+    is built once and handed to each worker process; results keep the order
+    of `configs`.
+    """
+    configs = default_configs() if configs is None else list(configs)
+    if resolution is None:
+        resolution = infer_resolution(df)
+    _, matrix, _ = daily_price_matrix(df, PRICE_COLUMN, resolution)
+    slot_hours = resolution / HOUR
+    if max_workers == 1:
+        _init_worker(matrix, slot_hours)
+        return pd.DataFrame([_run_config(config) for config in configs])
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(matrix, slot_hours)) as executor:
+        return pd.DataFrame(list(executor.map(_run_config, configs)))
+
+
+def main():
+    if not INPUT_FILE.exists():
+        print(f"Error: {INPUT_FILE} not found.")
+        return
+
+    print(f"Loading data from {INPUT_FILE}...")
+    df = load_hourly(INPUT_FILE, columns=[PRICE_COLUMN])
+
+    configs = default_configs()
+    print(f"Simulating {len(configs)} battery configurations over {df['date'].nunique()} days "
+          f"with {SWEEP_WORKERS} worker processes...")
+    started = time.perf_counter()
+    results = sweep(df, configs)
+    print(f"Done in {time.perf_counter() - started:.2f} s.\n")
+
+    print(results.to_string(index=False, float_format="%.2f"))
+    print(f"\nSaving results to {OUTPUT_CSV}...")
+    results.to_csv(OUTPUT_CSV, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import datetime
+
+from bench_common import best_of
+from energy_charts_stub import synthetic_total_power
+from residual_load_with_prices import hourly_load_from_payload, hourly_load_from_payload_python
+
+LOAD_KEY = "Load (incl. self-consumption)"
+RENEWABLE_KEYS = ["Biomass", "Hydro Run-of-River", "Wind offshore", "Wind onshore", "Solar", "Geothermal"]
+YEARS = 3
+
+
+def main():
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(2024 + YEARS, 1, 1, tzinfo=datetime.timezone.utc)
+    print(f"Building synthetic {YEARS}-year 15-minute payload...")
+    payload = synthetic_total_power(int(start.timestamp()), int(end.timestamp()) - 900)
+    print(f"  {len(payload['unix_seconds']):,} timestamps x {len(payload['production_types'])} series\n")
+
+    python_time, python_result = best_of(lambda: hourly_load_from_payload_python(payload, LOAD_KEY, RENEWABLE_KEYS))
+    numpy_time, numpy_result = best_of(lambda: hourly_load_from_payload(payload, LOAD_KEY, RENEWABLE_KEYS))
+
+    print(f"dict-based path : {python_time * 1000:8.1f} ms")
+    print(f"NumPy path      : {numpy_time * 1000:8.1f} ms  ({python_time / numpy_time:.1f}x faster)")
+    print(f"hourly rows     : {len(numpy_result):,}")
+
+    # Same keys in the same order and bit-identical values
+    if list(python_result.items()) != list(numpy_result.items()):
+        raise SystemExit("Mismatch between dict-based and NumPy aggregation!")
+    print("Results identical.")
+
+
+if __name__ == "__main__":
+    main()
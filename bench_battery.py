@@ -0,0 +1,84 @@
+import os
+from itertools import product
+
+import numpy as np
+
+from battery_sim import default_configs, optimal_schedules, sweep
+from bench_common import TILES, best_of, tiled
+from data_loader import load_hourly
+from spread_engine import PRICE_COLUMN, daily_price_matrix
+
+# Days solved one at a time for the per-day baseline (extrapolated to all days)
+LOOP_DAYS = 60
+
+
+def brute_force(prices, power_mw, energy_mwh, efficiency, cycles_per_day, soc_steps):
+    """Best revenue of one short day by enumerating every move sequence on the same grid."""
+    step = power_mw / soc_steps
+    levels = int(round(energy_mwh / step))
+    max_discharge = int(np.floor(cycles_per_day * energy_mwh / step + 1e-9))
+    root = np.sqrt(efficiency)
+    best = 0.0
+    for moves in product(range(-soc_steps, soc_steps + 1), repeat=len(prices)):
+        soc = discharged = 0
+        cash = 0.0
+        for price, move in zip(prices, moves):
+            if move and np.isnan(price):
+                break
+            soc += move
+            discharged += max(-move, 0)
+            if soc < 0 or soc > levels or discharged > max_discharge:
+                break
+            if move > 0:
+                cash -= price * move * step / root
+            elif move < 0:
+                cash += price * -move * step * root
+        else:
+            if soc == 0:
+                best = max(best, cash)
+    return best
+
+
+def check_optimality():
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    for energy_mwh, cycles_per_day in product([1.0, 1.5, 2.0], [0.5, 1.0, 2.0]):
+        matrix = rng.normal(60, 40, (4, 6))
+        matrix[0, 2] = np.nan
+        revenue, grid = optimal_schedules(matrix, 1.0, energy_mwh, 0.85, cycles_per_day, soc_steps=2)
+        expected = [brute_force(prices, 1.0, energy_mwh, 0.85, cycles_per_day, 2) for prices in matrix]
+        # The schedules must earn exactly the revenue the program reports
+        earned = -(np.nan_to_num(matrix) * grid).sum(axis=1)
+        worst = max(worst, np.abs(revenue - expected).max(), np.abs(earned - revenue).max())
+    return worst
+
+
+def main():
+    worst = check_optimality()
+    print(f"Optimality vs brute force (36 small days): max error {worst:.1e} EUR")
+    if worst > 1e-9:
+        raise SystemExit("Schedules are not optimal!")
+
+    df = tiled(load_hourly(columns=[PRICE_COLUMN]), TILES)
+    _, matrix, _ = daily_price_matrix(df, PRICE_COLUMN)
+    print(f"\n{len(df):,} hourly rows, {len(matrix):,} days\n")
+
+    t_loop, _ = best_of(lambda: [optimal_schedules(matrix[day:day + 1]) for day in range(LOOP_DAYS)], 1)
+    t_loop *= len(matrix) / LOOP_DAYS
+    t_all, _ = best_of(lambda: optimal_schedules(matrix))
+    print(f"one configuration  day by day: {t_loop:7.2f} s (extrapolated)   all days at once: {t_all:6.2f} s  "
+          f"({t_loop / t_all:.0f}x)")
+
+    configs = default_configs()
+    t_seq, seq = best_of(lambda: sweep(df, configs, max_workers=1), 1)
+    workers = os.cpu_count() or 1
+    t_pool, pool = best_of(lambda: sweep(df, configs, max_workers=workers), 1)
+    print(f"{len(configs)} configurations  sequential: {t_seq:6.2f} s   {workers} worker processes: {t_pool:6.2f} s  "
+          f"({t_seq / t_pool:.1f}x)")
+    if not seq.equals(pool):
+        raise SystemExit("Sweep results differ!")
+    print("\nResults identical.")
+
+
+if __name__ == "__main__":
+    main()
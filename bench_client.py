@@ -0,0 +1,87 @@
+import datetime
+import json
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from energy_charts_client import EnergyChartsClient
+from energy_charts_stub import StubServer
+
+# Simulated cost of opening a new connection (TCP + TLS round trips to the real API)
+HANDSHAKE_DELAY = 0.05
+WORKERS = 4
+
+
+def month_ranges(start_year=2024, months=24):
+    ranges = []
+    for i in range(months):
+        year, month = start_year + i // 12, i % 12 + 1
+        start = datetime.datetime(year, month, 1, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(year + month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        ranges.append((start.strftime("%Y-%m-%dT%H:00Z"), end.strftime("%Y-%m-%dT%H:59Z")))
+    return ranges
+
+
+def requests_for(ranges):
+    return [(endpoint, {"country": "de", "start": s, "end": e})
+            for s, e in ranges for endpoint in ("total_power", "price")]
+
+
+def fetch_with_urlopen(base_url, endpoint, params):
+    """The previous per-request urlopen approach: new connection, no compression."""
+    url = f"{base_url}/{endpoint}?{urllib.parse.urlencode(params)}"
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def run(label, fetch, requests, workers):
+    started = time.perf_counter()
+    if workers == 1:
+        for endpoint, params in requests:
+            fetch(endpoint, params)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda r: fetch(*r), requests))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed:7.2f} s  ({len(requests) / elapsed:6.1f} req/s)")
+    return elapsed
+
+
+def main():
+    requests = requests_for(month_ranges())
+    print(f"Benchmarking {len(requests)} requests against a local stub "
+          f"(handshake delay {HANDSHAKE_DELAY * 1000:.0f} ms)...\n")
+
+    for workers in (1, WORKERS):
+        with StubServer(handshake_delay=HANDSHAKE_DELAY) as server:
+            run(f"urlopen per request, {workers} worker(s)",
+                lambda e, p: fetch_with_urlopen(server.base_url, e, p), requests, workers)
+            print(f"{'':<40} {server.counters['connections']} connections opened")
+
+        with StubServer(handshake_delay=HANDSHAKE_DELAY) as server:
+            with EnergyChartsClient(base_url=server.base_url) as client:
+                run(f"EnergyChartsClient, {workers} worker(s)", client.fetch_data, requests, workers)
+                print(f"{'':<40} {server.counters['connections']} connections opened")
+                print(f"{'':<40} {client.stats.format_summary()}\n")
+
+    # Retry path: every 5th request fails with 503 and is retried with backoff
+    with StubServer(fail_every=5) as server:
+        with EnergyChartsClient(base_url=server.base_url, backoff_base=0.01) as client:
+            run("EnergyChartsClient with 503s, 1 worker", client.fetch_data, requests, 1)
+            print(f"{'':<40} {client.stats.format_summary()}")
+
+    # Conditional requests: a second pass with stored ETags transfers no bodies
+    with StubServer() as server:
+        with EnergyChartsClient(base_url=server.base_url) as client:
+            etags = {}
+            for endpoint, params in requests:
+                etags[(endpoint, params['start'])] = client.fetch(endpoint, params).etag
+            unchanged = sum(client.fetch(endpoint, params, etag=etags[(endpoint, params['start'])]).not_modified
+                            for endpoint, params in requests)
+            print(f"\nRevalidation pass: {unchanged}/{len(requests)} answered 304 Not Modified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import time
+
+import pandas as pd
+
+# Repeat the real history this many times (shifted in time) to emulate a longer dataset
+TILES = 5
+# Each timing is the best of this many runs
+REPEATS = 3
+
+
+def tiled(df, tiles=TILES, columns=('day_ahead_price_eur_mwh',), calendar=False):
+    """
+    `timestamp_unix` and `columns` of `df` repeated `tiles` times, each copy
+    shifted by the whole days the history spans, with a UTC `date` column
+    (and `year` and `month` if `calendar`).
+    """
+    span = (int(df['timestamp_unix'].max()) // 86400 + 1) * 86400 - (int(df['timestamp_unix'].min()) // 86400) * 86400
+    parts = []
+    for i in range(tiles):
+        part = df[['timestamp_unix', *columns]].copy()
+        part['timestamp_unix'] += i * span
+        parts.append(part)
+    out = pd.concat(parts, ignore_index=True)
+    out['date'] = pd.to_datetime(out['timestamp_unix'] // 86400 * 86400, unit='s')
+    if calendar:
+        out['year'] = out['date'].dt.year
+        out['month'] = out['date'].dt.month
+    return out
+
+
+def best_of(fn, repeats=REPEATS):
+    """(Fastest of `repeats` runs of fn() in seconds, result of the last run)."""
+    best, result = None, None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from bench_common import TILES, best_of, tiled
+from data_loader import load_hourly
+from merit_order import LOAD_BIN_MW, LOAD_COLUMN, MIN_BIN_ROWS, PRICE_COLUMN, QUANTILES, fit_curves, quantile_column
+
+
+def pava(values, weights):
+    """Weighted isotonic regression by pool-adjacent-violators (one curve)."""
+    blocks = []
+    for value, weight in zip(values, weights):
+        blocks.append([value, weight, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            value, weight, size = blocks.pop()
+            previous = blocks[-1]
+            total = previous[1] + weight
+            blocks[-1] = [(previous[0] * previous[1] + value * weight) / total, total, previous[2] + size]
+    return np.repeat([block[0] for block in blocks], [block[2] for block in blocks])
+
+
+def curves_loop(df, by):
+    """Reference: one np.quantile call per (period, bin) and one PAVA per period."""
+    data = df[by + [LOAD_COLUMN, PRICE_COLUMN]].dropna().copy()
+    data['bin'] = np.floor(data[LOAD_COLUMN] / LOAD_BIN_MW).astype(np.int64)
+    rows = []
+    for key, group in data.groupby(by + ['bin']):
+        prices = group[PRICE_COLUMN].to_numpy()
+        row = dict(zip(by + ['bin'], key))
+        row['load_mw'] = group[LOAD_COLUMN].mean()
+        row['rows'] = len(prices)
+        for q in QUANTILES:
+            row[quantile_column(q)] = np.quantile(prices, q)
+        row['median'] = np.quantile(prices, 0.5)
+        rows.append(row)
+    cells = pd.DataFrame(rows)
+    cells = cells[cells['rows'] >= MIN_BIN_ROWS].reset_index(drop=True)
+    cells['fit'] = np.concatenate([pava(group['median'].to_numpy(), group['rows'].to_numpy())
+                                   for _, group in cells.groupby(by, sort=True)])
+    return cells.drop(columns='median')
+
+
+def main():
+    df = tiled(load_hourly(columns=[LOAD_COLUMN, PRICE_COLUMN]), TILES, columns=[LOAD_COLUMN, PRICE_COLUMN],
+               calendar=True)
+    df['week'] = df['timestamp_unix'] // (7 * 86400)
+    print(f"{len(df):,} hourly rows\n")
+
+    for by in (['year', 'month'], ['week']):
+        t_loop, ref = best_of(lambda: curves_loop(df, by), 1)
+        t_engine, new = best_of(lambda: fit_curves(df, by))
+        periods = new[by].drop_duplicates().shape[0]
+        print(f"{'/'.join(by):<11} {periods:4d} curves  loop: {t_loop * 1000:8.1f} ms   engine: {t_engine * 1000:6.1f} ms  "
+              f"({t_loop / t_engine:.0f}x)")
+        for column in ref.columns:
+            if not np.allclose(ref[column].to_numpy(dtype=float), new[column].to_numpy(dtype=float), rtol=1e-12, atol=1e-9):
+                raise SystemExit(f"{column} differs!")
+        if (new.groupby(by)['fit'].diff() < -1e-9).any():
+            raise SystemExit("Fit is not monotone!")
+    print("\nResults identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from bench_common import TILES, best_of, tiled
+from data_loader import load_hourly
+from monthly_aggregates import PRICE_COLUMN, SOLAR_COLUMN
+from olap_cube import LOCAL_TIMEZONE, build_cube, day_types, slice_cube
+
+
+def views_from_frame(df, year):
+    """Reference: the dashboard's pattern views computed from the hourly rows (of local `year`, or all)."""
+    local = df['datetime'].dt.tz_convert(LOCAL_TIMEZONE)
+    if year is not None:
+        selected = (local.dt.year == year).to_numpy()
+        df, local = df[selected], local[selected]
+    price = df[PRICE_COLUMN]
+    by_hour = price.groupby([local.dt.month.to_numpy(), local.dt.hour.to_numpy()]).mean()
+    by_day = price.groupby(day_types(local)).mean()
+    return by_hour.to_numpy(), by_day.to_numpy()
+
+
+def views_from_cube(cube, year):
+    filters = {} if year is None else {'year': year}
+    by_hour = slice_cube(cube, ['month', 'hour'], **filters)
+    by_day = slice_cube(cube, ['day_type'], **filters)
+    return by_hour['avg_price'].to_numpy(), by_day['avg_price'].to_numpy()
+
+
+def main():
+    columns = [PRICE_COLUMN, SOLAR_COLUMN]
+    df = tiled(load_hourly(columns=columns), TILES, columns=columns, calendar=True)
+    df['datetime'] = pd.to_datetime(df['timestamp_unix'], unit='s', utc=True)
+    year = int(df['year'].iloc[len(df) // 2])
+    print(f"{len(df):,} hourly rows\n")
+
+    t_build, cube = best_of(lambda: build_cube(df))
+    print(f"build cube: {t_build * 1000:7.1f} ms, {len(cube):,} cells")
+
+    for selected in (year, None):
+        t_frame, ref = best_of(lambda: views_from_frame(df, selected))
+        t_cube, new = best_of(lambda: views_from_cube(cube, selected))
+        print(f"hour x month and day type views, {selected or 'all years'}  frame: {t_frame * 1000:6.1f} ms   "
+              f"cube: {t_cube * 1000:5.1f} ms  ({t_frame / t_cube:.1f}x)")
+        for old, fresh in zip(ref, new):
+            if not np.allclose(old, fresh, rtol=1e-12):
+                raise SystemExit("Views differ!")
+    print("\nResults identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from bench_common import TILES, best_of, tiled
+from data_loader import load_hourly
+from spread_engine import daily_spreads
+
+
+def spread_top4_apply(group):
+    """Previous monthly_stats.py / app.py implementation (one Python call per day)."""
+    if len(group) < 8:
+        return None
+    sorted_prices = group['day_ahead_price_eur_mwh'].sort_values()
+    return sorted_prices.iloc[-4:].mean() - sorted_prices.iloc[:4].mean()
+
+
+def spread_top2_apply(group):
+    """Previous price_analysis.py implementation (builds a Series per day)."""
+    if len(group) < 4:
+        return pd.Series({'daily_spread': None})
+    sorted_prices = group['day_ahead_price_eur_mwh'].sort_values()
+    bottom_2_avg = sorted_prices.iloc[:2].mean()
+    top_2_avg = sorted_prices.iloc[-2:].mean()
+    return pd.Series({'avg_top_2': top_2_avg, 'avg_bottom_2': bottom_2_avg, 'daily_spread': top_2_avg - bottom_2_avg})
+
+
+def main():
+    df = tiled(load_hourly(columns=['day_ahead_price_eur_mwh']), TILES)
+    print(f"{len(df):,} hourly rows, {df['date'].nunique():,} days\n")
+
+    t_apply4, ref4 = best_of(lambda: df.groupby('date').apply(spread_top4_apply))
+    t_engine4, new4 = best_of(lambda: daily_spreads(df, n=4))
+    print(f"top-4/bottom-4  apply: {t_apply4 * 1000:8.1f} ms   engine: {t_engine4 * 1000:6.1f} ms  "
+          f"({t_apply4 / t_engine4:.0f}x)")
+    if not np.array_equal(ref4.to_numpy(dtype=float), new4['spread'].to_numpy(), equal_nan=True):
+        raise SystemExit("top-4 spreads differ!")
+
+    t_apply2, ref2 = best_of(lambda: df.groupby('date').apply(spread_top2_apply).reset_index().dropna())
+    t_engine2, new2 = best_of(lambda: daily_spreads(df, n=2, min_hours=4).dropna())
+    print(f"top-2/bottom-2  apply: {t_apply2 * 1000:8.1f} ms   engine: {t_engine2 * 1000:6.1f} ms  "
+          f"({t_apply2 / t_engine2:.0f}x)")
+    for old, new in [('avg_top_2', 'avg_top'), ('avg_bottom_2', 'avg_bottom'), ('daily_spread', 'spread')]:
+        if not np.array_equal(ref2[old].to_numpy(dtype=float), new2[new].to_numpy()):
+            raise SystemExit(f"{old} differs!")
+    print("\nResults identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from bench_common import TILES, best_of, tiled
+from data_loader import load_hourly
+from time_index import TimeIndex
+
+COLUMNS = ['residual_load_mw_avg', 'day_ahead_price_eur_mwh', 'solar_mw_avg']
+
+
+def main():
+    df = tiled(load_hourly(columns=COLUMNS), TILES, columns=COLUMNS, calendar=True)
+    print(f"{len(df):,} hourly rows\n")
+
+    t_build, index = best_of(lambda: TimeIndex(df))
+    months = index.months()
+    print(f"build index: {t_build * 1000:6.2f} ms, {len(months)} months")
+
+    # Every month once, as the dashboard's scatter tab and the PDF pages look them up
+    t_mask, ref = best_of(lambda: [df.loc[(df['year'] == year) & (df['month'] == month), COLUMNS]
+                                   for year, month in months])
+    t_index, new = best_of(lambda: [index.month(year, month)[COLUMNS] for year, month in months])
+    print(f"{len(months)} month lookups  masks: {t_mask * 1000:7.1f} ms   index: {t_index * 1000:6.1f} ms  "
+          f"({t_mask / t_index:.0f}x)")
+    if not all(old.equals(fresh) for old, fresh in zip(ref, new)):
+        raise SystemExit("Slices differ!")
+
+    # Without the column selection the slices are views of the frame
+    t_mask, _ = best_of(lambda: [df[(df['year'] == year) & (df['month'] == month)] for year, month in months])
+    t_index, _ = best_of(lambda: [index.month(year, month) for year, month in months])
+    print(f"{len(months)} month views    masks: {t_mask * 1000:7.1f} ms   index: {t_index * 1000:6.1f} ms  "
+          f"({t_mask / t_index:.0f}x)")
+    print("\nResults identical.")
+
+
+if __name__ == "__main__":
+    main()
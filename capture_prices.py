@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_loader import INPUT_FILE, data_version, load_hourly
+from hourly_store import HOUR, infer_resolution
+from monthly_aggregates import AGGREGATES_FILE, PRICE_COLUMN, SOLAR_COLUMN, load_current_aggregates
+
+# Additive sums the capture prices are derived from (named as in the monthly aggregates)
+CAPTURE_SUMS = ['hours', 'price_sum', 'solar_mwh', 'solar_revenue', 'solar_mwh_pos', 'solar_revenue_pos']
+CAPTURE_COLUMNS = ['pv_price', 'pv_price_pos', 'baseload_price', 'capture_rate']
+
+# (CSV path, data versions, period) -> sums table
+_memo = {}
+
+
+def capture_sums(df, by=('year', 'month'), resolution=None):
+    """
+    CAPTURE_SUMS per `by` period (columns of `df`, e.g. ('year',),
+    ('year', 'month') or ('date',)). The positive-price sums are masked
+    columns, so this is one groupby pass without filtered sub-frames.
+
+    15-minute rows (`resolution` in seconds, inferred if None) are weighted
+    by their duration, as in monthly_aggregates.sufficient_statistics.
+    """
+    by = list(by)
+    if resolution is None:
+        resolution = infer_resolution(df)
+    price = df[PRICE_COLUMN].to_numpy(dtype=np.float64)
+    solar = df[SOLAR_COLUMN].to_numpy(dtype=np.float64)
+    revenue = solar * price
+    positive = price >= 0
+
+    work = pd.DataFrame({column: df[column].to_numpy() for column in by})
+    work['hours'] = np.ones(len(df), dtype=np.int64)
+    work['price_sum'] = price
+    work['solar_mwh'] = solar
+    work['solar_revenue'] = revenue
+    work['solar_mwh_pos'] = np.where(positive, solar, 0.0)
+    work['solar_revenue_pos'] = np.where(positive, revenue, 0.0)
+    if resolution != HOUR:
+        work[CAPTURE_SUMS] = work[CAPTURE_SUMS] * (resolution / HOUR)
+    return work.groupby(by, as_index=False)[CAPTURE_SUMS].sum()
+
+
+def capture_prices_from_sums(table, by=('year', 'month')):
+    """
+    PV price, PV price over positive-price hours, baseload price and capture
+    rate per `by` period, from a table of CAPTURE_SUMS at the same or a finer
+    granularity (e.g. the materialized monthly aggregates for yearly values).
+    """
+    by = list(by)
+    grouped = table.groupby(by, as_index=False)[CAPTURE_SUMS].sum()
+    result = grouped[by].copy()
+    result['pv_price'] = grouped['solar_revenue'] / grouped['solar_mwh']
+    result['pv_price_pos'] = grouped['solar_revenue_pos'] / grouped['solar_mwh_pos']
+    result['baseload_price'] = grouped['price_sum'] / grouped['hours']
+    result['capture_rate'] = result['pv_price'] / result['baseload_price']
+    return result
+
+
+def capture_prices(df, by=('year', 'month'), resolution=None):
+    """Capture prices per `by` period computed directly from rows of `df`."""
+    return capture_prices_from_sums(capture_sums(df, by, resolution), by)
+
+
+def load_capture_sums(by=('year', 'month'), csv_path=INPUT_FILE, df=None):
+    """
+    CAPTURE_SUMS of the hourly dataset per `by` period, memoized per period
+    and data version (size and mtime of the CSV and the aggregates file).
+    Year and month periods are rolled up from the materialized monthly
+    aggregates when they are up to date; otherwise `df` (the full
+    dataset, loaded if None) is aggregated. Returns a copy callers may modify.
+    """
+    by = list(by)
+    key = (str(Path(csv_path).resolve()), data_version(csv_path), data_version(AGGREGATES_FILE), tuple(by))
+    if key not in _memo:
+        aggregates = load_current_aggregates(csv_path) if set(by) <= {'year', 'month'} else None
+        if aggregates is not None:
+            sums = aggregates.groupby(by, as_index=False)[CAPTURE_SUMS].sum()
+        else:
+            if df is None:
+                df = load_hourly(csv_path, columns=[SOLAR_COLUMN, PRICE_COLUMN])
+            sums = capture_sums(df, by)
+        _memo[key] = sums
+    return _memo[key].copy()
+
+
+def load_capture_prices(by=('year', 'month'), csv_path=INPUT_FILE, df=None):
+    """Capture prices of the hourly dataset per `by` period (see load_capture_sums)."""
+    return capture_prices_from_sums(load_capture_sums(by, csv_path, df), by)
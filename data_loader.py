@@ -0,0 +1,146 @@
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from hourly_csv import has_pending, read_watermark
+from hourly_store import (QUARTER_HOURLY_STORE_DIR, STORE_DIR, MEASURE_COLUMNS, add_calendar_columns,
+                          last_timestamp, read_store)
+
+INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
+QUARTER_HOURLY_FILE = Path("quarter_hourly_german_residual_load_and_prices_2024_present.csv")
+# Parsed frames and products derived from them (e.g. the OLAP cube) are cached
+# here, one file per dataset and product, keyed by the CSV's size and mtime
+CACHE_DIR = Path(".cache/frames")
+
+# Explicit dtypes for the CSV columns the loader reads. `datetime_utc` is
+# skipped: the datetime is derived from `timestamp_unix` instead of parsing strings.
+CSV_DTYPES = {'timestamp_unix': np.int64, **{c: np.float64 for c in MEASURE_COLUMNS}}
+
+# (resolved CSV path, product) -> (key, value)
+_memory_cache = {}
+
+
+def data_version(csv_path=INPUT_FILE):
+    """Identifies the current contents of the CSV by (size, mtime). None if it does not exist."""
+    try:
+        stat = os.stat(csv_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def store_is_current(csv_path=INPUT_FILE, store_root=STORE_DIR):
+    """
+    True if the columnar store holds the same data as the CSV (same last
+    timestamp, and no backfill insert waiting to reach the store).
+    """
+    watermark = read_watermark(csv_path)
+    if watermark is None or watermark['last_ts'] is None or has_pending(csv_path):
+        return False
+    return last_timestamp(store_root) == watermark['last_ts']
+
+
+def _parse(csv_path, store_root):
+    """Reads the full dataset from the store (or the CSV) and adds the time columns."""
+    if store_is_current(csv_path, store_root):
+        df = read_store(root=store_root)
+    else:
+        df = pd.read_csv(csv_path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES)
+        add_calendar_columns(df)
+    df['datetime'] = pd.to_datetime(df['timestamp_unix'], unit='s', utc=True)
+    return df
+
+
+def _cache_key(csv_path, product, extra=()):
+    path = str(Path(csv_path).resolve())
+    return (path, product), (path, data_version(csv_path), pd.__version__) + tuple(extra)
+
+
+def _in_memory(csv_path, product, extra=()):
+    slot, key = _cache_key(csv_path, product, extra)
+    return slot in _memory_cache and _memory_cache[slot][0] == key
+
+
+def cached_product(csv_path, product, build, extra=(), use_cache=True):
+    """
+    `build()` computed once per data version of `csv_path` (size and mtime)
+    and kept in memory and in CACHE_DIR under the name `product`; `extra`
+    holds anything else the result depends on (e.g. its layout).
+    """
+    slot, key = _cache_key(csv_path, product, extra)
+    if use_cache and slot in _memory_cache and _memory_cache[slot][0] == key:
+        return _memory_cache[slot][1]
+
+    stem = Path(csv_path).stem
+    cache_file = CACHE_DIR / (f"{stem}.pkl" if product == 'frame' else f"{stem}.{product}.pkl")
+    if use_cache:
+        try:
+            with open(cache_file, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['key'] == key:
+                _memory_cache[slot] = (key, cached['value'])
+                return cached['value']
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, ImportError):
+            pass
+
+    value = build()
+    if use_cache:
+        _memory_cache[slot] = (key, value)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_file.with_name(cache_file.name + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': key, 'value': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    return value
+
+
+def load_hourly(csv_path=INPUT_FILE, columns=None, years=None, months=None, store_root=STORE_DIR, use_cache=True):
+    """
+    Loads the hourly dataset for the analysis scripts.
+
+    A selection (`columns`, `years` or `months`) is read straight from the
+    typed columnar store when that is up to date with the CSV: only the
+    matching year-month partitions and the requested columns are loaded.
+    The full frame is cached in memory and on disk, keyed by the CSV's size
+    and mtime, so running several scripts in a row parses the data once; it
+    serves selections too once it is in memory, and every request while the
+    store lags behind the CSV. On a cache miss it is read from the store, or
+    from the CSV with an explicit dtype schema.
+
+    Returns the requested measure `columns` (default: all) for the given
+    `years` / `months`, plus `timestamp_unix`, `datetime` (UTC), `year`
+    (int16), `month` (int8) and `date` (datetime64, day resolution).
+    """
+    selection = columns is not None or years is not None or months is not None
+    if selection and not (use_cache and _in_memory(csv_path, 'frame')) and store_is_current(csv_path, store_root):
+        df = read_store(columns, years, months, store_root)
+        df.insert(1, 'datetime', pd.to_datetime(df['timestamp_unix'], unit='s', utc=True))
+        return df
+
+    df = cached_product(csv_path, 'frame', lambda: _parse(csv_path, store_root), use_cache=use_cache)
+
+    measures = MEASURE_COLUMNS if columns is None else [c for c in MEASURE_COLUMNS if c in columns]
+    wanted = ['timestamp_unix', 'datetime'] + measures + ['year', 'month', 'date']
+
+    mask = None
+    if years is not None:
+        mask = df['year'].isin(years)
+    if months is not None:
+        month_mask = df['month'].isin(months)
+        mask = month_mask if mask is None else mask & month_mask
+    if mask is not None:
+        return df.loc[mask, wanted].reset_index(drop=True)
+    # Copy so callers adding columns never modify the cached frame
+    return df[wanted].copy()
+
+
+def load_quarter_hourly(csv_path=QUARTER_HOURLY_FILE, columns=None, years=None, months=None,
+                        store_root=QUARTER_HOURLY_STORE_DIR, use_cache=True):
+    """
+    Loads the 15-minute dataset. Same columns, caching and filters as
+    load_hourly, with one row per quarter hour.
+    """
+    return load_hourly(csv_path, columns, years, months, store_root, use_cache)
@@ -0,0 +1,236 @@
+import gzip
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+BASE_URL = os.environ.get("ENERGY_CHARTS_BASE_URL", "https://api.energy-charts.info")
+
+# Errors after which the request is worth repeating
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A kept-alive connection the server has already closed fails with one of these on reuse
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class EnergyChartsError(Exception):
+    """Raised when the API answers with a non-retryable status or retries are exhausted."""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `min_interval` seconds.
+    Thread-safe, so one instance can be shared by all fetch workers.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class FetchResult:
+    """
+    Outcome of a single (possibly conditional) GET.
+    `payload` is None when the server answered 304 Not Modified.
+    """
+    def __init__(self, status, payload, etag=None, last_modified=None):
+        self.status = status
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+
+class RequestStats:
+    """
+    Thread-safe log of per-request latency and transfer size.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def record(self, endpoint, status, latency, wire_bytes, body_bytes, attempts, params=None):
+        with self._lock:
+            self.records.append({
+                'endpoint': endpoint,
+                'params': params or {},
+                'status': status,
+                'latency_s': latency,
+                'wire_bytes': wire_bytes,
+                'body_bytes': body_bytes,
+                'attempts': attempts,
+            })
+
+    def summary(self, where=None):
+        """Aggregates all records, or only those for which `where(record)` is true."""
+        with self._lock:
+            records = [r for r in self.records if where is None or where(r)]
+        if not records:
+            return {'requests': 0}
+        latencies = sorted(r['latency_s'] for r in records)
+        return {
+            'requests': len(records),
+            'retries': sum(r['attempts'] - 1 for r in records),
+            'not_modified': sum(1 for r in records if r['status'] == 304),
+            'wire_bytes': sum(r['wire_bytes'] for r in records),
+            'body_bytes': sum(r['body_bytes'] for r in records),
+            'latency_total_s': sum(latencies),
+            'latency_p50_s': latencies[len(latencies) // 2],
+            'latency_max_s': latencies[-1],
+        }
+
+    def format_summary(self, where=None):
+        s = self.summary(where)
+        if not s['requests']:
+            return "No API requests made."
+        return (f"{s['requests']} requests ({s['retries']} retries, {s['not_modified']} not modified), "
+                f"{s['wire_bytes'] / 1e6:.2f} MB on the wire / {s['body_bytes'] / 1e6:.2f} MB decoded, "
+                f"latency p50 {s['latency_p50_s'] * 1000:.0f} ms, max {s['latency_max_s'] * 1000:.0f} ms")
+
+
+class EnergyChartsClient:
+    """
+    Keep-alive HTTP client for api.energy-charts.info.
+
+    Each thread holds one persistent connection, so a chunked fetch pays the
+    TCP/TLS handshake once per worker instead of once per request. Responses
+    are requested gzip-compressed, failed requests are retried with exponential
+    backoff and jitter, and every request is recorded in `stats`.
+    """
+    def __init__(self, base_url=BASE_URL, timeout=60, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0, min_request_interval=0.0):
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = HostRateLimiter(min_request_interval)
+        self.stats = RequestStats()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(self.host, timeout=self.timeout)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _reset_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # "Equal jitter": half of the exponential step is fixed, the other half random,
+        # so parallel workers that failed together do not retry in lockstep.
+        step = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return step / 2 + random.uniform(0, step / 2)
+
+    def _send(self, path, headers):
+        """Sends one GET on this thread's connection, reconnecting once if it went stale."""
+        for reuse_attempt in range(2):
+            conn = self._connection()
+            reused = conn.sock is not None
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                return response, response.read()
+            except STALE_CONNECTION_ERRORS:
+                self._reset_connection()
+                if not reused or reuse_attempt == 1:
+                    raise
+            except Exception:
+                self._reset_connection()
+                raise
+
+    def fetch(self, endpoint, params, etag=None, last_modified=None):
+        """
+        GETs `endpoint` with `params` and returns a FetchResult.
+        If `etag`/`last_modified` are given the request is conditional and a
+        304 answer comes back with payload None.
+        """
+        path = f"{self.base_path}/{endpoint}?{urllib.parse.urlencode(params)}"
+        headers = {
+            'User-Agent': 'Mozilla/5.0',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        for attempt in range(self.max_retries):
+            self.rate_limiter.wait(self.host)
+            started = time.perf_counter()
+            retry_after = None
+            try:
+                response, raw = self._send(path, headers)
+                status = response.status
+                if status == 200:
+                    body = gzip.decompress(raw) if response.getheader('Content-Encoding') == 'gzip' else raw
+                    payload = json.loads(body.decode('utf-8'))
+                    self.stats.record(endpoint, status, time.perf_counter() - started, len(raw), len(body), attempt + 1, params)
+                    return FetchResult(status, payload, response.getheader('ETag'), response.getheader('Last-Modified'))
+                if status == 304:
+                    self.stats.record(endpoint, status, time.perf_counter() - started, len(raw), 0, attempt + 1, params)
+                    return FetchResult(status, None, response.getheader('ETag') or etag,
+                                       response.getheader('Last-Modified') or last_modified)
+                if status not in RETRY_STATUSES:
+                    raise EnergyChartsError(f"API returned status {status} for {endpoint}", status)
+                error = EnergyChartsError(f"API returned status {status} for {endpoint}", status)
+                header = response.getheader('Retry-After')
+                if header and header.isdigit():
+                    retry_after = int(header)
+            except EnergyChartsError:
+                raise
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                error = e
+            if attempt == self.max_retries - 1:
+                raise error
+            time.sleep(self._backoff(attempt, retry_after))
+
+    def fetch_data(self, endpoint, params):
+        """Unconditional GET returning the decoded JSON payload."""
+        return self.fetch(endpoint, params).payload
@@ -0,0 +1,146 @@
+import datetime
+import gzip
+import hashlib
+import json
+import math
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Production types served by the stub, matching the names the fetch scripts select
+PRODUCTION_TYPES = [
+    "Load (incl. self-consumption)",
+    "Biomass",
+    "Hydro Run-of-River",
+    "Wind offshore",
+    "Wind onshore",
+    "Solar",
+    "Geothermal",
+    "Fossil gas",
+]
+
+
+def parse_api_time(value):
+    """Parses the API's 'YYYY-MM-DDTHH:MMZ' format into a unix timestamp."""
+    dt = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%MZ").replace(tzinfo=datetime.timezone.utc)
+    return int(dt.timestamp())
+
+
+def synthetic_total_power(start_ts, end_ts, step=900):
+    """
+    Deterministic 15-minute `total_power` payload for [start_ts, end_ts].
+    A few values per series are None, like gaps in the real API.
+    """
+    ts_list = list(range(start_ts - start_ts % step, end_ts + 1, step))
+    production_types = []
+    for i, name in enumerate(PRODUCTION_TYPES):
+        data = []
+        for ts in ts_list:
+            if (ts // step) % 113 == i:
+                data.append(None)
+            else:
+                data.append(round(1000 * (i + 1) + 500 * math.sin(ts / 7200.0 + i) + (ts % 997) / 7.0, 3))
+        production_types.append({'name': name, 'data': data})
+    return {'unix_seconds': ts_list, 'production_types': production_types}
+
+
+def synthetic_price(start_ts, end_ts, step=3600):
+    """Deterministic `price` payload for [start_ts, end_ts] at `step` resolution."""
+    ts_list = list(range(start_ts - start_ts % step, end_ts + 1, step))
+    prices = [None if (ts // 3600) % 211 == 0 else round(50 + 40 * math.sin(ts / 40000.0) - (ts % 53), 2)
+              for ts in ts_list]
+    return {'unix_seconds': ts_list, 'price': prices, 'unit': 'EUR / MWh'}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Emulates the TCP/TLS handshake round trips of a fresh connection
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+        self.server.count('connections')
+
+    def do_GET(self):
+        self.server.count('requests')
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        try:
+            start_ts = parse_api_time(query['start'][0])
+            end_ts = parse_api_time(query['end'][0])
+        except (KeyError, ValueError):
+            self._reply(400, b'{"detail": "bad range"}')
+            return
+
+        if self.server.fail_every and self.server.counters['requests'] % self.server.fail_every == 0:
+            self._reply(503, b'{"detail": "try again"}')
+            return
+
+        if parts.path.endswith('/total_power'):
+            payload = synthetic_total_power(start_ts, end_ts)
+        elif parts.path.endswith('/price'):
+            payload = synthetic_price(start_ts, end_ts, self.server.price_step)
+        else:
+            self._reply(404, b'{"detail": "not found"}')
+            return
+
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self._reply(304, b'', {'ETag': etag})
+            return
+
+        headers = {'Content-Type': 'application/json', 'ETag': etag}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        self._reply(200, body, headers)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local stand-in for api.energy-charts.info serving synthetic `total_power`
+    and `price` payloads, with gzip, ETags and keep-alive like the real API.
+
+    Use as a context manager; `base_url` can be passed to EnergyChartsClient.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, handshake_delay=0.0, fail_every=0, price_step=3600):
+        super().__init__(('127.0.0.1', port), _StubHandler)
+        self.handshake_delay = handshake_delay
+        self.fail_every = fail_every
+        self.price_step = price_step
+        self.counters = {'connections': 0, 'requests': 0}
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,392 @@
+import csv
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Bytes read per step when seeking backwards for the last line
+TAIL_BLOCK_SIZE = 4096
+
+
+def sidecar_path(csv_path):
+    """Metadata file kept next to the CSV, e.g. `data.csv.meta.json`."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".meta.json")
+
+
+def schema_hash(header):
+    return hashlib.sha256(",".join(header).encode("utf-8")).hexdigest()[:16]
+
+
+def read_header(csv_path):
+    with open(csv_path, 'r', newline='') as f:
+        return next(csv.reader(f), None)
+
+
+def read_last_lines(csv_path, count=1):
+    """
+    Returns up to `count` last non-empty lines of a text file by seeking
+    backwards from the end, so the cost does not grow with the file.
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = [line for line in data.decode('utf-8').splitlines() if line.strip()]
+    return lines[-count:]
+
+
+def read_last_timestamp(csv_path):
+    """Timestamp in the first column of the last row, or None if there are no data rows."""
+    lines = read_last_lines(csv_path, 1)
+    if not lines:
+        return None
+    first_field = next(csv.reader(lines))[0]
+    return int(first_field) if first_field.isdigit() else None
+
+
+def scan_csv(csv_path):
+    """
+    Full scan fallback: reads every row to find the header, row count
+    and last timestamp (assumed to be in the first column).
+    """
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        row_count = 0
+        last_row = None
+        for row in reader:
+            if row:
+                last_row = row
+                row_count += 1
+    last_ts = int(last_row[0]) if last_row else None
+    return {'header': header, 'last_ts': last_ts, 'row_count': row_count}
+
+
+def read_version(csv_path):
+    """Version of the rows' derivation recorded in the sidecar; 1 if it records none."""
+    try:
+        with open(sidecar_path(csv_path)) as f:
+            return json.load(f).get('version', 1)
+    except (OSError, ValueError, AttributeError):
+        return 1
+
+
+def write_sidecar(csv_path, header, last_ts, row_count, version=None):
+    """
+    Records the CSV's watermark. `version` identifies how the rows were
+    derived (see residual_load_with_prices); None keeps the recorded one.
+    """
+    meta = {
+        'schema_hash': schema_hash(header),
+        'last_ts': last_ts,
+        'row_count': row_count,
+        'size_bytes': os.path.getsize(csv_path),
+        'version': read_version(csv_path) if version is None else version,
+    }
+    path = sidecar_path(csv_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return meta
+
+
+def commit_rows(csv_path, header, rows, row_count, create=False, version=None):
+    """
+    Durably appends `rows` (a new file with `header` if `create`) and then
+    moves the sidecar to the new last row. The CSV is fsynced before the
+    sidecar is replaced, so the sidecar only ever points at rows on disk;
+    `row_count` is the total number of data rows after the append. The
+    append is bracketed by an append marker, so discard_uncommitted can
+    truncate the bytes of an append that was cut short. `version` is
+    recorded in the sidecar (None keeps the recorded one).
+    """
+    mark_appending(csv_path, 0 if create else os.path.getsize(csv_path))
+    with open(csv_path, 'w' if create else 'a', newline='') as f:
+        writer = csv.writer(f)
+        if create:
+            writer.writerow(header)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    meta = write_sidecar(csv_path, header, rows[-1][0], row_count, version)
+    clear_appending(csv_path)
+    return meta
+
+
+def insert_rows(csv_path, header, rows, row_count):
+    """
+    Merges time-sorted `rows` into the CSV at their positions (e.g. backfilled
+    gaps), via a copy that atomically replaces it (an insert cannot be
+    appended). Existing lines are copied byte-for-byte and rows whose
+    timestamp is already present are skipped. Returns the inserted rows;
+    `row_count` is the total before.
+    """
+    csv_path = Path(csv_path)
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    position = 0
+    inserted = []
+    with open(csv_path, 'r', newline='') as src, open(tmp_path, 'w', newline='') as dst:
+        writer = csv.writer(dst)
+        dst.write(src.readline())
+        for line in src:
+            first_field = line.split(',', 1)[0]
+            ts = int(first_field) if first_field.isdigit() else None
+            while ts is not None and position < len(rows) and rows[position][0] <= ts:
+                if rows[position][0] != ts:
+                    writer.writerow(rows[position])
+                    inserted.append(rows[position])
+                position += 1
+            dst.write(line)
+        for row in rows[position:]:
+            writer.writerow(row)
+            inserted.append(row)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, csv_path)
+    write_sidecar(csv_path, header, read_last_timestamp(csv_path), row_count + len(inserted))
+    return inserted
+
+
+def truncate_rows(csv_path, header, before_ts, version=None):
+    """
+    Drops the rows from `before_ts` on (e.g. to fetch them again), via a copy
+    that atomically replaces the CSV, and records `version` in the sidecar.
+    Returns the new watermark.
+    """
+    csv_path = Path(csv_path)
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    row_count = 0
+    last_ts = None
+    with open(csv_path, 'r', newline='') as src, open(tmp_path, 'w', newline='') as dst:
+        dst.write(src.readline())
+        for line in src:
+            first_field = line.split(',', 1)[0]
+            if not first_field.isdigit():
+                continue
+            if int(first_field) >= before_ts:
+                break
+            dst.write(line)
+            row_count += 1
+            last_ts = int(first_field)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, csv_path)
+    meta = write_sidecar(csv_path, header, last_ts, row_count, version)
+    return {'header': header, 'last_ts': last_ts, 'row_count': row_count, 'version': meta['version']}
+
+
+# --- Append marker ---
+# commit_rows writes `<csv>.appending` with the CSV's size before it appends and
+# removes it once the sidecar points at the new rows. If it is still there, the
+# bytes after that size belong to an append that did not finish.
+
+def appending_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".appending")
+
+
+def mark_appending(csv_path, size_bytes):
+    path = appending_path(csv_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'size_bytes': size_bytes}, f)
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def clear_appending(csv_path):
+    appending_path(csv_path).unlink(missing_ok=True)
+
+
+# --- Pending store update ---
+# insert_rows changes the CSV before its rows reach the columnar store and the
+# monthly aggregates, so `<csv>.pending` is written before the insert and
+# removed once both are updated. While it exists the store and aggregates may
+# miss rows of the CSV; the next run rebuilds them from the CSV.
+
+def pending_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".pending")
+
+
+def has_pending(csv_path):
+    return pending_path(csv_path).exists()
+
+
+def mark_pending(csv_path):
+    with open(pending_path(csv_path), 'w') as f:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def clear_pending(csv_path):
+    pending_path(csv_path).unlink(missing_ok=True)
+
+
+# --- Gap index ---
+# Expected rows that are missing from the CSV (before its last row) are kept
+# in `<csv>.gaps.json` as ranges [start, end] of slots spaced `step` seconds,
+# with the reason they are missing and how often a backfill was attempted.
+# The index is written even when it is empty, so a CSV without one (e.g. one
+# written before the index existed) is recognized and scanned for its holes.
+
+# Missing slots are re-requested on this many runs; after that they are kept as known gaps
+MAX_BACKFILL_ATTEMPTS = 3
+
+
+def gaps_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".gaps.json")
+
+
+def has_gap_index(csv_path):
+    return gaps_path(csv_path).exists()
+
+
+def read_gaps(csv_path):
+    try:
+        with open(gaps_path(csv_path)) as f:
+            return json.load(f)['gaps']
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def write_gaps(csv_path, gaps):
+    path = gaps_path(csv_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'gaps': gaps}, f, indent=2)
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def gap_slots(gaps):
+    """Expands gap ranges to {timestamp: range}."""
+    return {ts: gap for gap in gaps for ts in range(gap['start'], gap['end'] + 1, gap['step'])}
+
+
+def scan_missing_slots(csv_path, step):
+    """Timestamps of the slots (every `step` seconds) between the CSV's first and last row without a row."""
+    missing = []
+    previous = None
+    with open(csv_path, 'r', newline='') as f:
+        f.readline()
+        for line in f:
+            first_field = line.split(',', 1)[0]
+            if not first_field.isdigit():
+                continue
+            ts = int(first_field)
+            if previous is not None:
+                missing.extend(range(previous + step, ts, step))
+            previous = ts
+    return missing
+
+
+def build_gaps(slots, step):
+    """
+    Compresses {timestamp: (reason, attempts)} into sorted ranges of
+    consecutive slots with the same reason and attempt count.
+    """
+    gaps = []
+    for ts in sorted(slots):
+        reason, attempts = slots[ts]
+        last = gaps[-1] if gaps else None
+        if (last and last['end'] + step == ts and last['reason'] == reason
+                and last['attempts'] == attempts):
+            last['end'] = ts
+        else:
+            gaps.append({'start': ts, 'end': ts, 'step': step, 'reason': reason, 'attempts': attempts})
+    return gaps
+
+
+def discard_uncommitted(csv_path):
+    """
+    Truncates the bytes of an append that commit_rows did not finish (its
+    append marker is still there), i.e. the partial chunk of an interrupted
+    run, and removes the marker. If the sidecar already records the file's
+    size, the append was committed and only the marker is removed. Without
+    a marker the file is left alone; read_watermark rescans a CSV that does
+    not match its sidecar. Returns the number of bytes removed.
+    """
+    csv_path = Path(csv_path)
+    try:
+        with open(appending_path(csv_path)) as f:
+            committed_size = json.load(f)['size_bytes']
+        size = os.path.getsize(csv_path)
+    except (OSError, ValueError, KeyError):
+        return 0
+    try:
+        with open(sidecar_path(csv_path)) as f:
+            committed = json.load(f).get('size_bytes') == size
+    except (OSError, ValueError, AttributeError):
+        committed = False
+    if committed or size <= committed_size:
+        clear_appending(csv_path)
+        return 0
+
+    with open(csv_path, 'r+b') as f:
+        f.truncate(committed_size)
+        f.flush()
+        os.fsync(f.fileno())
+    clear_appending(csv_path)
+    return size - committed_size
+
+
+def read_watermark(csv_path, persist=False):
+    """
+    Returns {'header', 'last_ts', 'row_count', 'version'} for the CSV, or None if it does not exist.
+
+    The sidecar makes this O(1): it is trusted only if its schema hash matches
+    the header, its recorded size matches the file and its last timestamp
+    matches the last line found by seeking from the end. Otherwise the CSV is
+    scanned in full; only the writer (the fetch script) passes `persist` to
+    rewrite the sidecar, readers such as the app and the reports never touch it.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return None
+
+    header = read_header(csv_path)
+    if not header:
+        return None
+
+    try:
+        with open(sidecar_path(csv_path)) as f:
+            meta = json.load(f)
+        consistent = (
+            meta['schema_hash'] == schema_hash(header)
+            and meta['size_bytes'] == os.path.getsize(csv_path)
+            and meta['last_ts'] == read_last_timestamp(csv_path)
+        )
+        if consistent:
+            return {'header': header, 'last_ts': meta['last_ts'], 'row_count': meta['row_count'],
+                    'version': meta.get('version', 1)}
+        print(f"Sidecar for {csv_path} is out of date. Rescanning...")
+    except (OSError, ValueError, KeyError):
+        print(f"No valid sidecar for {csv_path}. Scanning file...")
+
+    try:
+        watermark = scan_csv(csv_path)
+    except (ValueError, IndexError) as e:
+        print(f"Error reading last timestamp: {e}")
+        return {'header': header, 'last_ts': None, 'row_count': 0, 'version': read_version(csv_path)}
+    if not persist:
+        watermark['version'] = read_version(csv_path)
+        return watermark
+    meta = write_sidecar(csv_path, watermark['header'], watermark['last_ts'], watermark['row_count'])
+    watermark['version'] = meta['version']
+    return watermark
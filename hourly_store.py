@@ -0,0 +1,203 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = Path("hourly_store")
+# Same layout for the 15-minute dataset
+QUARTER_HOURLY_STORE_DIR = Path("quarter_hourly_store")
+# Multi-country hourly data: one store per bidding zone under zone=<zone>/
+ZONE_STORE_DIR = Path("zone_store")
+
+# Row spacing of the two datasets in seconds
+HOUR = 3600
+QUARTER_HOUR = 900
+
+# Typed schema of the stored measures (the CSV columns after the two time columns)
+MEASURE_COLUMNS = [
+    'net_load_mw_avg',
+    'renewable_generation_mw_avg',
+    'solar_mw_avg',
+    'residual_load_mw_avg',
+    'day_ahead_price_eur_mwh',
+]
+STORE_COLUMNS = ['timestamp_unix'] + MEASURE_COLUMNS + ['year', 'month', 'date']
+
+
+def add_calendar_columns(df):
+    """
+    Adds int16 `year`, int8 `month` and day-resolution `date` (UTC) derived
+    from the integer `timestamp_unix` column, without any string parsing.
+    """
+    days = df['timestamp_unix'].to_numpy(dtype=np.int64) // 86400
+    dates = days.astype('datetime64[D]')
+    df['year'] = (dates.astype('datetime64[Y]').astype(np.int64) + 1970).astype(np.int16)
+    df['month'] = (dates.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+    df['date'] = dates.astype('datetime64[s]')
+    return df
+
+
+def infer_resolution(df):
+    """
+    Row spacing of a frame in seconds: the smallest gap between consecutive
+    timestamps. Frames with fewer than two rows are taken to be hourly.
+    """
+    gaps = np.diff(df['timestamp_unix'].to_numpy(dtype=np.int64))
+    gaps = gaps[gaps > 0]
+    return int(gaps.min()) if len(gaps) else HOUR
+
+
+def complete_hour_runs(ts):
+    """
+    For strictly increasing 15-minute timestamps, returns (hours, first):
+    the hour start of every timestamp and the positions of the first
+    quarter of each hour that has all four quarters. Every hour is one
+    contiguous run, so the quarters of hour k sit at first[k] .. first[k] + 3.
+    """
+    hours = ts - ts % HOUR
+    run_starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, len(hours)])
+    return hours, run_starts[run_lengths == 4]
+
+
+def resample_to_hourly(df):
+    """
+    Averages a quarter-hour frame (sorted by `timestamp_unix`) to hourly rows
+    with the same columns. Hours missing any quarter are dropped; calendar
+    and `datetime` columns are recomputed for the hour starts.
+    """
+    ts = df['timestamp_unix'].to_numpy(dtype=np.int64)
+    hours, first = complete_hour_runs(ts)
+    result = pd.DataFrame({'timestamp_unix': hours[first]})
+    for column in MEASURE_COLUMNS:
+        if column in df.columns:
+            values = df[column].to_numpy(dtype=np.float64)
+            result[column] = (values[first] + values[first + 1] + values[first + 2] + values[first + 3]) / 4
+    add_calendar_columns(result)
+    if 'datetime' in df.columns:
+        result['datetime'] = pd.to_datetime(result['timestamp_unix'], unit='s', utc=True)
+    return result[[c for c in df.columns if c in result.columns]]
+
+
+def rows_to_frame(rows):
+    """
+    Converts CSV-style rows (timestamp, datetime string, measures...) into a
+    typed frame with the store schema.
+    """
+    df = pd.DataFrame(
+        [(row[0], *row[2:]) for row in rows],
+        columns=['timestamp_unix'] + MEASURE_COLUMNS,
+    )
+    df['timestamp_unix'] = df['timestamp_unix'].astype(np.int64)
+    df[MEASURE_COLUMNS] = df[MEASURE_COLUMNS].astype(np.float64)
+    return add_calendar_columns(df)
+
+
+def partition_path(year, month, root=STORE_DIR):
+    return Path(root) / f"{int(year):04d}-{int(month):02d}.parquet"
+
+
+def list_partitions(root=STORE_DIR):
+    """Returns the (year, month) keys of all stored partitions, oldest first."""
+    keys = []
+    for path in Path(root).glob('*.parquet'):
+        year, month = path.stem.split('-')
+        keys.append((int(year), int(month)))
+    return sorted(keys)
+
+
+def _write_partition(df, year, month, root):
+    path = partition_path(year, month, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    df[STORE_COLUMNS].to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def upsert_frame(df, root=STORE_DIR):
+    """
+    Merges new rows into their year-month partitions. Only the partitions
+    the rows fall into are read and rewritten; existing rows with the same
+    timestamp are replaced.
+    """
+    for (year, month), part in df.groupby(['year', 'month'], sort=True):
+        path = partition_path(year, month, root)
+        if path.exists():
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            part = part.drop_duplicates('timestamp_unix', keep='last')
+        part = part.sort_values('timestamp_unix', ignore_index=True)
+        _write_partition(part, year, month, root)
+
+
+def rebuild_from_csv(csv_path, root=STORE_DIR):
+    """Rewrites the whole store from the dataset's CSV (e.g. after a full re-fetch)."""
+    df = pd.read_csv(csv_path, usecols=['timestamp_unix'] + MEASURE_COLUMNS, float_precision='round_trip')
+    df['timestamp_unix'] = df['timestamp_unix'].astype(np.int64)
+    add_calendar_columns(df)
+    for path in Path(root).glob('*.parquet'):
+        path.unlink()
+    upsert_frame(df, root)
+
+
+def last_timestamp(root=STORE_DIR):
+    """Latest stored timestamp, read from the newest partition only."""
+    partitions = list_partitions(root)
+    if not partitions:
+        return None
+    last = pd.read_parquet(partition_path(*partitions[-1], root), columns=['timestamp_unix'])
+    return int(last['timestamp_unix'].max()) if not last.empty else None
+
+
+def read_store(columns=None, years=None, months=None, root=STORE_DIR, since=None):
+    """
+    Reads the store into a DataFrame, loading only the requested measure
+    `columns` (default: all) and the partitions matching `years` / `months`
+    and, if given, from the (year, month) `since` on.
+    `timestamp_unix`, `year`, `month` and `date` are always included.
+    """
+    measures = MEASURE_COLUMNS if columns is None else [c for c in MEASURE_COLUMNS if c in columns]
+    wanted = ['timestamp_unix'] + measures + ['year', 'month', 'date']
+    frames = []
+    partitions = list_partitions(root)
+    for year, month in partitions:
+        if years is not None and year not in years:
+            continue
+        if months is not None and month not in months:
+            continue
+        if since is not None and (year, month) < tuple(since):
+            continue
+        frames.append(pd.read_parquet(partition_path(year, month, root), columns=wanted))
+    if not frames:
+        if partitions:
+            # No rows selected: an empty frame with the stored dtypes
+            return pd.read_parquet(partition_path(*partitions[0], root), columns=wanted).iloc[0:0]
+        return pd.DataFrame(columns=wanted)
+    return pd.concat(frames, ignore_index=True)
+
+
+def zone_root(zone, root=ZONE_STORE_DIR):
+    """Store directory of one bidding zone (hive-style `zone=<zone>`)."""
+    return Path(root) / f"zone={zone}"
+
+
+def list_zones(root=ZONE_STORE_DIR):
+    return sorted(path.name.split('=', 1)[1] for path in Path(root).glob('zone=*') if path.is_dir())
+
+
+def read_zones(zones=None, columns=None, years=None, months=None, root=ZONE_STORE_DIR):
+    """
+    Reads several zones' stores into one frame with a categorical `zone`
+    column, using the same column and partition pruning as read_store.
+    """
+    zones = list_zones(root) if zones is None else list(zones)
+    frames = []
+    for zone in zones:
+        df = read_store(columns, years, months, zone_root(zone, root))
+        df.insert(0, 'zone', zone)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=['zone'] + STORE_COLUMNS)
+    result = pd.concat(frames, ignore_index=True)
+    result['zone'] = pd.Categorical(result['zone'], categories=zones)
+    return result
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Residual load bins: fixed width, aligned to multiples of the width, so the
+# bins (and fitted values) of a period do not depend on what else is fitted
+LOAD_BIN_MW = 2500
+# Price quantiles per bin, as columns p10, p25, ...
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# Bins with fewer rows than this are left out of the curves
+MIN_BIN_ROWS = 5
+LOAD_COLUMN = 'residual_load_mw_avg'
+PRICE_COLUMN = 'day_ahead_price_eur_mwh'
+
+
+def quantile_column(q):
+    return f"p{round(q * 100):02d}"
+
+
+def _sorted_cells(keys, values):
+    """Sorts values by (key, value); returns (order, start of each key, rows per key)."""
+    order = np.lexsort((values, keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    return order, starts, counts
+
+
+def _cell_quantile(sorted_values, starts, counts, q):
+    """Quantile `q` of every cell of sorted values (linear interpolation, as np.quantile)."""
+    position = q * (counts - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, counts - 1)
+    low, high = sorted_values[starts + below], sorted_values[starts + above]
+    return low + (high - low) * (position - below)
+
+
+def isotonic_fit(values, weights):
+    """
+    Weighted non-decreasing least-squares fit of every row of a
+    groups x bins matrix at once. Bins with zero weight are ignored (NaN in
+    the result). Uses the min-max formula of isotonic regression,
+    fit[i] = max over j <= i of min over k >= i of mean(j..k), on prefix sums.
+    """
+    values = np.where(weights > 0, values, 0.0)
+    sum_w = np.concatenate([np.zeros((len(weights), 1)), np.cumsum(weights, axis=1)], axis=1)
+    sum_wy = np.concatenate([np.zeros((len(weights), 1)), np.cumsum(weights * values, axis=1)], axis=1)
+    bins = weights.shape[1]
+    j = np.arange(bins)[:, None]
+    k = np.arange(bins)[None, :]
+    # means[g, j, k]: weighted mean of bins j..k (NaN for k < j or no weight)
+    range_weights = sum_w[:, None, 1:] - sum_w[:, :-1, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (sum_wy[:, None, 1:] - sum_wy[:, :-1, None]) / range_weights
+    means[(range_weights <= 0) | (k < j)] = np.nan
+    lowest = np.fmin.accumulate(means[:, :, ::-1], axis=2)[:, :, ::-1]
+    fit = np.fmax.accumulate(lowest, axis=1)[:, np.arange(bins), np.arange(bins)]
+    fit[weights <= 0] = np.nan
+    return fit
+
+
+def fit_curves(df, by=('year', 'month'), load_column=LOAD_COLUMN, price_column=PRICE_COLUMN,
+               bin_mw=LOAD_BIN_MW, quantiles=QUANTILES, min_rows=MIN_BIN_ROWS):
+    """
+    Price vs residual load curves for every `by` period (columns of `df`,
+    e.g. ('year', 'month'), ('year',) or a week column).
+
+    Rows are put into `bin_mw` wide load bins with np.digitize; each
+    (period, bin) cell gets its row count, mean load (`load_mw`) and price
+    quantiles (linear interpolation, as np.quantile) from one sort of all
+    rows, and `fit` is a monotone (non-decreasing) least-squares fit of the
+    cell medians weighted by their row counts. Cells with fewer than
+    `min_rows` rows are dropped. One row per cell, ordered by period and load.
+    """
+    by = list(by)
+    load = df[load_column].to_numpy(dtype=np.float64)
+    price = df[price_column].to_numpy(dtype=np.float64)
+    valid = np.isfinite(load) & np.isfinite(price)
+    load, price = load[valid], price[valid]
+    columns = ['bin', 'load_mw', 'rows'] + [quantile_column(q) for q in quantiles] + ['fit']
+    if not valid.any():
+        return pd.DataFrame(columns=by + columns)
+
+    periods = df.loc[valid, by]
+    period_index = periods.groupby(by, sort=True).ngroup().to_numpy()
+    period_keys = periods.drop_duplicates().sort_values(by).reset_index(drop=True)
+
+    first = int(np.floor(load.min() / bin_mw))
+    edges = bin_mw * np.arange(first, int(np.floor(load.max() / bin_mw)) + 2, dtype=np.float64)
+    bin_index = np.digitize(load, edges) - 1
+    bins = len(edges) - 1
+
+    order, starts, counts = _sorted_cells(period_index * bins + bin_index, price)
+    cells = period_index[order][starts] * bins + bin_index[order][starts]
+    sorted_price = price[order]
+
+    result = period_keys.iloc[cells // bins].reset_index(drop=True)
+    result['bin'] = first + cells % bins
+    result['load_mw'] = np.add.reduceat(load[order], starts) / counts
+    result['rows'] = counts
+    for q in quantiles:
+        result[quantile_column(q)] = _cell_quantile(sorted_price, starts, counts, q)
+
+    median = _cell_quantile(sorted_price, starts, counts, 0.5)
+    kept = counts >= min_rows
+    weights = np.zeros((len(period_keys), bins))
+    medians = np.zeros((len(period_keys), bins))
+    weights[cells[kept] // bins, cells[kept] % bins] = counts[kept]
+    medians[cells[kept] // bins, cells[kept] % bins] = median[kept]
+    result['fit'] = isotonic_fit(medians, weights)[cells // bins, cells % bins]
+    return result[kept].reset_index(drop=True)[by + columns]
+
+
+def curve_for(curves, **period):
+    """The rows of `curves` for one period, e.g. curve_for(curves, year=2025, month=3)."""
+    mask = np.ones(len(curves), dtype=bool)
+    for column, value in period.items():
+        mask &= (curves[column] == value).to_numpy()
+    return curves[mask]
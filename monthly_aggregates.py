@@ -0,0 +1,236 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from hourly_csv import has_pending, read_watermark
+from hourly_store import HOUR, infer_resolution
+
+PRICE_COLUMN = 'day_ahead_price_eur_mwh'
+RESIDUAL_COLUMN = 'residual_load_mw_avg'
+
+# Residual load thresholds (MW) for the conditional average prices
+RES_LOW_THRESHOLD = 0
+RES_HIGH_THRESHOLD = 60000
+
+
+def monthly_market_stats(df, res_low=RES_LOW_THRESHOLD, res_high=RES_HIGH_THRESHOLD, resolution=None):
+    """
+    Per (year, month): average price, number of negative-price hours and the
+    average price in hours with residual load below `res_low` / above `res_high`.
+
+    The conditional prices are precomputed as masked columns (NaN outside the
+    condition), so everything is one groupby().agg pass without per-group
+    callbacks or filtered sub-frames. Months without qualifying hours get NaN.
+    Works on hourly and 15-minute frames (`resolution` in seconds, inferred
+    if None); on 15-minute data each negative quarter counts as 0.25 hours.
+    """
+    if resolution is None:
+        resolution = infer_resolution(df)
+    price = df[PRICE_COLUMN].to_numpy(dtype=np.float64)
+    residual = df[RESIDUAL_COLUMN].to_numpy(dtype=np.float64)
+    work = pd.DataFrame({
+        'year': df['year'].to_numpy(),
+        'month': df['month'].to_numpy(),
+        'price': price,
+        'negative': (price < 0) * (resolution / HOUR),
+        'price_res_neg': np.where(residual < res_low, price, np.nan),
+        'price_res_high': np.where(residual > res_high, price, np.nan),
+    })
+    return work.groupby(['year', 'month']).agg(
+        avg_price=('price', 'mean'),
+        neg_hours=('negative', 'sum'),
+        avg_price_res_neg=('price_res_neg', 'mean'),
+        avg_price_res_high=('price_res_high', 'mean'),
+    ).reset_index()
+
+
+# --- Materialized monthly aggregates ---
+# One row per year-month with additive sufficient statistics, maintained by
+# residual_load_with_prices.py after every fetch. Adding two months' rows gives
+# the statistics of their union, so appends only update the months they touch.
+
+AGGREGATES_FILE = Path("monthly_aggregates.csv")
+SOLAR_COLUMN = 'solar_mw_avg'
+
+SUM_COLUMNS = [
+    'hours',
+    'price_sum',
+    'neg_hours',
+    'solar_mwh',
+    'solar_revenue',
+    'solar_mwh_pos',
+    'solar_revenue_pos',
+    'res_neg_price_sum',
+    'res_neg_hours',
+    'res_high_price_sum',
+    'res_high_hours',
+]
+# Residual load thresholds the res_* sums were computed with
+THRESHOLD_COLUMNS = ['res_low_threshold', 'res_high_threshold']
+AGGREGATE_COLUMNS = ['year', 'month'] + SUM_COLUMNS + ['last_timestamp'] + THRESHOLD_COLUMNS
+
+
+def sufficient_statistics(df, resolution=None, res_low=RES_LOW_THRESHOLD, res_high=RES_HIGH_THRESHOLD):
+    """
+    Additive per-month statistics of hourly rows (see SUM_COLUMNS), with the
+    res_* sums over hours with residual load below `res_low` / above
+    `res_high` (recorded in THRESHOLD_COLUMNS). `last_timestamp` is the
+    latest hour covered in each month.
+
+    15-minute rows (`resolution` in seconds, inferred if None) are weighted
+    by their duration, so hours and MWh keep their units and every average
+    derived from the table is time-weighted.
+    """
+    if resolution is None:
+        resolution = infer_resolution(df)
+    price = df[PRICE_COLUMN].to_numpy(dtype=np.float64)
+    solar = df[SOLAR_COLUMN].to_numpy(dtype=np.float64)
+    residual = df[RESIDUAL_COLUMN].to_numpy(dtype=np.float64)
+    revenue = solar * price
+    positive = price >= 0
+    below = residual < res_low
+    above = residual > res_high
+
+    work = pd.DataFrame({
+        'year': df['year'].to_numpy(),
+        'month': df['month'].to_numpy(),
+        'hours': np.ones(len(df), dtype=np.int64),
+        'price_sum': price,
+        'neg_hours': (price < 0).astype(np.int64),
+        'solar_mwh': solar,
+        'solar_revenue': revenue,
+        'solar_mwh_pos': np.where(positive, solar, 0.0),
+        'solar_revenue_pos': np.where(positive, revenue, 0.0),
+        'res_neg_price_sum': np.where(below, price, 0.0),
+        'res_neg_hours': below.astype(np.int64),
+        'res_high_price_sum': np.where(above, price, 0.0),
+        'res_high_hours': above.astype(np.int64),
+        'last_timestamp': df['timestamp_unix'].to_numpy(dtype=np.int64),
+        'res_low_threshold': res_low,
+        'res_high_threshold': res_high,
+    })
+    if resolution != HOUR:
+        work[SUM_COLUMNS] = work[SUM_COLUMNS] * (resolution / HOUR)
+    return _combine(work)
+
+
+def _combine(frame):
+    # Rows computed with other thresholds are never added up
+    how = {c: 'sum' for c in SUM_COLUMNS}
+    how['last_timestamp'] = 'max'
+    return frame.groupby(['year', 'month'] + THRESHOLD_COLUMNS, as_index=False).agg(how)[AGGREGATE_COLUMNS]
+
+
+def read_aggregates(path=AGGREGATES_FILE):
+    if not Path(path).exists():
+        return None
+    table = pd.read_csv(path, float_precision='round_trip')
+    # Tables written before the thresholds were recorded used the defaults
+    if 'res_low_threshold' not in table:
+        table['res_low_threshold'] = RES_LOW_THRESHOLD
+    if 'res_high_threshold' not in table:
+        table['res_high_threshold'] = RES_HIGH_THRESHOLD
+    return table
+
+
+def has_thresholds(table, res_low=RES_LOW_THRESHOLD, res_high=RES_HIGH_THRESHOLD):
+    """True if every row of `table` was computed with the residual load thresholds `res_low` / `res_high`."""
+    return bool(((table['res_low_threshold'] == res_low) & (table['res_high_threshold'] == res_high)).all())
+
+
+def write_aggregates(table, path=AGGREGATES_FILE):
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    table.sort_values(['year', 'month']).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def rebuild_aggregates(df, path=AGGREGATES_FILE):
+    """Recomputes the table from the full hourly history."""
+    write_aggregates(sufficient_statistics(df), path)
+
+
+def update_aggregates(new_rows, path=AGGREGATES_FILE):
+    """
+    Adds the statistics of newly appended hourly rows. Only the months the
+    rows fall into change; all other rows of the table are carried over.
+    """
+    table = read_aggregates(path)
+    delta = sufficient_statistics(new_rows)
+    if table is not None:
+        delta = _combine(pd.concat([table, delta], ignore_index=True))
+    write_aggregates(delta, path)
+
+
+def aggregates_last_timestamp(path=AGGREGATES_FILE):
+    """Latest hour in the table, or None if it is missing, empty or was computed with other thresholds."""
+    table = read_aggregates(path)
+    if table is None or table.empty or not has_thresholds(table):
+        return None
+    return int(table['last_timestamp'].max())
+
+
+def load_current_aggregates(csv_path, path=AGGREGATES_FILE, res_low=RES_LOW_THRESHOLD, res_high=RES_HIGH_THRESHOLD):
+    """
+    The materialized table if it covers exactly the data in `csv_path`
+    (same last timestamp as the CSV sidecar, and no backfill insert waiting
+    to reach it) and its res_* sums use the thresholds `res_low` / `res_high`,
+    otherwise None: callers then compute the statistics from the rows.
+    """
+    table = read_aggregates(path)
+    watermark = read_watermark(csv_path)
+    if table is None or table.empty or watermark is None or has_pending(csv_path):
+        return None
+    if not has_thresholds(table, res_low, res_high):
+        return None
+    if int(table['last_timestamp'].max()) != watermark['last_ts']:
+        return None
+    return table
+
+
+def market_stats_from_aggregates(table):
+    """Same columns as monthly_market_stats, derived from the materialized table."""
+    return pd.DataFrame({
+        'year': table['year'],
+        'month': table['month'],
+        'avg_price': table['price_sum'] / table['hours'],
+        'neg_hours': table['neg_hours'].astype(np.float64),
+        'avg_price_res_neg': table['res_neg_price_sum'] / table['res_neg_hours'].where(table['res_neg_hours'] > 0),
+        'avg_price_res_high': table['res_high_price_sum'] / table['res_high_hours'].where(table['res_high_hours'] > 0),
+    })
+
+
+# --- Report years ---
+# The reports cover a rolling window of the most recent years present in the
+# data, so a new year needs no code changes and old ones drop out.
+REPORT_YEARS = int(os.environ.get("REPORT_YEARS", "3"))
+
+
+def report_years(years, window=REPORT_YEARS):
+    """The last `window` distinct values of `years` (e.g. a year column), oldest first."""
+    return sorted(int(year) for year in pd.unique(pd.Series(years).dropna()))[-window:]
+
+
+def filter_report_years(frame, window=REPORT_YEARS):
+    """Returns (rows of `frame` in its report years, those years)."""
+    years = report_years(frame['year'], window)
+    return frame[frame['year'].isin(years)], years
+
+
+def pivot_by_year(table, values, index='month', name="{metric}_{year}", labels=None, year_major=False):
+    """
+    Spreads `values` of a per-(year, `index`) table into one column per metric
+    and year present, named by the `name` template (`labels` maps metrics to
+    the text used for {metric}). Columns are ordered metric by metric, or
+    year by year with `year_major`; `index` is returned as a column.
+    """
+    labels = labels or {}
+    years = sorted(table['year'].unique())
+    wide = table.pivot(index=index, columns='year', values=list(values))
+    pairs = [(metric, year) for year in years for metric in values] if year_major else \
+        [(metric, year) for metric in values for year in years]
+    wide = wide[pairs]
+    wide.columns = [name.format(metric=labels.get(metric, metric), year=year) for metric, year in pairs]
+    return wide.reset_index()
@@ -1,107 +1,219 @@
-import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib import patheffects
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.colors import to_rgb
+from matplotlib.patches import Patch
 from pathlib import Path
 import calendar
+import os
+import time
+
+import numpy as np
+
+from data_loader import load_hourly
+from merit_order import fit_curves
+from monthly_aggregates import report_years
+from scatter_binning import bin_edges
+from time_index import TimeIndex
 
 # Config
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
 OUTPUT_PDF = Path("monthly_scatter_plots.pdf")
+# How the points are drawn: "vector" (every point a vector marker; the PDF grows
+# with every year of data), "raster" (markers rasterized at SCATTER_DPI, axes and
+# text stay vector), "density" (one 2D histogram image per series) or "auto"
+SCATTER_RENDER = os.environ.get("SCATTER_RENDER", "auto")
+SCATTER_DPI = int(os.environ.get("SCATTER_DPI", "150"))
+# "auto" rasterizes pages with more points than this. A vector marker takes
+# about 13 bytes and a rasterized page about 175 KB at 150 dpi, so below this
+# vector pages are smaller; above it page sizes stay roughly constant.
+RASTER_POINT_LIMIT = 15000
+# Bins per axis of the density images
+DENSITY_BINS = 120
+# Series colors, assigned to the report years oldest first
+YEAR_COLORS = ['skyblue', 'orange', 'green', 'purple', 'brown', 'gray']
+# Set to 0 to leave out the fitted merit-order curves (median price per load bin, made monotone)
+MERIT_ORDER_CURVES = os.environ.get("MERIT_ORDER_CURVES", "1") == "1"
 
-def main():
-    if not INPUT_FILE.exists():
-        print(f"Error: {INPUT_FILE} not found.")
+def draw_series(series, render=SCATTER_RENDER):
+    """
+    Draws (x, y, style) point series on the current axes. Styles are
+    plt.scatter keyword arguments with a `label` and a `color`.
+    """
+    if render == "auto":
+        render = "vector" if sum(len(x) for x, _, _ in series) <= RASTER_POINT_LIMIT else "raster"
+    if render == "vector":
+        for x, y, style in series:
+            plt.scatter(x, y, **style)
+        plt.legend()
+        return
+    if render == "raster":
+        # Everything below zorder 1 (the points, not grid, lines or text) is
+        # composited into one image per page
+        for x, y, style in series:
+            plt.scatter(x, y, zorder=0.5, **style)
+        plt.gca().set_rasterization_zorder(1)
+        plt.legend()
         return
 
-    print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['year'] = df['datetime'].dt.year
-    df['month'] = df['datetime'].dt.month
-    
-    # Filter for relevant years
-    df = df[df['year'].isin([2024, 2025, 2026])]
-
-    print(f"Generating scatter plots to {OUTPUT_PDF}...")
-    
-    with PdfPages(OUTPUT_PDF) as pdf:
-        for month_num in range(1, 13):
-            month_name = calendar.month_name[month_num]
-            print(f"  Plotting {month_name}...")
-            
-            # Filter data for this month
-            month_data = df[df['month'] == month_num]
-            
-            if month_data.empty:
-                print(f"    No data for {month_name}, skipping.")
+    # Shared edges so the images of all series line up
+    x_edges = bin_edges(np.concatenate([x for x, _, _ in series]), DENSITY_BINS)
+    y_edges = bin_edges(np.concatenate([y for _, y, _ in series]), DENSITY_BINS)
+    handles = []
+    for x, y, style in series:
+        counts, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges])
+        # Opacity grows with the square root of the count so sparse cells stay visible
+        image = np.zeros(counts.shape[::-1] + (4,))
+        image[..., :3] = to_rgb(style['color'])
+        image[..., 3] = np.sqrt(counts.T / counts.max()) * 0.9
+        plt.imshow(image, origin='lower', aspect='auto', interpolation='nearest',
+                   extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+        handles.append(Patch(color=style['color'], label=style['label']))
+    plt.legend(handles=handles)
+
+def draw_curves(frames):
+    """Draws the fitted merit-order curve of every (rows of one year, color) over the points."""
+    for data_year, color in frames:
+        curve = fit_curves(data_year, by=['year'])
+        if not curve.empty:
+            plt.plot(curve['load_mw'], curve['fit'], color=color, linewidth=2.5, zorder=3,
+                     path_effects=[patheffects.withStroke(linewidth=4, foreground='black', alpha=0.5)])
+
+def month_figure(index, month_num, render=SCATTER_RENDER):
+    """Scatter page for one calendar month with one series per year in `index` (a TimeIndex), or None without data."""
+    # Rows of this month in every year
+    years = index.years()
+    month_data = [(year, index.month(year, month_num)) for year in years]
+
+    if all(data_year.empty for _, data_year in month_data):
+        return None
+
+    fig = plt.figure(figsize=(10, 7))
+
+    # Colors follow the position of the year in the whole frame, so they match across pages
+    series = []
+    frames = []
+    for position, (year, data_year) in enumerate(month_data):
+        color = YEAR_COLORS[position % len(YEAR_COLORS)]
+        if not data_year.empty:
+            series.append((data_year['residual_load_mw_avg'].to_numpy(), data_year['day_ahead_price_eur_mwh'].to_numpy(),
+                           dict(alpha=0.5, label=str(year), s=10, color=color)))
+            frames.append((data_year, color))
+    draw_series(series, render)
+    if MERIT_ORDER_CURVES:
+        draw_curves(frames)
+
+    plt.title(f"Residual Load vs Price - {calendar.month_name[month_num]}", fontsize=14)
+    plt.xlabel("Residual Load (MW)", fontsize=12)
+    plt.ylabel("Day-Ahead Price (EUR/MWh)", fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.6)
+
+    # Add zero lines for reference
+    plt.axhline(0, color='black', linewidth=0.8, linestyle='-')
+    plt.axvline(0, color='black', linewidth=0.8, linestyle='-')
+
+    plt.tight_layout()
+    return fig
+
+def latest_month_comparison_figure(index, render=SCATTER_RENDER):
+    """Last page: the latest month in `index` (a TimeIndex) against the same month a year before."""
+    fig = plt.figure(figsize=(10, 7))
+
+    # The frame is sorted by time, so the latest month is that of the last row
+    year, month_num = index.months()[-1]
+    previous = index.month(year - 1, month_num)
+    current = index.month(year, month_num)
+    abbr = calendar.month_abbr[month_num]
+
+    series = []
+    if not previous.empty:
+        series.append((previous['residual_load_mw_avg'].to_numpy(), previous['day_ahead_price_eur_mwh'].to_numpy(),
+                       dict(alpha=0.5, label=f'{abbr} {year - 1}', s=15, color='orange', marker='o')))
+    if not current.empty:
+        series.append((current['residual_load_mw_avg'].to_numpy(), current['day_ahead_price_eur_mwh'].to_numpy(),
+                       dict(alpha=0.6, label=f'{abbr} {year}', s=15, color='green', marker='x')))
+    if series:
+        draw_series(series, render)
+        if MERIT_ORDER_CURVES:
+            draw_curves([(previous, 'orange'), (current, 'green')])
+
+    plt.title(f"Residual Load vs Price - {calendar.month_name[month_num]} {year - 1} vs {year}", fontsize=14)
+    plt.xlabel("Residual Load (MW)", fontsize=12)
+    plt.ylabel("Day-Ahead Price (EUR/MWh)", fontsize=12)
+    plt.grid(True, linestyle='--', alpha=0.6)
+
+    plt.axhline(0, color='black', linewidth=0.8, linestyle='-')
+    plt.axvline(0, color='black', linewidth=0.8, linestyle='-')
+
+    plt.tight_layout()
+    return fig
+
+# Pages in PDF order: (page function, month or None)
+PAGES = [(month_figure, month_num) for month_num in range(1, 13)] + [(latest_month_comparison_figure, None)]
+
+def page_title(page):
+    function, month_num = PAGES[page]
+    return calendar.month_name[month_num] if month_num else "Latest Month vs Previous Year Comparison"
+
+def report_index(df):
+    """TimeIndex over the rows of the most recent REPORT_YEARS years of `df` (sorted by time)."""
+    full = TimeIndex(df)
+    years = report_years(full.years())
+    return TimeIndex(full.year(years[0], years[-1]))
+
+def build_page(index, page, render=SCATTER_RENDER):
+    function, month_num = PAGES[page]
+    return function(index, render=render) if month_num is None else function(index, month_num, render=render)
+
+def write_pdf(pages, path=OUTPUT_PDF, dpi=SCATTER_DPI):
+    """
+    Saves (page, figure or None, build seconds) in the given order into one
+    PDF and prints each page's size and time (build + write). The size of a
+    page is the growth of the file while it is written; raster images and
+    fonts are stored at the end of the file and counted only in the total.
+    Returns (pages written, build seconds, write seconds).
+    """
+    written = 0
+    build_time = 0.0
+    write_time = 0.0
+    with open(path, 'wb') as f, PdfPages(f) as pdf:
+        for page, fig, seconds in pages:
+            build_time += seconds
+            if fig is None:
+                print(f"  {page_title(page)}: no data, skipping.")
                 continue
+            started = time.perf_counter()
+            position = f.tell()
+            # Save to PDF page; rasterized layers are rendered at `dpi`
+            pdf.savefig(fig, dpi=dpi)
+            plt.close(fig)
+            elapsed = time.perf_counter() - started
+            write_time += elapsed
+            written += 1
+            print(f"  {page_title(page)}: {(seconds + elapsed) * 1000:.0f} ms, {(f.tell() - position) / 1024:.0f} KB")
+    return written, build_time, write_time
 
-            plt.figure(figsize=(10, 7))
-            
-            # Plot 2024
-            data_2024 = month_data[month_data['year'] == 2024]
-            if not data_2024.empty:
-                plt.scatter(data_2024['residual_load_mw_avg'], data_2024['day_ahead_price_eur_mwh'], 
-                            alpha=0.5, label='2024', s=10, color='skyblue')
-            
-            # Plot 2025
-            data_2025 = month_data[month_data['year'] == 2025]
-            if not data_2025.empty:
-                plt.scatter(data_2025['residual_load_mw_avg'], data_2025['day_ahead_price_eur_mwh'], 
-                            alpha=0.5, label='2025', s=10, color='orange')
-
-            # Plot 2026
-            data_2026 = month_data[month_data['year'] == 2026]
-            if not data_2026.empty:
-                plt.scatter(data_2026['residual_load_mw_avg'], data_2026['day_ahead_price_eur_mwh'], 
-                            alpha=0.5, label='2026', s=10, color='green')
-            
-            plt.title(f"Residual Load vs Price - {month_name}", fontsize=14)
-            plt.xlabel("Residual Load (MW)", fontsize=12)
-            plt.ylabel("Day-Ahead Price (EUR/MWh)", fontsize=12)
-            plt.grid(True, linestyle='--', alpha=0.6)
-            plt.legend()
-            
-            # Add zero lines for reference
-            plt.axhline(0, color='black', linewidth=0.8, linestyle='-')
-            plt.axvline(0, color='black', linewidth=0.8, linestyle='-')
-            
-            plt.tight_layout()
-            
-            # Save to PDF page
-            pdf.savefig()
-            plt.close()
-
-        # --- Jan 2025 vs Jan 2026 Comparison ---
-        print("  Plotting Jan 2025 vs Jan 2026 Comparison...")
-        plt.figure(figsize=(10, 7))
-        
-        jan_data = df[df['month'] == 1]
-        jan_2025 = jan_data[jan_data['year'] == 2025]
-        jan_2026 = jan_data[jan_data['year'] == 2026]
-        
-        if not jan_2025.empty:
-            plt.scatter(jan_2025['residual_load_mw_avg'], jan_2025['day_ahead_price_eur_mwh'],
-                        alpha=0.5, label='Jan 2025', s=15, color='orange', marker='o')
-        
-        if not jan_2026.empty:
-            plt.scatter(jan_2026['residual_load_mw_avg'], jan_2026['day_ahead_price_eur_mwh'],
-                        alpha=0.6, label='Jan 2026', s=15, color='green', marker='x')
-
-        plt.title("Residual Load vs Price - January 2025 vs 2026", fontsize=14)
-        plt.xlabel("Residual Load (MW)", fontsize=12)
-        plt.ylabel("Day-Ahead Price (EUR/MWh)", fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.6)
-        plt.legend()
-        
-        plt.axhline(0, color='black', linewidth=0.8, linestyle='-')
-        plt.axvline(0, color='black', linewidth=0.8, linestyle='-')
-        
-        plt.tight_layout()
-        pdf.savefig()
-        plt.close()
-
-    print(f"Done. PDF saved to {OUTPUT_PDF.absolute()}")
+def main(df=None):
+    if df is None:
+        if not INPUT_FILE.exists():
+            print(f"Error: {INPUT_FILE} not found.")
+            return
+
+        print(f"Loading data from {INPUT_FILE}...")
+        df = load_hourly(INPUT_FILE, columns=['residual_load_mw_avg', 'day_ahead_price_eur_mwh'])
+    # The most recent REPORT_YEARS years in the data
+    index = report_index(df)
+
+    print(f"Generating scatter plots to {OUTPUT_PDF} ({SCATTER_RENDER}, {SCATTER_DPI} dpi)...")
+
+    def pages():
+        for page in range(len(PAGES)):
+            started = time.perf_counter()
+            fig = build_page(index, page)
+            yield page, fig, time.perf_counter() - started
+
+    write_pdf(pages())
+    print(f"Done. PDF saved to {OUTPUT_PDF.absolute()} ({OUTPUT_PDF.stat().st_size / 1024:.0f} KB)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import INPUT_FILE, cached_product, load_hourly
+from hourly_store import HOUR, infer_resolution
+from monthly_aggregates import PRICE_COLUMN, SOLAR_COLUMN
+
+# All calendar dimensions (year, month, hour, day type) follow German local time
+LOCAL_TIMEZONE = 'Europe/Berlin'
+
+DIMENSIONS = ['year', 'month', 'hour', 'day_type']
+MEASURES = ['hours', 'price_sum', 'price_sq_sum', 'solar_mwh', 'solar_revenue', 'neg_hours']
+# `day_type` codes: Monday to Friday, Saturday, and Sundays together with public holidays
+DAY_TYPES = ['Workday', 'Saturday', 'Sunday/Holiday']
+
+
+def easter_sundays(years):
+    """Easter Sunday of every year (Gregorian calendar, anonymous algorithm), as datetime64[D]."""
+    y = np.asarray(years, dtype=np.int64)
+    a, b, c = y % 19, y // 100, y % 100
+    h = (19 * a + b - b // 4 - (b - (b + 8) // 25 + 1) // 3 + 15) % 30
+    l = (32 + 2 * (b % 4) + 2 * (c // 4) - h - c % 4) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return (y - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1) + (day - 1).astype('timedelta64[D]')
+
+
+def german_holidays(years):
+    """
+    The nationwide German public holidays of `years` as datetime64[D]: New
+    Year, Good Friday, Easter Monday, Labour Day, Ascension, Whit Monday,
+    German Unity Day and Christmas. Holidays of single states are not included.
+    """
+    years = np.unique(np.asarray(years, dtype=np.int64))
+    starts = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    fixed = [(starts.astype('datetime64[M]') + month - 1).astype('datetime64[D]') + day - 1
+             for month, day in [(1, 1), (5, 1), (10, 3), (12, 25), (12, 26)]]
+    easter = easter_sundays(years)
+    movable = [easter + np.timedelta64(offset, 'D') for offset in (-2, 1, 39, 50)]
+    return np.sort(np.concatenate(fixed + movable))
+
+
+def day_types(local):
+    """`day_type` code (see DAY_TYPES) of every local datetime in the Series `local`."""
+    weekday = local.dt.weekday.to_numpy()
+    local_date = local.dt.tz_localize(None).to_numpy().astype('datetime64[D]')
+    holiday = np.isin(local_date, german_holidays(local.dt.year.unique()))
+    return np.where(holiday | (weekday == 6), 2, np.where(weekday == 5, 1, 0)).astype(np.int8)
+
+
+def build_cube(df, resolution=None):
+    """
+    Additive measures (see MEASURES) per cell of DIMENSIONS: local year,
+    month and hour of day, and day type (workday, Saturday, Sunday or
+    public holiday). Only cells with data are stored. Summing cells gives
+    the measures of any combination of them, e.g. hour x month or day type.
+    Rows without a price are left out; 15-minute rows are weighted by their
+    duration.
+    """
+    if resolution is None:
+        resolution = infer_resolution(df)
+    price = df[PRICE_COLUMN].to_numpy(dtype=np.float64)
+    # A missing solar value counts as no generation, so it does not void the cell's sums
+    solar = np.nan_to_num(df[SOLAR_COLUMN].to_numpy(dtype=np.float64))
+    valid = np.isfinite(price)
+    local = df['datetime'].dt.tz_convert(LOCAL_TIMEZONE)
+
+    work = pd.DataFrame({
+        'year': local.dt.year.to_numpy().astype(np.int16),
+        'month': local.dt.month.to_numpy().astype(np.int8),
+        'hour': local.dt.hour.to_numpy().astype(np.int8),
+        'day_type': day_types(local),
+        'hours': np.ones(len(df), dtype=np.int64),
+        'price_sum': price,
+        'price_sq_sum': price * price,
+        'solar_mwh': solar,
+        'solar_revenue': solar * price,
+        'neg_hours': (price < 0).astype(np.int64),
+    })[valid]
+    if resolution != HOUR:
+        work[MEASURES] = work[MEASURES] * (resolution / HOUR)
+    return work.groupby(DIMENSIONS, as_index=False, sort=True)[MEASURES].sum()
+
+
+def load_cube(csv_path=INPUT_FILE, df=None):
+    """
+    The cube of the dataset in `csv_path`, built once per data version and
+    cached with data_loader's frames. On a miss it is built from `df` (the
+    full dataset, loaded if None).
+    """
+    return cached_product(csv_path, 'cube', lambda: build_cube(load_hourly(csv_path) if df is None else df),
+                          extra=(tuple(DIMENSIONS + MEASURES), LOCAL_TIMEZONE))
+
+
+def slice_cube(cube, by, **filters):
+    """
+    Rolls the cube up to the `by` dimensions over the cells matching
+    `filters` (dimension=value or dimension=list of values), e.g.
+    slice_cube(cube, ['month', 'hour'], year=2025). Returns the summed
+    MEASURES and the derived `avg_price`, `price_std` and `pv_price`.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for dimension, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set, np.ndarray)) else [value]
+        mask &= np.isin(cube[dimension].to_numpy(), values)
+
+    # Every dimension is a small integer range, so the cells of the roll-up
+    # get a mixed-radix code and the sums are one np.bincount per measure
+    by = list(by)
+    codes = np.zeros(int(mask.sum()), dtype=np.int64)
+    ranges = []
+    for dimension in by:
+        values = cube[dimension].to_numpy()[mask].astype(np.int64)
+        low = int(values.min()) if len(values) else 0
+        size = int(values.max()) - low + 1 if len(values) else 1
+        codes = codes * size + (values - low)
+        ranges.append((low, size))
+    total = int(np.prod([size for _, size in ranges]))
+    occupied = np.flatnonzero(np.bincount(codes, minlength=total))
+
+    columns = {}
+    remainder = occupied
+    for dimension, (low, size) in reversed(list(zip(by, ranges))):
+        columns[dimension] = (remainder % size + low).astype(cube[dimension].dtype)
+        remainder = remainder // size
+    columns = {dimension: columns[dimension] for dimension in by}
+    for measure in MEASURES:
+        sums = np.bincount(codes, weights=cube[measure].to_numpy()[mask], minlength=total)[occupied]
+        columns[measure] = sums.astype(cube[measure].dtype)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hours = columns['hours'].astype(np.float64)
+        avg_price = columns['price_sum'] / hours
+        columns['avg_price'] = avg_price
+        columns['price_std'] = np.sqrt(np.maximum(columns['price_sq_sum'] / hours - avg_price ** 2, 0.0))
+        columns['pv_price'] = np.where(columns['solar_mwh'] > 0, columns['solar_revenue'] / columns['solar_mwh'], np.nan)
+    return pd.DataFrame(columns)
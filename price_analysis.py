@@ -1,55 +1,190 @@
-import pandas as pd
+import json
+import os
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_loader import load_hourly, store_is_current
+from hourly_csv import MAX_BACKFILL_ATTEMPTS, gap_slots, read_gaps, read_header, read_version, sidecar_path
+from hourly_store import read_store
+from spread_engine import daily_spreads
+
 # Config
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
 OUTPUT_CSV = Path("daily_price_spread_analysis.csv")
 OUTPUT_PLOT = Path("price_spread_plot.png")
+# Hourly data version and incomplete days the stored spreads were computed from
+OUTPUT_STATE = sidecar_path(OUTPUT_CSV)
+# Days (rows) in the moving average
+MA_WINDOW = 30
+# Set to 1 to recompute every day instead of only the recent and incomplete ones
+PRICE_ANALYSIS_FULL = os.environ.get("PRICE_ANALYSIS_FULL") == "1"
+# The last stored days are recomputed on every run (at least the moving average window)
+RECOMPUTE_DAYS = MA_WINDOW
+OUTPUT_COLUMNS = ['date', 'avg_top_2', 'avg_bottom_2', 'daily_spread', 'spread_30d_ma']
 
-def calculate_spread(group):
+def moving_average(values, window=MA_WINDOW):
     """
-    Calculates the spread between the average of the top 2 
-    and the average of the bottom 2 prices in a daily group.
+    Trailing mean over `window` rows, NaN until the window is full. Each mean
+    is computed from its own window (not a running sum), so values appended
+    later are identical to those of a full recomputation.
     """
-    if len(group) < 4:
-        # Need at least 4 hourly values to get 2 top and 2 bottom
-        return pd.Series({'daily_spread': None})
-    
-    sorted_prices = group['day_ahead_price_eur_mwh'].sort_values()
-    bottom_2_avg = sorted_prices.iloc[:2].mean()
-    top_2_avg = sorted_prices.iloc[-2:].mean()
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+    return result
+
+def day_spreads(df):
+    """
+    Spreads (top 2 vs bottom 2 hours) of the days in `df` with at least 4
+    hourly prices, including the day still being filled, and the dates of
+    those computed from fewer than 24 hours.
+    """
+    # Spread between the average of the top 2 and the bottom 2 prices of each day.
+    # Need at least 4 hourly values to get 2 top and 2 bottom.
+    daily_results = daily_spreads(df, n=2, min_hours=4).rename(columns={
+        'avg_top': 'avg_top_2',
+        'avg_bottom': 'avg_bottom_2',
+        'spread': 'daily_spread'
+    })[['date', 'avg_top_2', 'avg_bottom_2', 'daily_spread']]
     
-    return pd.Series({
-        'avg_top_2': top_2_avg,
-        'avg_bottom_2': bottom_2_avg,
-        'daily_spread': top_2_avg - bottom_2_avg
-    })
-
-def main():
-    if not INPUT_FILE.exists():
+    # Drop days with insufficient data (None)
+    daily_results = daily_results.dropna().reset_index(drop=True)
+    hours = df.groupby('date')['day_ahead_price_eur_mwh'].count()
+    incomplete = daily_results.loc[daily_results['date'].map(hours) < 24, 'date']
+    return daily_results, [date.date().isoformat() for date in incomplete]
+
+def read_stored(path):
+    """The rows of the spread CSV, or None if it is missing, empty or has another layout."""
+    if not path.exists() or read_header(path) != OUTPUT_COLUMNS:
+        return None
+    stored = pd.read_csv(path, parse_dates=['date'], float_precision='round_trip')
+    return stored if not stored.empty else None
+
+def read_state(path=OUTPUT_STATE):
+    """The state recorded next to the spread CSV, or None if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_state(hourly_version, incomplete_days, path=OUTPUT_STATE):
+    """
+    Records the hourly data version the spreads were computed from and the
+    days that were incomplete (fewer than 24 hours) at the time.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'hourly_version': hourly_version, 'incomplete_days': sorted(incomplete_days)}, f, indent=2)
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def recompute_start(stored, incomplete_days, gaps):
+    """
+    First stored date to recompute: the start of the last RECOMPUTE_DAYS
+    rows, or an earlier day that was incomplete when it was computed
+    (`incomplete_days`, or missing between two stored days) and may have
+    been backfilled since. Days whose missing hours are all gaps that will
+    not be requested again (MAX_BACKFILL_ATTEMPTS) count as final; so does
+    the first day, where the data begins.
+    """
+    # Days since 1970 (UTC), like the gap timestamps
+    days = stored['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    start = days[max(0, len(days) - RECOMPUTE_DAYS)]
+
+    exhausted, open_days = set(), set()
+    for ts, gap in gap_slots(gaps).items():
+        (exhausted if gap['attempts'] >= MAX_BACKFILL_ATTEMPTS else open_days).add(ts // 86400)
+    final = exhausted - open_days
+
+    short = np.array(incomplete_days, dtype='datetime64[D]').astype(np.int64)
+    absent = np.setdiff1d(np.arange(days[0], days[-1] + 1), days)
+    incomplete = [day for day in np.union1d(short, absent) if day > days[0] and int(day) not in final]
+    if incomplete:
+        start = min(start, incomplete[0])
+    return pd.Timestamp(np.datetime64(int(start), 'D'))
+
+def load_prices_since(date):
+    """Hourly prices from the month of `date` on, reading only those store partitions when the store is current."""
+    if store_is_current(INPUT_FILE):
+        return read_store(columns=['day_ahead_price_eur_mwh'], since=(date.year, date.month))
+    return load_hourly(INPUT_FILE, columns=['day_ahead_price_eur_mwh'])
+
+def replace_rows(path, rows, keep=0):
+    """
+    Writes `rows` after the header and the first `keep` rows of the CSV,
+    which are kept byte for byte (with `keep` 0 the whole file is written
+    anew), fsyncs the result and atomically replaces the file.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', newline='') as dst:
+        if keep:
+            with open(path, newline='') as src:
+                for _ in range(keep + 1):
+                    dst.write(src.readline())
+        rows.to_csv(dst, header=not keep, index=False)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, path)
+
+def main(df=None):
+    if df is None and not INPUT_FILE.exists():
         print(f"Error: {INPUT_FILE} not found. Please run residual_load_with_prices.py first.")
         return
 
-    print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
-    
-    # Convert timestamp
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['date'] = df['datetime'].dt.date
-    
-    print("Calculating daily price spreads...")
-    # Group by date and calculate spread
-    daily_results = df.groupby('date').apply(calculate_spread).reset_index()
-    
-    # Drop days with insufficient data (None)
-    daily_results = daily_results.dropna()
-    
-    # Calculate 30-day moving average
-    daily_results['spread_30d_ma'] = daily_results['daily_spread'].rolling(window=30).mean()
-    
-    print(f"Saving analysis to {OUTPUT_CSV}...")
-    daily_results.to_csv(OUTPUT_CSV, index=False)
+    hourly_version = read_version(INPUT_FILE)
+    state = None if PRICE_ANALYSIS_FULL else read_state()
+    # Spreads computed from another version of the hourly data are all recomputed
+    stored = read_stored(OUTPUT_CSV) if state is not None and state.get('hourly_version') == hourly_version else None
+    if stored is None:
+        if df is None:
+            print(f"Loading data from {INPUT_FILE}...")
+            df = load_hourly(INPUT_FILE, columns=['day_ahead_price_eur_mwh'])
+        
+        print("Calculating daily price spreads...")
+        daily_results, incomplete_days = day_spreads(df)
+        
+        # Calculate 30-day moving average
+        daily_results['spread_30d_ma'] = moving_average(daily_results['daily_spread'])
+        daily_results = daily_results[OUTPUT_COLUMNS]
+        
+        print(f"Saving analysis to {OUTPUT_CSV}...")
+        # Without a state the next run recomputes everything, so a crash
+        # between the two writes cannot leave a state that does not match
+        OUTPUT_STATE.unlink(missing_ok=True)
+        replace_rows(OUTPUT_CSV, daily_results)
+        write_state(hourly_version, incomplete_days)
+    else:
+        # The recent days and the incomplete days that may have been backfilled
+        # since are recomputed; the rows before them stay as they are
+        start = recompute_start(stored, state.get('incomplete_days', []), read_gaps(INPUT_FILE))
+        kept = stored[stored['date'] < start]
+        print(f"Found daily spreads up to {stored['date'].iloc[-1].date()} in {OUTPUT_CSV}, "
+              f"recomputing from {start.date()}.")
+        if df is None:
+            df = load_prices_since(start)
+        df = df[df['date'] >= start]
+        
+        days, incomplete_days = day_spreads(df) if not df.empty else (pd.DataFrame(columns=OUTPUT_COLUMNS), [])
+        # The moving average continues from the kept rows of the window
+        tail = kept['daily_spread'].to_numpy()[-(MA_WINDOW - 1):] if MA_WINDOW > 1 else np.empty(0)
+        window = np.concatenate([tail, days['daily_spread'].to_numpy(dtype=np.float64)])
+        days['spread_30d_ma'] = moving_average(window)[len(tail):]
+        days = days[OUTPUT_COLUMNS]
+        print(f"Writing {len(days)} days ({len(days) - (len(stored) - len(kept))} new) to {OUTPUT_CSV}...")
+        OUTPUT_STATE.unlink(missing_ok=True)
+        replace_rows(OUTPUT_CSV, days, keep=len(kept))
+        write_state(hourly_version, [day for day in state.get('incomplete_days', []) if day < start.date().isoformat()] + incomplete_days)
+        
+        # The whole series (one row per day) for the plot and the summary
+        daily_results = pd.concat([kept, days], ignore_index=True)
     
     print(f"Generating plot...")
     plt.figure(figsize=(12, 7))
@@ -0,0 +1,103 @@
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import monthly_scatter_plots
+import monthly_stats
+import price_analysis
+import solar_capture_prices
+from data_loader import load_hourly
+
+# Config
+INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
+# Worker processes (default: one per CPU)
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "0")) or os.cpu_count() or 1
+
+# Reports rendered in full by one worker, in output order: (name, main function)
+REPORTS = [
+    ("monthly_stats", monthly_stats.main),
+    ("solar_capture_prices", solar_capture_prices.main),
+    ("price_analysis", price_analysis.main),
+]
+
+# Frame loaded by the parent, handed to every worker once
+_df = None
+# TimeIndex over the report years of _df, built on a worker's first scatter page
+_scatter_index = None
+
+
+def _init_worker(df):
+    global _df
+    _df = df
+
+
+def _run_report(name):
+    """Runs one report script on the shared frame; returns (captured output, seconds)."""
+    started = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        dict(REPORTS)[name](_df)
+    plt.close('all')
+    return output.getvalue(), time.perf_counter() - started
+
+
+def _build_scatter_page(page):
+    """Builds one scatter page; returns (page, figure or None, seconds)."""
+    global _scatter_index
+    started = time.perf_counter()
+    if _scatter_index is None:
+        _scatter_index = monthly_scatter_plots.report_index(_df)
+    fig = monthly_scatter_plots.build_page(_scatter_index, page)
+    return page, fig, time.perf_counter() - started
+
+
+def main():
+    if not INPUT_FILE.exists():
+        print(f"Error: {INPUT_FILE} not found.")
+        return
+
+    started = time.perf_counter()
+    print(f"Loading data from {INPUT_FILE}...")
+    df = load_hourly(INPUT_FILE)
+    load_time = time.perf_counter() - started
+
+    print(f"Rendering reports with {REPORT_WORKERS} worker processes...")
+    with ProcessPoolExecutor(max_workers=REPORT_WORKERS, initializer=_init_worker, initargs=(df,)) as executor:
+        report_futures = [executor.submit(_run_report, name) for name, _ in REPORTS]
+        page_futures = [executor.submit(_build_scatter_page, page)
+                        for page in range(len(monthly_scatter_plots.PAGES))]
+
+        # Matplotlib cannot merge PDF pages written by other processes, so the
+        # workers build (and lay out) the figures and they are saved here in order
+        print(f"Writing scatter plots to {monthly_scatter_plots.OUTPUT_PDF}...")
+        scatter_started = time.perf_counter()
+        pages, build_time, write_time = monthly_scatter_plots.write_pdf(future.result() for future in page_futures)
+        scatter_time = time.perf_counter() - scatter_started
+
+        timings = []
+        for (name, _), future in zip(REPORTS, report_futures):
+            output, seconds = future.result()
+            print(f"\n=== {name} ===")
+            print(output, end="")
+            timings.append((name, seconds, ""))
+    timings.append(("monthly_scatter_plots", scatter_time,
+                    f"{pages} pages, {build_time:.2f} s building in workers, {write_time:.2f} s writing"))
+
+    print(f"\nScatter plots saved to {monthly_scatter_plots.OUTPUT_PDF.absolute()} "
+          f"({monthly_scatter_plots.OUTPUT_PDF.stat().st_size / 1024:.0f} KB)")
+    print("\n--- Report timings ---")
+    print(f"  {'load data':<24}{load_time:7.2f} s")
+    for name, seconds, detail in timings:
+        print(f"  {name:<24}{seconds:7.2f} s  {detail}".rstrip())
+    print(f"  {'total':<24}{time.perf_counter() - started:7.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,13 @@
-import urllib.request
-import urllib.parse
-import json
 import csv
 import datetime
 from pathlib import Path
 import time
 
-def fetch_data(endpoint, params):
-    base_url = "https://api.energy-charts.info"
-    query_string = urllib.parse.urlencode(params)
-    url = f"{base_url}/{endpoint}?{query_string}"
-    
-    # print(f"  Fetching: {url}")
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req, timeout=60) as response:
-                if response.status != 200:
-                    raise Exception(f"API returned status {response.status}")
-                return json.loads(response.read().decode('utf-8'))
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise e
-            time.sleep(5)
+from energy_charts_client import EnergyChartsClient
 
 def main():
     country = "de"
+    client = EnergyChartsClient()
     print(f"Fetching German power data since 2024-01-01 (corrected series)...")
     
     combined_data = {}
@@ -62,7 +43,7 @@ def main():
         
         try:
             # Fetch Total Power (has the most complete "Load" and renewable series)
-            data = fetch_data("total_power", {"country": country, "start": start_str, "end": end_str})
+            data = client.fetch_data("total_power", {"country": country, "start": start_str, "end": end_str})
             
             timestamps = data.get('unix_seconds', [])
             production_types = data.get('production_types', [])
@@ -75,7 +56,7 @@ def main():
                 
                 # Renewable sum for this chunk
                 renewable_sums = [0.0] * len(timestamps)
-                for r_key in renewable_keys:
+                for r_key in sorted(renewable_keys):
                     if r_key in series_map:
                         r_data = series_map[r_key]
                         for i, val in enumerate(r_data):
@@ -123,6 +104,7 @@ def main():
             writer.writerow([ts, dt, net, ren, residual])
 
     print(f"Process complete. File saved: {output_file.absolute()}")
+    print(f"API usage: {client.stats.format_summary()}")
 
 if __name__ == "__main__":
     main()
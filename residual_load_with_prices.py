@@ -1,32 +1,62 @@
-import urllib.request
-import urllib.parse
-import json
-import csv
+import calendar
 import datetime
 from pathlib import Path
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import numpy as np
+
+from energy_charts_client import EnergyChartsClient
+from response_cache import ResponseCache
+from hourly_csv import (MAX_BACKFILL_ATTEMPTS, build_gaps, clear_pending, commit_rows, discard_uncommitted, gap_slots,
+                        has_gap_index, has_pending, insert_rows, mark_pending, read_gaps, read_watermark,
+                        scan_missing_slots, truncate_rows, write_gaps)
+from hourly_store import (HOUR, QUARTER_HOUR, QUARTER_HOURLY_STORE_DIR, STORE_DIR, ZONE_STORE_DIR, complete_hour_runs,
+                          read_store, rebuild_from_csv, rows_to_frame, upsert_frame, zone_root)
+from hourly_store import last_timestamp as store_last_timestamp
+from zones import MissingProductionType, configured_zones, zone_config
+from monthly_aggregates import AGGREGATES_FILE, aggregates_last_timestamp, rebuild_aggregates, update_aggregates
 
 OUTPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
+# Same columns at the native 15-minute resolution of load and (since the MTU change) prices
+QUARTER_HOURLY_FILE = Path("quarter_hourly_german_residual_load_and_prices_2024_present.csv")
+# Version of the hourly rows, recorded in the sidecar. Version 2: since the day-ahead market
+# clears in 15-minute products, the hourly price is the mean of the four quarter-hour prices
+# (version 1 kept the price of the quarter starting on the hour). Rows of an older version
+# from QUARTER_HOUR_PRICES_START on are fetched again.
+HOURLY_DATA_VERSION = 2
+# First delivery hour of 15-minute day-ahead products (2025-10-01 00:00 CEST)
+QUARTER_HOUR_PRICES_START = 1759269600
 
-def fetch_data(endpoint, params):
-    base_url = "https://api.energy-charts.info"
-    query_string = urllib.parse.urlencode(params)
-    url = f"{base_url}/{endpoint}?{query_string}"
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req, timeout=60) as response:
-                if response.status != 200:
-                    raise Exception(f"API returned status {response.status}")
-                return json.loads(response.read().decode('utf-8'))
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise e
-            time.sleep(5)
+# Number of requests in flight at once. 1 keeps the original month-by-month walk.
+MAX_WORKERS = int(os.environ.get("ENERGY_CHARTS_MAX_WORKERS", "4"))
+# Minimum gap in seconds between two requests to the same host, shared by all workers.
+MIN_REQUEST_INTERVAL = float(os.environ.get("ENERGY_CHARTS_MIN_REQUEST_INTERVAL", "0.5"))
+
+# Raw responses are cached on disk. A month counts as closed (immutable) once its
+# last hour is this far in the past; younger chunks are revalidated on every run.
+CLOSED_MONTH_GRACE = datetime.timedelta(days=2)
+# Open-month entries older than this are dropped from the cache
+MUTABLE_CACHE_MAX_AGE = 7 * 24 * 3600
+# Backfill requests cover the open gap ranges; ranges at most this many hours apart
+# share a request, and a month with several requests is fetched as its month chunk
+BACKFILL_MERGE_HOURS = 6
+# Backfill requests per endpoint and run; the remaining gaps are requested on later runs
+BACKFILL_MAX_REQUESTS = int(os.environ.get("ENERGY_CHARTS_BACKFILL_MAX_REQUESTS", "12"))
+# ENERGY_CHARTS_OFFLINE=1 rebuilds the CSV from cached responses only, without network access
+OFFLINE = os.environ.get("ENERGY_CHARTS_OFFLINE") == "1"
+
+CLIENT = EnergyChartsClient(min_request_interval=MIN_REQUEST_INTERVAL)
+CACHE = ResponseCache()
 
 def aggregate_to_hourly(data_dict):
     """
@@ -53,79 +83,211 @@ def aggregate_to_hourly(data_dict):
             }
     return hourly_aggregated
 
-def get_last_timestamp(file_path):
-    if not file_path.exists():
-        return None
-    try:
-        with open(file_path, 'r', newline='') as f:
-            reader = csv.reader(f)
-            header = next(reader, None)
-            if not header:
-                return None
-            
-            last_row = None
-            for row in reader:
-                last_row = row
-            
-            if last_row:
-                # Assuming timestamp_unix is the first column
-                return int(last_row[0])
-    except Exception as e:
-        print(f"Error reading last timestamp: {e}")
-        return None
-    return None
-
-def main():
-    country = "de"
+def hourly_load_from_payload_python(power_data, load_key, renewable_keys):
+    """
+    Pure-Python reference for hourly_load_from_payload: builds a dict per
+    15-minute timestamp and averages them with aggregate_to_hourly.
+    """
+    ts_list = power_data.get('unix_seconds', [])
+    production_types = power_data.get('production_types', [])
+    series_map = {pt['name']: pt.get('data', []) for pt in production_types}
     
+    if not (ts_list and load_key in series_map):
+        return {}
+
+    load_vals = series_map[load_key]
+    chunk_15min_data = {}
     
-    # Check if header matches new schema, if not, force restart
-    current_header = None
-    if OUTPUT_FILE.exists():
-        with open(OUTPUT_FILE, 'r', newline='') as f:
-            current_header = next(csv.reader(f), None)
+    # Extract Solar specifically
+    solar_key = "Solar"
+    solar_vals = [0.0] * len(ts_list)
+    if solar_key in series_map:
+        solar_data_raw = series_map[solar_key]
+        for i, val in enumerate(solar_data_raw):
+            if i < len(solar_vals) and val is not None:
+                solar_vals[i] = val
     
-    expected_columns = ['timestamp_unix', 'datetime_utc', 'net_load_mw_avg', 'renewable_generation_mw_avg', 'solar_mw_avg', 'residual_load_mw_avg', 'day_ahead_price_eur_mwh']
+    # Sum renewables, in name order so the float sums do not depend on set iteration order
+    r_sums = [0.0] * len(ts_list)
+    for r_key in sorted(renewable_keys):
+        if r_key in series_map:
+            r_data = series_map[r_key]
+            for i, val in enumerate(r_data):
+                if i < len(r_sums) and val is not None:
+                    r_sums[i] += val
     
-    if current_header != expected_columns:
-        print("Schema changed (adding Solar). Forcing full re-fetch...")
-        last_ts = None
-    else:
-        last_ts = get_last_timestamp(OUTPUT_FILE)
+    for i, ts in enumerate(ts_list):
+        if i < len(load_vals) and load_vals[i] is not None:
+            chunk_15min_data[ts] = {
+                'net_load': load_vals[i], 
+                'renewables': r_sums[i],
+                'solar': solar_vals[i]
+            }
     
-    if last_ts:
-        # Start from the next hour
-        start_date = datetime.datetime.fromtimestamp(last_ts, tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
-        print(f"Found existing data up to {start_date - datetime.timedelta(hours=1)}.")
-        is_append = True
-    else:
-        start_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
-        print("No existing data found. Fetching from start of 2024.")
-        is_append = False
-        
-    end_date = datetime.datetime.now(datetime.timezone.utc)
+    # Aggregate this chunk's 15min data to hourly
+    return aggregate_to_hourly(chunk_15min_data)
+
+def _series_array(values, length):
+    """Converts an API series to a float array of `length`, with None (or missing tail) as NaN."""
+    arr = np.full(length, np.nan)
+    values = values[:length]
+    arr[:len(values)] = np.array(values, dtype=float)
+    return arr
+
+def quarter_hour_arrays(power_data, load_key, renewable_keys):
+    """
+    Extracts the 15-minute series of a `total_power` payload as NumPy arrays:
+    (timestamps, load, renewables, solar), restricted to timestamps with a
+    load value. Missing renewable and solar values count as 0. Returns None
+    if the payload has no timestamps or no load series.
+    """
+    ts_list = power_data.get('unix_seconds', [])
+    production_types = power_data.get('production_types', [])
+    series_map = {pt['name']: pt.get('data', []) for pt in production_types}
     
-    if start_date >= end_date:
-        print("Data is already up to date.")
-        return
+    if not (ts_list and load_key in series_map):
+        return None
 
-    print(f"Fetching data from {start_date} to {end_date}...")
+    ts = np.array(ts_list, dtype=np.int64)
+    n = len(ts)
+    load = _series_array(series_map[load_key], n)
+    solar = np.nan_to_num(_series_array(series_map.get("Solar", []), n), nan=0.0)
+    renewables = np.zeros(n)
+    # Summed in name order, like the Python path, so the result is the same in every process
+    for r_key in sorted(renewable_keys):
+        if r_key in series_map:
+            renewables += np.nan_to_num(_series_array(series_map[r_key], n), nan=0.0)
 
-    # Selection keys based on previous inspection
-    load_key = "Load (incl. self-consumption)"
-    renewable_keys = {
-        "Biomass", 
-        "Hydro Run-of-River", 
-        "Wind offshore", 
-        "Wind onshore", 
-        "Solar", 
-        "Geothermal"
+    valid = ~np.isnan(load)
+    return ts[valid], load[valid], renewables[valid], solar[valid]
+
+def hourly_load_from_payload(power_data, load_key, renewable_keys):
+    """
+    Converts a 15-minute `total_power` payload into hourly averages of
+    load, renewables, solar and residual load.
+
+    Vectorized equivalent of hourly_load_from_payload_python: the series are
+    NumPy arrays, hours are bucketed by ts // 3600 and only hours with
+    exactly 4 valid load samples are kept. Sums are taken in the same order
+    as the Python path, so the results are bit-for-bit identical.
+    """
+    arrays = quarter_hour_arrays(power_data, load_key, renewable_keys)
+    if arrays is None:
+        return {}
+
+    ts, load, renewables, solar = arrays
+    if len(ts) > 1 and not np.all(ts[1:] > ts[:-1]):
+        # Bucketing below relies on strictly increasing timestamps
+        return hourly_load_from_payload_python(power_data, load_key, renewable_keys)
+    if len(ts) == 0:
+        return {}
+
+    hours, first = complete_hour_runs(ts)
+
+    def hourly_mean(values):
+        return (values[first] + values[first + 1] + values[first + 2] + values[first + 3]) / 4
+
+    avg_net_load = hourly_mean(load)
+    avg_renewables = hourly_mean(renewables)
+    avg_solar = hourly_mean(solar)
+    avg_residual = avg_net_load - avg_renewables
+
+    return {
+        hour_ts: {'net_load': net, 'renewables': ren, 'solar': sol, 'residual_load': res}
+        for hour_ts, net, ren, sol, res in zip(
+            hours[first].tolist(), avg_net_load.tolist(), avg_renewables.tolist(),
+            avg_solar.tolist(), avg_residual.tolist())
     }
 
-    combined_hourly_load = {}
-    prices_hourly = {}
-    
-    current_chunk_start = start_date
+def quarter_hour_load_from_payload(power_data, load_key, renewable_keys):
+    """
+    Load, renewables, solar and residual load per 15-minute timestamp of a
+    `total_power` payload, without averaging to hours.
+    """
+    arrays = quarter_hour_arrays(power_data, load_key, renewable_keys)
+    if arrays is None:
+        return {}
+
+    ts, load, renewables, solar = arrays
+    residual = load - renewables
+    return {
+        quarter_ts: {'net_load': net, 'renewables': ren, 'solar': sol, 'residual_load': res}
+        for quarter_ts, net, ren, sol, res in zip(
+            ts.tolist(), load.tolist(), renewables.tolist(), solar.tolist(), residual.tolist())
+    }
+
+def quarter_hour_start(ts):
+    """
+    First timestamp from which a price series (sorted unix timestamps `ts`)
+    has 15-minute products, or None if all its prices are hourly: the hour
+    of its first price off the full hour, or QUARTER_HOUR_PRICES_START if
+    that is earlier. The resolution is a property of the series, not of
+    each hour, so an hour of which only the :00 quarter came back is still
+    a quarter-hour hour with three quarters missing.
+    """
+    off_hour = ts[ts % HOUR != 0]
+    if len(off_hour) == 0:
+        return None
+    return min(int(off_hour[0]) - int(off_hour[0]) % HOUR, QUARTER_HOUR_PRICES_START)
+
+def hourly_prices(prices):
+    """
+    Hourly day-ahead prices from a price series keyed by unix timestamp.
+
+    Hourly prices pass through unchanged. Since the day-ahead market clears
+    in 15-minute products the series has one price per quarter hour (see
+    quarter_hour_start); the hourly price is then the mean of the hour's
+    four quarters, and hours missing a quarter are dropped.
+    """
+    if not prices:
+        return {}
+
+    ts = np.array(sorted(prices), dtype=np.int64)
+    start = quarter_hour_start(ts)
+    quarterly = ts >= start if start is not None else np.zeros(len(ts), dtype=bool)
+
+    # Hourly values are passed through as-is so the CSV text does not change
+    result = {hour_ts: prices[hour_ts] for hour_ts in ts[~quarterly & (ts % HOUR == 0)].tolist()}
+
+    ts = ts[quarterly]
+    if len(ts):
+        values = np.array([prices[t] for t in ts.tolist()], dtype=float)
+        hours = ts - ts % HOUR
+        run_starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+        run_lengths = np.diff(np.r_[run_starts, len(ts)])
+        first = run_starts[run_lengths == 4]
+        quarter_mean = (values[first] + values[first + 1] + values[first + 2] + values[first + 3]) / 4
+        result.update(zip(hours[first].tolist(), quarter_mean.tolist()))
+    return result
+
+def quarter_hour_prices(prices):
+    """
+    15-minute day-ahead prices from a price series keyed by unix timestamp.
+    Quarter-hour prices pass through; an hourly price (before the series
+    switches to 15-minute products, see quarter_hour_start) applies to all
+    four quarters of its hour.
+    """
+    start = quarter_hour_start(np.array(sorted(prices), dtype=np.int64))
+    result = {}
+    for ts, price in prices.items():
+        if ts % HOUR == 0 and (start is None or ts < start):
+            for offset in range(0, HOUR, QUARTER_HOUR):
+                result.setdefault(ts + offset, price)
+        else:
+            result[ts] = price
+    return result
+
+def month_chunks(start_date, end_date):
+    """
+    Splits [start_date, end_date) into monthly chunks.
+    Yields (start_str, end_str, immutable) for each chunk, where immutable
+    marks a closed month whose responses can be cached for good.
+
+    Chunks start at the first hour of their month even if `start_date` is
+    later (rows before the watermark are dropped when they are written), so
+    every run requests the same month window and its cache entry is complete.
+    """
+    current_chunk_start = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
     while current_chunk_start < end_date:
         # Fetch in monthly chunks to handle years correctly, or smaller if near current time
@@ -143,93 +305,701 @@ def main():
         # Ensure we cover the full end hour by using :59 if it's the end of fetch
         end_str = chunk_end.strftime("%Y-%m-%dT%H:59Z")
         
+        immutable = next_chunk_start + CLOSED_MONTH_GRACE <= end_date
+        yield start_str, end_str, immutable
+        
+        current_chunk_start = next_chunk_start
+
+def fetch_json(endpoint, params, immutable, month=True, revalidate=False):
+    """
+    Requests of a month chunk (`month`) share one cache entry per month: it is
+    keyed without the end, which moves with every run until the month is
+    closed, and always holds the latest response. Other windows (backfills)
+    are keyed by their exact range. `revalidate` revalidates a closed month
+    instead of serving it from the cache.
+    """
+    identity = {key: value for key, value in params.items() if key != 'end'} if month else None
+    return CACHE.fetch(CLIENT, endpoint, params, immutable=immutable, offline=OFFLINE, identity=identity,
+                       revalidate=revalidate)
+
+def fetch_load_chunk(country, start_str, end_str, immutable, load_key, renewable_keys, month=True, revalidate=False):
+    """
+    Fetches 15-minute power data for one chunk (a month chunk unless `month`
+    is False). Returns (hourly, quarter_hourly) load values, both derived
+    from the same payload.
+    """
+    power_data = fetch_json("total_power", {"country": country, "start": start_str, "end": end_str}, immutable,
+                            month, revalidate)
+    return (hourly_load_from_payload(power_data, load_key, renewable_keys),
+            quarter_hour_load_from_payload(power_data, load_key, renewable_keys))
+
+def missing_production_types(power_data, load_key, renewable_keys):
+    """
+    (load_key or None, sorted renewable_keys) of the production types a
+    `total_power` payload has no series for. Payloads without timestamps
+    (nothing published yet) lack nothing.
+    """
+    if not power_data.get('unix_seconds'):
+        return None, []
+    names = {pt['name'] for pt in power_data.get('production_types', [])}
+    return (None if load_key in names else load_key), sorted(set(renewable_keys) - names)
+
+def fetch_zone_load_chunk(country, start_str, end_str, immutable, load_key, renewable_keys):
+    """
+    Fetches the hourly load values of one month chunk for the multi-country
+    mode. Returns (hourly load, renewable production types the payload has
+    no series for, which count as 0). Raises MissingProductionType if the
+    load series is missing, since no row could be derived.
+    """
+    power_data = fetch_json("total_power", {"country": country, "start": start_str, "end": end_str}, immutable)
+    missing_load, missing_renewables = missing_production_types(power_data, load_key, renewable_keys)
+    if missing_load:
+        raise MissingProductionType(f"no '{missing_load}' series in total_power of country '{country}'")
+    return hourly_load_from_payload(power_data, load_key, renewable_keys), missing_renewables
+
+def fetch_price_chunk(country, start_str, end_str, immutable, bzn=None, month=True, revalidate=False):
+    """
+    Fetches day-ahead prices for one chunk (a month chunk unless `month` is
+    False), keyed by unix timestamp.
+    The price zone is selected by `bzn` (bidding zone) if given, otherwise by country.
+    """
+    zone_params = {"bzn": bzn} if bzn else {"country": country}
+    price_data = fetch_json("price", {**zone_params, "start": start_str, "end": end_str}, immutable, month, revalidate)
+    price_ts_list = price_data.get('unix_seconds', [])
+    price_vals = price_data.get('price', [])
+    
+    return {ts: p for ts, p in zip(price_ts_list, price_vals) if p is not None}
+
+def fetch_chunks_sequentially(country, chunks, load_key, renewable_keys):
+    """
+    Fetches chunks one after the other.
+    Yields (hourly_load, quarter_hourly_load, prices, failed) per chunk;
+    a chunk whose requests failed comes back empty with `failed` set.
+    """
+    for start_str, end_str, immutable in chunks:
         print(f"Processing range: {start_str} to {end_str}")
         
+        chunk_hourly = {}
+        chunk_quarter_hourly = {}
+        chunk_prices = {}
+        failed = False
         try:
             # 1. Fetch Power Data (15-min)
-            power_data = fetch_data("total_power", {"country": country, "start": start_str, "end": end_str})
-            ts_list = power_data.get('unix_seconds', [])
-            production_types = power_data.get('production_types', [])
-            series_map = {pt['name']: pt.get('data', []) for pt in production_types}
-            
-            if ts_list and load_key in series_map:
-                load_vals = series_map[load_key]
-                chunk_15min_data = {}
-                
-                # Extract Solar specifically
-                solar_key = "Solar"
-                solar_vals = [0.0] * len(ts_list)
-                if solar_key in series_map:
-                    solar_data_raw = series_map[solar_key]
-                    for i, val in enumerate(solar_data_raw):
-                        if i < len(solar_vals) and val is not None:
-                            solar_vals[i] = val
-                
-                # Sum renewables
-                r_sums = [0.0] * len(ts_list)
-                for r_key in renewable_keys:
-                    if r_key in series_map:
-                        r_data = series_map[r_key]
-                        for i, val in enumerate(r_data):
-                            if i < len(r_sums) and val is not None:
-                                r_sums[i] += val
-                
-                for i, ts in enumerate(ts_list):
-                    if i < len(load_vals) and load_vals[i] is not None:
-                        chunk_15min_data[ts] = {
-                            'net_load': load_vals[i], 
-                            'renewables': r_sums[i],
-                            'solar': solar_vals[i]
-                        }
-                
-                # Aggregate this chunk's 15min data to hourly
-                chunk_hourly = aggregate_to_hourly(chunk_15min_data)
-                combined_hourly_load.update(chunk_hourly)
-
-            # 2. Fetch Price Data (Hourly)
-            price_data = fetch_data("price", {"country": country, "start": start_str, "end": end_str})
-            price_ts_list = price_data.get('unix_seconds', [])
-            price_vals = price_data.get('price', [])
-            
-            for ts, p in zip(price_ts_list, price_vals):
-                if p is not None:
-                    prices_hourly[ts] = p
-                    
+            chunk_hourly, chunk_quarter_hourly = fetch_load_chunk(country, start_str, end_str, immutable, load_key, renewable_keys)
+            # 2. Fetch Price Data (hourly, 15-min since the MTU change)
+            chunk_prices = fetch_price_chunk(country, start_str, end_str, immutable)
         except Exception as e:
             print(f"Error processing range {start_str}: {e}")
+            chunk_hourly, chunk_quarter_hourly, chunk_prices = {}, {}, {}
+            failed = True
         
-        current_chunk_start = next_chunk_start
+        yield chunk_hourly, chunk_quarter_hourly, chunk_prices, failed
         time.sleep(1)
 
-    # Merge results
-    sorted_hours = sorted(set(combined_hourly_load.keys()) & set(prices_hourly.keys()))
-    
-    if not sorted_hours:
-        print("No new complete data rows found.")
+def fetch_chunks_concurrently(country, chunks, load_key, renewable_keys, max_workers, max_in_flight=None):
+    """
+    Issues the power and price requests of the chunks on a bounded thread pool.
+    Yields (hourly_load, quarter_hourly_load, prices, failed) per chunk in chunk order, with the same
+    error semantics as fetch_chunks_sequentially.
+
+    At most `max_in_flight` chunks (default `max_workers`) are requested ahead
+    of the one being consumed, so memory stays bounded however long the range is.
+    """
+    max_in_flight = max_in_flight or max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        
+        def collect(start_str, load_future, price_future):
+            chunk_hourly = {}
+            chunk_quarter_hourly = {}
+            chunk_prices = {}
+            failed = False
+            try:
+                chunk_hourly, chunk_quarter_hourly = load_future.result()
+                chunk_prices = price_future.result()
+            except Exception as e:
+                print(f"Error processing range {start_str}: {e}")
+                chunk_hourly, chunk_quarter_hourly, chunk_prices = {}, {}, {}
+                failed = True
+            return chunk_hourly, chunk_quarter_hourly, chunk_prices, failed
+        
+        for start_str, end_str, immutable in chunks:
+            print(f"Processing range: {start_str} to {end_str}")
+            load_future = executor.submit(fetch_load_chunk, country, start_str, end_str, immutable, load_key, renewable_keys)
+            price_future = executor.submit(fetch_price_chunk, country, start_str, end_str, immutable)
+            pending.append((start_str, load_future, price_future))
+            if len(pending) >= max_in_flight:
+                yield collect(*pending.popleft())
+        
+        while pending:
+            yield collect(*pending.popleft())
+
+def chunk_start_timestamp(start_str):
+    """Unix timestamp of a chunk start as formatted by month_chunks."""
+    return calendar.timegm(time.strptime(start_str, "%Y-%m-%dT%H:%MZ"))
+
+def current_watermark(csv_path, header):
+    """
+    The CSV's watermark if it has the expected `header` and at least one row,
+    otherwise None (the dataset is fetched from scratch). The watermark comes
+    from the sidecar file, so this does not scan the CSV.
+    """
+    watermark = read_watermark(csv_path, persist=True)
+    if watermark is None or watermark['header'] != header or not watermark['last_ts']:
+        return None
+    return watermark
+
+def refetch_since(csv_path, header, start_ts, version):
+    """
+    Drops the rows and gap entries from `start_ts` on, so the next fetch
+    derives them again, and records `version`. Returns the new watermark
+    (None if no rows are left). The store and aggregates no longer match the
+    CSV afterwards and are rebuilt by its DatasetWriter.
+    """
+    watermark = truncate_rows(csv_path, header, start_ts, version)
+    slots = {ts: (gap['reason'], gap['attempts']) for ts, gap in gap_slots(read_gaps(csv_path)).items() if ts < start_ts}
+    write_gaps(csv_path, build_gaps(slots, HOUR))
+    return watermark if watermark['last_ts'] else None
+
+def dataset_rows(load_by_ts, prices, after_ts, before_ts=None):
+    """
+    CSV rows for the timestamps present in both the load and the price
+    series with after_ts < ts < before_ts (either bound may be None),
+    in time order.
+    """
+    rows = []
+    for ts in sorted(load_by_ts.keys() & prices.keys()):
+        if after_ts is not None and ts <= after_ts:
+            continue
+        if before_ts is not None and ts >= before_ts:
+            continue
+        load_data = load_by_ts[ts]
+        dt = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc).isoformat()
+        rows.append([
+            ts, dt, 
+            load_data['net_load'], 
+            load_data['renewables'], 
+            load_data['solar'], 
+            load_data['residual_load'], 
+            prices[ts]
+        ])
+    return rows
+
+class DatasetWriter:
+    """
+    Writes one dataset (CSV, sidecar, gap index, columnar store and optionally
+    the monthly aggregates) chunk by chunk. A CSV it creates records
+    `version` in its sidecar.
+
+    Each `commit` appends the chunk's rows and fsyncs the CSV before moving
+    the sidecar watermark, so an interrupted run keeps every committed chunk
+    and the next run resumes after it (bytes of a half-written chunk are
+    truncated by discard_uncommitted). The store and aggregates follow the
+    CSV; if they lag behind it, or a backfill insert left them pending, they
+    are rebuilt from it first.
+
+    Expected slots (every `step` seconds) that end up before the last row
+    without a row of their own are recorded in the gap index with the reason
+    (fetch_error, incomplete_load, missing_load, missing_price; missing_row
+    for holes found by `seed_gaps`), and `backfill` inserts them once a
+    later request returns them.
+    """
+    def __init__(self, csv_path, header, watermark, store_root, label, step, aggregates_path=None, version=None):
+        self.csv_path = csv_path
+        self.header = header
+        self.store_root = store_root
+        self.label = label
+        self.step = step
+        self.aggregates_path = aggregates_path
+        self.version = version
+        self.last_ts = watermark['last_ts'] if watermark else None
+        self.row_count = watermark['row_count'] if watermark else 0
+        self.rows_written = 0
+        self.rows_backfilled = 0
+        # Slots after the last row without data, and why; they become gaps once a later row is written
+        self._pending = {}
+        self._started = False
+
+    def _start(self):
+        if self._started:
+            return
+        self._started = True
+        if self.last_ts is None:
+            # Full re-fetch: the store and aggregates are rebuilt chunk by chunk along with the CSV
+            for path in Path(self.store_root).glob('*.parquet'):
+                path.unlink()
+            if self.aggregates_path is not None and Path(self.aggregates_path).exists():
+                Path(self.aggregates_path).unlink()
+            write_gaps(self.csv_path, [])
+            clear_pending(self.csv_path)
+            return
+        # Rows inserted by an interrupted backfill are in the CSV but may be missing from both
+        pending = has_pending(self.csv_path)
+        if pending or store_last_timestamp(self.store_root) != self.last_ts:
+            print(f"Rebuilding columnar store in {self.store_root}/...")
+            rebuild_from_csv(self.csv_path, self.store_root)
+        if self.aggregates_path is not None and (pending or aggregates_last_timestamp(self.aggregates_path) != self.last_ts):
+            print(f"Rebuilding {self.aggregates_path}...")
+            rebuild_aggregates(read_store(root=self.store_root), self.aggregates_path)
+        clear_pending(self.csv_path)
+
+    def recover(self):
+        """Brings the store and aggregates in line with the CSV if an earlier backfill stopped before updating them."""
+        if self.last_ts is not None and has_pending(self.csv_path):
+            self._start()
+
+    def _missing_reason(self, ts, load_by_ts, prices, failed, quarter_load):
+        if failed:
+            return 'fetch_error'
+        if ts not in load_by_ts:
+            if quarter_load and any(ts + offset in quarter_load for offset in range(0, self.step, QUARTER_HOUR)):
+                # Some but not all quarter hours of the hour came back
+                return 'incomplete_load'
+            return 'missing_load'
+        return 'missing_price'
+
+    def _store_new_rows(self, rows):
+        new_frame = rows_to_frame(rows)
+        upsert_frame(new_frame, self.store_root)
+        if self.aggregates_path is not None:
+            update_aggregates(new_frame, self.aggregates_path)
+
+    def commit(self, load_by_ts, prices, chunk_start_ts, before_ts=None, failed=False, quarter_load=None):
+        """
+        Writes the chunk's rows after the current watermark (and before
+        `before_ts`). `failed` marks a chunk whose requests failed;
+        `quarter_load` lets the hourly dataset tell incomplete hours apart.
+        """
+        # Without a next chunk the range ends with the data; later slots may simply not be published yet
+        if before_ts is not None:
+            end_ts = before_ts
+        else:
+            end_ts = max(load_by_ts.keys() | prices.keys(), default=chunk_start_ts - self.step) + self.step
+        first_ts = chunk_start_ts if self.last_ts is None else max(chunk_start_ts, self.last_ts + self.step)
+        for ts in range(first_ts, end_ts, self.step):
+            if ts not in load_by_ts or ts not in prices:
+                self._pending[ts] = self._missing_reason(ts, load_by_ts, prices, failed, quarter_load)
+
+        rows = dataset_rows(load_by_ts, prices, self.last_ts, before_ts)
+        if not rows:
+            return 0
+        self._start()
+
+        # Record the gaps first: if the run stops before the CSV commit, the
+        # chunk is fetched again and stale entries are dropped when its rows land
+        new_last = rows[-1][0]
+        new_gaps = {ts: reason for ts, reason in self._pending.items() if ts < new_last}
+        self._pending = {ts: reason for ts, reason in self._pending.items() if ts > new_last}
+        gaps = read_gaps(self.csv_path)
+        slots = {ts: (gap['reason'], gap['attempts']) for ts, gap in gap_slots(gaps).items()}
+        written = [row[0] for row in rows if row[0] in slots]
+        if new_gaps or written:
+            for ts in written:
+                del slots[ts]
+            slots.update((ts, (reason, 0)) for ts, reason in new_gaps.items())
+            write_gaps(self.csv_path, build_gaps(slots, self.step))
+
+        create = self.last_ts is None
+        self.row_count += len(rows)
+        commit_rows(self.csv_path, self.header, rows, self.row_count, create=create,
+                    version=self.version if create else None)
+        self.last_ts = new_last
+        self.rows_written += len(rows)
+        self._store_new_rows(rows)
+        return len(rows)
+
+    def seed_gaps(self):
+        """
+        Builds the gap index from a scan of the CSV if it has none (e.g. a
+        CSV written before the index existed), so holes already in it are
+        backfilled too. They are recorded as `missing_row`.
+        """
+        if self.last_ts is None or has_gap_index(self.csv_path):
+            return
+        missing = scan_missing_slots(self.csv_path, self.step)
+        print(f"No gap index for {self.csv_path}; found {len(missing)} missing {self.label} slots in it.")
+        write_gaps(self.csv_path, build_gaps({ts: ('missing_row', 0) for ts in missing}, self.step))
+
+    def open_gaps(self):
+        """Gap ranges that have not used up their backfill attempts."""
+        if self.last_ts is None:
+            return []
+        return [gap for gap in read_gaps(self.csv_path) if gap['attempts'] < MAX_BACKFILL_ATTEMPTS]
+
+    def backfill(self, load_by_ts, prices, attempted):
+        """
+        Inserts the rows of gap slots found in backfill data at their place in
+        the CSV. Slots in `attempted` that are still missing count one more
+        backfill attempt.
+        """
+        gaps = gap_slots(read_gaps(self.csv_path))
+        if not gaps:
+            return 0
+        rows = [row for row in dataset_rows(load_by_ts, prices, None) if row[0] in gaps]
+        inserted = []
+        if rows:
+            self._start()
+            mark_pending(self.csv_path)
+            inserted = insert_rows(self.csv_path, self.header, rows, self.row_count)
+            self.row_count += len(inserted)
+            self.rows_backfilled += len(inserted)
+            if inserted:
+                self._store_new_rows(inserted)
+            clear_pending(self.csv_path)
+
+        filled = {row[0] for row in rows}
+        slots = {
+            ts: (gap['reason'], gap["attempts"] + int(ts in attempted))
+            for ts, gap in gaps.items() if ts not in filled
+        }
+        write_gaps(self.csv_path, build_gaps(slots, self.step))
+        return len(inserted)
+
+    def gap_summary(self):
+        """Missing slot counts per reason, e.g. "3 fetch_error, 1 incomplete_load"."""
+        counts = defaultdict(int)
+        for gap in gap_slots(read_gaps(self.csv_path)).values():
+            counts[gap['reason']] += 1
+        return ", ".join(f"{count} {reason}" for reason, count in sorted(counts.items()))
+
+def _month_start(ts):
+    day = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
+    return day.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def backfill_windows(gaps, end_date):
+    """
+    Groups gap ranges into request windows of whole hours, most recent
+    first. Overlapping or adjacent ranges (e.g. the same hours in the hourly
+    and quarter-hourly index) are joined, and ranges in the same calendar
+    month at most BACKFILL_MERGE_HOURS apart share a window. A month left
+    with several windows is requested as its month chunk instead, which
+    revalidates the month's cache entry rather than adding one per window.
+    Returns (start_str, end_str, start_ts, end_ts, month, immutable) per
+    window, end hour inclusive.
+    """
+    runs = []
+    for start, end in sorted((gap['start'] - gap['start'] % HOUR, gap['end'] - gap['end'] % HOUR) for gap in gaps):
+        while start <= end:
+            month = _month_start(start)
+            month_last = int((month + datetime.timedelta(days=31)).replace(day=1).timestamp()) - HOUR
+            piece_end = min(end, month_last)
+            if runs and runs[-1][0] == month and start - runs[-1][2] <= (BACKFILL_MERGE_HOURS + 1) * HOUR:
+                runs[-1][2] = max(runs[-1][2], piece_end)
+            else:
+                runs.append([month, start, piece_end])
+            start = month_last + HOUR
+
+    windows = []
+    for month, month_runs in groupby(runs, key=lambda run: run[0]):
+        month_runs = list(month_runs)
+        if len(month_runs) == 1:
+            _, start, end = month_runs[0]
+            windows.append((time.strftime("%Y-%m-%dT%H:00Z", time.gmtime(start)),
+                            time.strftime("%Y-%m-%dT%H:59Z", time.gmtime(end)), start, end, False, False))
+        else:
+            start_str, end_str, immutable = next(month_chunks(month, end_date))
+            windows.append((start_str, end_str, int(month.timestamp()), month_runs[-1][2], True, immutable))
+    return windows[::-1]
+
+def backfill_gaps(writers, country, load_key, renewable_keys, end_date):
+    """
+    Re-requests just the ranges around the gaps recorded for `writers`
+    (hourly, quarter_hourly) and inserts what comes back, with at most
+    BACKFILL_MAX_REQUESTS requests per endpoint; the older gaps wait for a
+    later run. Slots that are still missing after MAX_BACKFILL_ATTEMPTS
+    requests stay in the gap index but are no longer requested. Window
+    responses are cached as mutable and month chunks are revalidated, so a
+    repeated attempt never reuses a cached incomplete answer.
+    """
+    hourly_writer, quarter_writer = writers
+    open_gaps = {writer.label: writer.open_gaps() for writer in writers}
+    if not any(open_gaps.values()):
+        return
+    windows = backfill_windows([gap for gaps in open_gaps.values() for gap in gaps], end_date)
+    slots = " and ".join(f"{len(gap_slots(gaps))} {label}" for label, gaps in open_gaps.items())
+    deferred = max(0, len(windows) - BACKFILL_MAX_REQUESTS)
+    windows = windows[:BACKFILL_MAX_REQUESTS]
+    print(f"Backfilling {slots} missing slots with {len(windows)} requests per endpoint"
+          + (f" ({deferred} more on later runs)..." if deferred else "..."))
+
+    hourly_load = {}
+    quarter_hourly_load = {}
+    prices = {}
+    attempted = set()
+    for start_str, end_str, start_ts, end_ts, month, immutable in windows:
+        try:
+            window_hourly, window_quarter_hourly = fetch_load_chunk(country, start_str, end_str, immutable, load_key,
+                                                                    renewable_keys, month=month, revalidate=month)
+            window_prices = fetch_price_chunk(country, start_str, end_str, immutable, month=month, revalidate=month)
+        except Exception as e:
+            print(f"Error backfilling range {start_str} to {end_str}: {e}")
+        else:
+            hourly_load.update(window_hourly)
+            quarter_hourly_load.update(window_quarter_hourly)
+            prices.update(window_prices)
+        attempted.update(range(start_ts, end_ts + HOUR, QUARTER_HOUR))
+
+    quarter_writer.backfill(quarter_hourly_load, quarter_hour_prices(prices), attempted)
+    hourly_writer.backfill(hourly_load, hourly_prices(prices), attempted)
+    for writer in writers:
+        print(f"Backfilled {writer.rows_backfilled} {writer.label} rows.")
+
+def _timed(fn, *args):
+    """Runs fn(*args); returns (result, start, end) with perf_counter timestamps."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started, time.perf_counter()
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def fetch_zones(zones, end_date, max_in_flight=None):
+    """
+    Multi-country mode: fetches hourly load and prices of several bidding
+    zones and appends them to their stores under ZONE_STORE_DIR.
+
+    All zones share one pool of MAX_WORKERS threads and the client's per-host
+    rate limiter, so more zones make the run longer, not the request rate
+    higher. The chunks of all zones are requested month by month through one
+    sliding window of at most `max_in_flight` chunks (default MAX_WORKERS),
+    as in fetch_chunks_concurrently, so memory stays bounded however many
+    zones and months there are; zones on the same `total_power` series
+    (DK1/DK2) share its requests. Each zone resumes after its own last stored
+    hour and its rows are stored chunk by chunk, in order; if a chunk fails,
+    the zone stops there so the watermark never skips a gap. A zone whose
+    load series is missing stops with an error naming it; renewable
+    production types without a series are reported and count as 0.
+    Prints and returns per-zone throughput and memory figures.
+    """
+    max_in_flight = max_in_flight or max(MAX_WORKERS, 1)
+    states = []
+    tasks = []
+    for config in (zone_config(zone) for zone in zones):
+        last_ts = store_last_timestamp(zone_root(config['zone']))
+        if last_ts:
+            start_date = datetime.datetime.fromtimestamp(last_ts, tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
+        else:
+            start_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        print(f"[{config['zone']}] Fetching data from {start_date} to {end_date}...")
+        state = {'config': config, 'last_ts': last_ts, 'rows': 0, 'frame_mb': 0.0, 'missing': set(), 'spans': [],
+                 'stopped': False}
+        states.append(state)
+        chunks = list(month_chunks(start_date, end_date))
+        starts = [chunk_start_timestamp(start_str) for start_str, _, _ in chunks]
+        for i, (start_str, end_str, immutable) in enumerate(chunks):
+            # The hour at the next chunk's start comes from that chunk, as on the German path
+            before_ts = starts[i + 1] if i + 1 < len(starts) else None
+            tasks.append((starts[i], len(states) - 1, start_str, end_str, immutable, before_ts))
+    # Month by month across zones, so zones sharing a load series request it once
+    tasks.sort(key=lambda task: task[:2])
+
+    def consume(state, start_str, before_ts, load_future, price_future):
+        config = state['config']
+        zone = config['zone']
+        if state['stopped']:
+            price_future.cancel()
+            return
+        try:
+            (chunk_hourly, chunk_missing), *load_span = load_future.result()
+            chunk_prices, *price_span = price_future.result()
+        except MissingProductionType as e:
+            print(f"[{zone}] Error: {e}; set its load_key in zones.py (names: inspect_api.py). "
+                  f"No rows stored from {start_str} on.")
+            state['stopped'] = True
+            return
+        except Exception as e:
+            print(f"[{zone}] Error processing range {start_str}: {e}. Keeping the rows before it.")
+            state['stopped'] = True
+            return
+        state['missing'].update(chunk_missing)
+        state['spans'] += [load_span, price_span]
+        rows = dataset_rows(chunk_hourly, hourly_prices(chunk_prices), state['last_ts'], before_ts)
+        if rows:
+            frame = rows_to_frame(rows)
+            state['frame_mb'] = max(state['frame_mb'], frame.memory_usage(deep=True).sum() / 1e6)
+            upsert_frame(frame, zone_root(zone))
+            state['last_ts'] = rows[-1][0]
+            state['rows'] += len(rows)
+
+    with ThreadPoolExecutor(max_workers=max(MAX_WORKERS, 1)) as executor:
+        in_flight = deque()
+        shared_key, shared_future = None, None
+        for chunk_ts, index, start_str, end_str, immutable, before_ts in tasks:
+            state = states[index]
+            if state['stopped']:
+                continue
+            config = state['config']
+            load_key = (config['country'], config['load_key'], frozenset(config['renewable_keys']), start_str, end_str)
+            if load_key != shared_key:
+                shared_key = load_key
+                shared_future = executor.submit(
+                    _timed, fetch_zone_load_chunk, config['country'], start_str, end_str, immutable,
+                    config['load_key'], config['renewable_keys'])
+            price_future = executor.submit(
+                _timed, fetch_price_chunk, config['country'], start_str, end_str, immutable, config['bzn'])
+            in_flight.append((state, start_str, before_ts, shared_future, price_future))
+            if len(in_flight) >= max_in_flight:
+                consume(*in_flight.popleft())
+        shared_future = None
+        while in_flight:
+            consume(*in_flight.popleft())
+
+    results = []
+    for state in states:
+        config = state['config']
+        zone = config['zone']
+        if state['missing']:
+            print(f"[{zone}] Warning: no {', '.join(repr(name) for name in sorted(state['missing']))} "
+                  f"series in total_power of country '{config['country']}'; counted as 0 renewable generation.")
+        spans = state['spans']
+        elapsed = max(end for _, end in spans) - min(start for start, _ in spans) if spans else 0.0
+
+        def zone_requests(record, config=config):
+            params = record['params']
+            if record['endpoint'] == 'price':
+                return params.get('bzn') == config['bzn']
+            return params.get('country') == config['country']
+
+        result = {
+            'zone': zone,
+            'rows': state['rows'],
+            'elapsed_s': elapsed,
+            'rows_per_s': state['rows'] / elapsed if elapsed else 0.0,
+            'frame_mb': state['frame_mb'],
+            'api': CLIENT.stats.summary(zone_requests),
+        }
+        results.append(result)
+        print(f"[{zone}] {state['rows']} new rows in {elapsed:.1f} s ({result['rows_per_s']:.0f} rows/s), "
+              f"largest chunk frame {state['frame_mb']:.2f} MB. API: {CLIENT.stats.format_summary(zone_requests)}")
+
+    peak = _peak_rss_mb()
+    if peak is not None:
+        print(f"Peak memory (RSS): {peak:.0f} MB")
+    return results
+
+def main():
+    zones = configured_zones()
+    if zones:
+        fetch_zones(zones, datetime.datetime.now(datetime.timezone.utc))
+        print(f"Update complete. Zone stores saved under: {ZONE_STORE_DIR.absolute()}")
+        print(f"API usage: {CLIENT.stats.format_summary()}")
+        if not OFFLINE:
+            CACHE.prune_mutable(MUTABLE_CACHE_MAX_AGE)
         return
 
-    mode = 'a' if is_append else 'w'
-    print(f"Writing {len(sorted_hours)} new hourly rows to {OUTPUT_FILE} (Mode: {mode})...")
+    country = "de"
+    
+    # Roll back a chunk that an interrupted run wrote only partially
+    for path in (OUTPUT_FILE, QUARTER_HOURLY_FILE):
+        removed = discard_uncommitted(path)
+        if removed:
+            print(f"Discarded {removed} uncommitted bytes at the end of {path}.")
     
-    with open(OUTPUT_FILE, mode=mode, newline='') as f:
-        writer = csv.writer(f)
-        if not is_append:
-            writer.writerow(['timestamp_unix', 'datetime_utc', 'net_load_mw_avg', 'renewable_generation_mw_avg', 'solar_mw_avg', 'residual_load_mw_avg', 'day_ahead_price_eur_mwh'])
+    # Check if header matches new schema, if not, force restart.
+    expected_columns = ['timestamp_unix', 'datetime_utc', 'net_load_mw_avg', 'renewable_generation_mw_avg', 'solar_mw_avg', 'residual_load_mw_avg', 'day_ahead_price_eur_mwh']
+    
+    watermark = current_watermark(OUTPUT_FILE, expected_columns)
+    if watermark is None:
+        print("Schema changed (adding Solar). Forcing full re-fetch...")
+    elif watermark['version'] < HOURLY_DATA_VERSION:
+        print(f"Hourly prices since the switch to 15-minute products predate version {HOURLY_DATA_VERSION} "
+              f"(mean of the quarter hours). Re-fetching them...")
+        watermark = refetch_since(OUTPUT_FILE, expected_columns, QUARTER_HOUR_PRICES_START, HOURLY_DATA_VERSION)
+    # The 15-minute dataset has the same columns and its own watermark
+    quarter_watermark = current_watermark(QUARTER_HOURLY_FILE, expected_columns)
+
+    last_ts = watermark['last_ts'] if watermark else None
+    quarter_last_ts = quarter_watermark['last_ts'] if quarter_watermark else None
+    
+    if last_ts:
+        # Start from the next hour
+        start_date = datetime.datetime.fromtimestamp(last_ts, tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
+        print(f"Found existing data up to {start_date - datetime.timedelta(hours=1)}.")
+    else:
+        start_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        print("No existing data found. Fetching from start of 2024.")
+
+    if quarter_last_ts:
+        quarter_start_date = datetime.datetime.fromtimestamp(quarter_last_ts, tz=datetime.timezone.utc) + datetime.timedelta(seconds=QUARTER_HOUR)
+    else:
+        quarter_start_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        print("No existing 15-minute data found. Fetching it from start of 2024.")
+    # One fetch serves both datasets; each keeps only rows after its own watermark
+    start_date = min(start_date, quarter_start_date)
         
-        for ts in sorted_hours:
-            load_data = combined_hourly_load[ts]
-            price = prices_hourly[ts]
-            dt = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc).isoformat()
-            writer.writerow([
-                ts, dt, 
-                load_data['net_load'], 
-                load_data['renewables'], 
-                load_data['solar'], 
-                load_data['residual_load'], 
-                price
-            ])
+    end_date = datetime.datetime.now(datetime.timezone.utc)
+
+    # Selection keys based on previous inspection
+    load_key = "Load (incl. self-consumption)"
+    renewable_keys = (
+        "Biomass", 
+        "Hydro Run-of-River", 
+        "Wind offshore", 
+        "Wind onshore", 
+        "Solar", 
+        "Geothermal"
+    )
+
+    hourly_writer = DatasetWriter(OUTPUT_FILE, expected_columns, watermark, STORE_DIR, "hourly", HOUR,
+                                  aggregates_path=AGGREGATES_FILE, version=HOURLY_DATA_VERSION)
+    quarter_writer = DatasetWriter(QUARTER_HOURLY_FILE, expected_columns, quarter_watermark,
+                                   QUARTER_HOURLY_STORE_DIR, "15-minute", QUARTER_HOUR)
+    writers = (hourly_writer, quarter_writer)
+    for writer in writers:
+        writer.recover()
+        writer.seed_gaps()
+
+    # Holes left by earlier runs are re-requested range by range
+    backfill_gaps(writers, country, load_key, renewable_keys, end_date)
+    
+    if start_date >= end_date:
+        print("Data is already up to date.")
+        return
+
+    print(f"Fetching data from {start_date} to {end_date}...")
+
+    chunks = list(month_chunks(start_date, end_date))
+    if MAX_WORKERS > 1:
+        chunk_results = fetch_chunks_concurrently(country, chunks, load_key, renewable_keys, MAX_WORKERS)
+    else:
+        chunk_results = fetch_chunks_sequentially(country, chunks, load_key, renewable_keys)
+
+    # Chunks arrive in chronological order and are committed one by one, so only
+    # the chunks in flight are held in memory. Each chunk contributes the hours
+    # before the next chunk's start (the overlapping boundary hour comes from the
+    # later chunk, as when all chunks were merged into one dict).
+    chunk_starts = [chunk_start_timestamp(start_str) for start_str, _, _ in chunks]
+    for i, (chunk_hourly, chunk_quarter_hourly, chunk_prices, failed) in enumerate(chunk_results):
+        before_ts = chunk_starts[i + 1] if i + 1 < len(chunk_starts) else None
+        # Prices are resampled to each dataset's resolution first, so 15-minute
+        # prices are averaged into the hourly rows instead of being dropped.
+        quarter_writer.commit(chunk_quarter_hourly, quarter_hour_prices(chunk_prices), chunk_starts[i],
+                              before_ts, failed)
+        hourly_writer.commit(chunk_hourly, hourly_prices(chunk_prices), chunk_starts[i],
+                             before_ts, failed, quarter_load=chunk_quarter_hourly)
+    
+    for writer in (quarter_writer, hourly_writer):
+        gaps = writer.gap_summary()
+        if gaps:
+            print(f"Missing {writer.label} rows recorded in the gap index: {gaps}")
+
+    if not hourly_writer.rows_written and not quarter_writer.rows_written:
+        print("No new complete data rows found.")
+        return
 
+    for writer in (quarter_writer, hourly_writer):
+        print(f"Wrote {writer.rows_written} new {writer.label} rows to {writer.csv_path}.")
     print(f"Update complete. File saved: {OUTPUT_FILE.absolute()}")
+    print(f"API usage: {CLIENT.stats.format_summary()}")
+    peak = _peak_rss_mb()
+    if peak is not None:
+        print(f"Peak memory (RSS): {peak:.0f} MB")
+    if not OFFLINE:
+        CACHE.prune_mutable(MUTABLE_CACHE_MAX_AGE)
 
 if __name__ == "__main__":
     main()
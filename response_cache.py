@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("ENERGY_CHARTS_CACHE_DIR", ".cache/energy_charts"))
+
+
+class CacheMiss(Exception):
+    """Raised in offline mode when a response is not in the cache."""
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of raw API responses.
+
+    Each entry is keyed by the SHA-256 of (endpoint, identity) and stored as
+    gzip-compressed JSON together with its HTTP validators. The identity is
+    the request params (endpoint, country, start and end) unless the caller
+    passes another one, e.g. the params without `end` for the requests of a
+    calendar month, whose end moves with every run until the month is
+    closed. Entries flagged immutable (closed months) are served without
+    touching the network; all others are revalidated with a conditional
+    request.
+    """
+    def __init__(self, root=CACHE_DIR):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(endpoint, params):
+        identity = json.dumps({'endpoint': endpoint, 'params': params}, sort_keys=True)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def get(self, endpoint, params, identity=None):
+        path = self._path(self.key(endpoint, params if identity is None else identity))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing or truncated entry: treat as a miss
+            return None
+
+    def put(self, endpoint, params, payload, immutable, etag=None, last_modified=None, identity=None):
+        path = self._path(self.key(endpoint, params if identity is None else identity))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            'endpoint': endpoint,
+            'params': params,
+            'immutable': immutable,
+            'fetched_at': time.time(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'payload': payload,
+        }
+        # Write to a temp file and rename so a crash never leaves a half-written entry
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def fetch(self, client, endpoint, params, immutable, offline=False, identity=None, revalidate=False):
+        """
+        Returns the payload for (endpoint, params), from the cache when possible.
+
+        Immutable entries are returned as-is unless `revalidate` is set (e.g.
+        to look for rows a closed month was missing). Mutable entries are
+        revalidated with their ETag/Last-Modified; on 304 the cached payload
+        is reused. The response replaces the entry of `identity` (default:
+        params). In offline mode the network is never touched and a miss
+        raises CacheMiss.
+        """
+        entry = self.get(endpoint, params, identity)
+        if entry is not None and ((entry['immutable'] and not revalidate) or offline):
+            return entry['payload']
+        if offline:
+            raise CacheMiss(f"{endpoint} {params} not cached")
+
+        if entry is not None and entry['params'] == params:
+            result = client.fetch(endpoint, params, etag=entry.get('etag'), last_modified=entry.get('last_modified'))
+        else:
+            result = client.fetch(endpoint, params)
+        payload = entry['payload'] if result.not_modified else result.payload
+        self.put(endpoint, params, payload, immutable, result.etag, result.last_modified, identity)
+        return payload
+
+    def prune_mutable(self, max_age_seconds):
+        """
+        Deletes mutable entries older than `max_age_seconds`, e.g. those of
+        backfill windows, whose keys rarely repeat (the entry of an open month
+        is rewritten on every run). Returns the number of entries removed.
+        """
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        for path in self.root.glob('*/*.json.gz'):
+            if path.stat().st_mtime >= cutoff:
+                continue
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    immutable = json.load(f).get('immutable', False)
+            except (OSError, ValueError):
+                immutable = False
+            if not immutable:
+                path.unlink()
+                removed += 1
+        return removed
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Above this many rows a scatter plot is sent as binned counts (or a sample) instead of raw points
+RAW_POINT_LIMIT = 5000
+# Number of bins per axis of the 2D histogram
+DEFAULT_BINS = 60
+
+
+def bin_edges(values, bins=DEFAULT_BINS):
+    """Equal-width edges spanning the finite values (a unit range if they are all equal)."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.linspace(0.0, 1.0, bins + 1)
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def _cell_index(df, x, y, x_edges, y_edges):
+    """Flat 2D bin index of every row, -1 for rows with a missing value."""
+    xv = df[x].to_numpy(dtype=np.float64)
+    yv = df[y].to_numpy(dtype=np.float64)
+    nx, ny = len(x_edges) - 1, len(y_edges) - 1
+    # The last bin includes its right edge, as in np.histogram2d
+    xi = np.clip(np.searchsorted(x_edges, xv, side='right') - 1, 0, nx - 1)
+    yi = np.clip(np.searchsorted(y_edges, yv, side='right') - 1, 0, ny - 1)
+    cells = xi * ny + yi
+    cells[~(np.isfinite(xv) & np.isfinite(yv))] = -1
+    return cells
+
+
+def bin_scatter(df, x, y, bins=DEFAULT_BINS, by=None):
+    """
+    Aggregates a scatter of `x` vs `y` into a 2D histogram. Returns one row
+    per non-empty cell with `x_start`, `x_end`, `x_mid`, the same for y, and
+    `count`. With `by`, cells are counted per value of that column on shared
+    edges, which are computed over all rows.
+    """
+    x_edges = bin_edges(df[x], bins)
+    y_edges = bin_edges(df[y], bins)
+    ny = len(y_edges) - 1
+    cells = _cell_index(df, x, y, x_edges, y_edges)
+
+    groups = [(None, np.ones(len(df), dtype=bool))] if by is None else [
+        (value, (df[by] == value).to_numpy()) for value in pd.unique(df[by])]
+    frames = []
+    for value, mask in groups:
+        selected = cells[mask & (cells >= 0)]
+        occupied, counts = np.unique(selected, return_counts=True)
+        xi, yi = occupied // ny, occupied % ny
+        frame = pd.DataFrame({
+            'x_start': x_edges[xi], 'x_end': x_edges[xi + 1],
+            'y_start': y_edges[yi], 'y_end': y_edges[yi + 1],
+            'count': counts,
+        })
+        frame['x_mid'] = (frame['x_start'] + frame['x_end']) / 2
+        frame['y_mid'] = (frame['y_start'] + frame['y_end']) / 2
+        if by is not None:
+            frame[by] = value
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def density_sample(df, x, y, max_points=RAW_POINT_LIMIT, bins=DEFAULT_BINS, seed=0):
+    """
+    Returns at most about `max_points` rows of `df` that keep the shape of the
+    x/y scatter: each 2D cell contributes in proportion to its count, and
+    every non-empty cell keeps at least one row so sparse outliers survive.
+    Deterministic for a given `seed`; rows keep their original order.
+    """
+    if len(df) <= max_points:
+        return df
+    cells = _cell_index(df, x, y, bin_edges(df[x], bins), bin_edges(df[y], bins))
+    valid = np.flatnonzero(cells >= 0)
+    rng = np.random.default_rng(seed)
+    order = valid[rng.permutation(len(valid))]
+    # Rank of every row within its cell in the shuffled order; keep the first `quota`
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    quota = np.maximum(1, np.floor(counts * (max_points / len(valid)))).astype(np.int64)
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+    keep = np.sort(order[rank < np.repeat(quota, counts)])
+    return df.iloc[keep]
+
+
+def chart_payload_bytes(chart):
+    """Size of the Vega-Lite spec (including the inlined data) sent to the browser."""
+    return len(json.dumps(chart.to_dict(), default=str).encode('utf-8'))
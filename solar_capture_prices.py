@@ -1,110 +1,44 @@
 
-import pandas as pd
 from pathlib import Path
 import calendar
 import matplotlib.pyplot as plt
 
+from capture_prices import load_capture_prices
+from monthly_aggregates import filter_report_years, pivot_by_year
+
 # Config
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
 OUTPUT_PDF = Path("solar_capture_prices_outlook.pdf")
 
-def main():
-    if not INPUT_FILE.exists():
+def main(df=None):
+    if df is None and not INPUT_FILE.exists():
         print(f"Error: {INPUT_FILE} not found.")
         return
 
-    print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['year'] = df['datetime'].dt.year
-    df['month'] = df['datetime'].dt.month
-    
-    # Check if 'solar_mw_avg' exists
-    if 'solar_mw_avg' not in df.columns:
-        print("Error: 'solar_mw_avg' column missing. Please run residual_load_with_prices.py first.")
-        return
-
-    # Filter for full years or relevant data (2024, 2025, 2026)
-    df = df[df['year'].isin([2024, 2025, 2026])]
-
     print("Calculating Solar Capture and Baseload Prices...")
 
-    # Calculate Revenue for each hour
-    df['solar_revenue'] = df['solar_mw_avg'] * df['day_ahead_price_eur_mwh']
-
     # --- Monthly Calculation ---
-    # We need: Sum of solar revenue, Sum of solar generation, Mean of price
-    monthly_grouped = df.groupby(['year', 'month']).agg({
-        'solar_mw_avg': 'sum',
-        'solar_revenue': 'sum',
-        'day_ahead_price_eur_mwh': 'mean'
-    }).reset_index()
-    
-    monthly_grouped['pv_price'] = monthly_grouped['solar_revenue'] / monthly_grouped['solar_mw_avg']
-    monthly_grouped['baseload_price'] = monthly_grouped['day_ahead_price_eur_mwh']
-    monthly_grouped['capture_rate'] = monthly_grouped['pv_price'] / monthly_grouped['baseload_price']
-    
-    # --- Positive Price Calculation (Curtailment) ---
-    # Filter where price >= 0
-    df_pos = df[df['day_ahead_price_eur_mwh'] >= 0].copy()
-    monthly_pos = df_pos.groupby(['year', 'month'])[['solar_mw_avg', 'solar_revenue']].sum().reset_index()
-    monthly_pos['pv_price_pos'] = monthly_pos['solar_revenue'] / monthly_pos['solar_mw_avg']
-    
-    # Merge
-    monthly_grouped = pd.merge(monthly_grouped, monthly_pos[['year', 'month', 'pv_price_pos']], on=['year', 'month'], how='left')
+    # PV price = Sum of solar revenue / Sum of solar generation, baseload = mean of price.
+    # Positive-price variant (curtailment) only counts hours with price >= 0.
+    # Rolled up from the monthly aggregates maintained by the fetch script when they are
+    # current, for the most recent REPORT_YEARS years in the data.
+    monthly_grouped = filter_report_years(load_capture_prices(by=['year', 'month'], csv_path=INPUT_FILE, df=df))[0]
 
-    # Pivot to Monthly Table
-    monthly_pivot = monthly_grouped.pivot(index='month', columns='year', values=['pv_price', 'pv_price_pos', 'baseload_price', 'capture_rate'])
-    
-    # Flatten columns
-    def rename_col(col_tuple):
-        metric, year = col_tuple
-        if metric == 'pv_price':
-            return f"PV Price {year}"
-        elif metric == 'pv_price_pos':
-            return f"PV Price (Pos) {year}"
-        elif metric == 'baseload_price':
-            return f"Baseload {year}"
-        elif metric == 'capture_rate':
-            return f"Capture Rate {year}"
-        return f"{metric} {year}"
-
-    monthly_pivot.columns = [rename_col(col) for col in monthly_pivot.columns]
-    monthly_pivot = monthly_pivot.reset_index()
-    
-    monthly_pivot['month_name'] = monthly_pivot['month'].apply(lambda x: calendar.month_abbr[x])
-    
-    # Reorder columns
-    sorted_years = sorted(monthly_grouped['year'].unique())
-    col_order = ['month_name']
-    for y in sorted_years:
-        col_order.append(f"PV Price {y}")
-        col_order.append(f"PV Price (Pos) {y}")
-        col_order.append(f"Baseload {y}")
-        col_order.append(f"Capture Rate {y}")
-        
-    # Filter to existing columns
-    col_order = [c for c in col_order if c in monthly_pivot.columns]
-    monthly_pivot = monthly_pivot[col_order]
+    # Pivot to Monthly Table, grouped by year
+    monthly_pivot = pivot_by_year(monthly_grouped, ['pv_price', 'pv_price_pos', 'baseload_price', 'capture_rate'],
+                                  name="{metric} {year}", year_major=True, labels={
+                                      'pv_price': "PV Price",
+                                      'pv_price_pos': "PV Price (Pos)",
+                                      'baseload_price': "Baseload",
+                                      'capture_rate': "Capture Rate",
+                                  })
+    
+    monthly_pivot.insert(0, 'month_name', monthly_pivot.pop('month').apply(lambda x: calendar.month_abbr[x]))
     
     monthly_pivot.rename(columns={'month_name': 'Month'}, inplace=True)
 
     # --- Yearly Calculation ---
-    yearly_grouped = df.groupby(['year']).agg({
-        'solar_mw_avg': 'sum',
-        'solar_revenue': 'sum',
-        'day_ahead_price_eur_mwh': 'mean'
-    }).reset_index()
-    
-    yearly_grouped['pv_price'] = yearly_grouped['solar_revenue'] / yearly_grouped['solar_mw_avg']
-    yearly_grouped['baseload_price'] = yearly_grouped['day_ahead_price_eur_mwh']
-    yearly_grouped['capture_rate'] = yearly_grouped['pv_price'] / yearly_grouped['baseload_price']
-    
-    # Yearly Positive Calculation
-    yearly_pos = df_pos.groupby(['year'])[['solar_mw_avg', 'solar_revenue']].sum().reset_index()
-    yearly_pos['pv_price_pos'] = yearly_pos['solar_revenue'] / yearly_pos['solar_mw_avg']
-    
-    yearly_grouped = pd.merge(yearly_grouped, yearly_pos[['year', 'pv_price_pos']], on='year', how='left')
+    yearly_grouped = filter_report_years(load_capture_prices(by=['year'], csv_path=INPUT_FILE, df=df))[0]
     
     # Format Yearly Table
     yearly_display = yearly_grouped[['year', 'pv_price', 'pv_price_pos', 'baseload_price', 'capture_rate']].copy()
@@ -0,0 +1,64 @@
+import json
+import os
+
+from hourly_csv import (appending_path, commit_rows, discard_uncommitted, mark_appending, read_watermark,
+                        sidecar_path)
+
+HEADER = ['timestamp_unix', 'price']
+
+
+def write_csv(path, rows):
+    commit_rows(path, HEADER, rows, len(rows), create=True, version=2)
+
+
+def test_discard_uncommitted_truncates_an_interrupted_append(tmp_path):
+    path = tmp_path / "data.csv"
+    write_csv(path, [[3600, 1.0], [7200, 2.0]])
+    committed = path.read_bytes()
+    # An append that stopped before the sidecar moved
+    mark_appending(path, len(committed))
+    with open(path, 'a') as f:
+        f.write("10800,3.0\n14400,")
+
+    assert discard_uncommitted(path) == len("10800,3.0\n14400,")
+    assert path.read_bytes() == committed
+    assert not appending_path(path).exists()
+
+
+def test_discard_uncommitted_keeps_rows_appended_by_hand(tmp_path):
+    path = tmp_path / "data.csv"
+    write_csv(path, [[3600, 1.0], [7200, 2.0]])
+    with open(path, 'a') as f:
+        f.write("10800,3.0\n")
+    edited = path.read_bytes()
+
+    assert discard_uncommitted(path) == 0
+    assert path.read_bytes() == edited
+
+
+def test_discard_uncommitted_keeps_a_committed_append(tmp_path):
+    path = tmp_path / "data.csv"
+    write_csv(path, [[3600, 1.0]])
+    # Stopped after the sidecar moved but before the marker was removed
+    mark_appending(path, 0)
+    committed = path.read_bytes()
+
+    assert discard_uncommitted(path) == 0
+    assert path.read_bytes() == committed
+    assert not appending_path(path).exists()
+
+
+def test_read_watermark_rescans_without_rewriting_the_sidecar(tmp_path):
+    path = tmp_path / "data.csv"
+    write_csv(path, [[3600, 1.0], [7200, 2.0]])
+    with open(path, 'a') as f:
+        f.write("10800,3.0\n")
+    sidecar = sidecar_path(path).read_bytes()
+
+    watermark = read_watermark(path)
+    assert watermark == {'header': HEADER, 'last_ts': 10800, 'row_count': 3, 'version': 2}
+    assert sidecar_path(path).read_bytes() == sidecar
+
+    assert read_watermark(path, persist=True) == watermark
+    meta = json.loads(sidecar_path(path).read_text())
+    assert (meta['last_ts'], meta['row_count'], meta['size_bytes']) == (10800, 3, os.path.getsize(path))
@@ -0,0 +1,155 @@
+import datetime
+
+import pytest
+
+import residual_load_with_prices as fetch
+from energy_charts_client import EnergyChartsClient
+from energy_charts_stub import StubServer
+from hourly_csv import gap_slots, read_gaps
+from hourly_store import read_store
+from response_cache import ResponseCache
+
+HOUR = 3600
+QUARTER_HOUR = 900
+HEADER = ['timestamp_unix', 'datetime_utc', 'net_load_mw_avg', 'renewable_generation_mw_avg', 'solar_mw_avg',
+          'residual_load_mw_avg', 'day_ahead_price_eur_mwh']
+LOAD_KEY = "Load (incl. self-consumption)"
+RENEWABLE_KEYS = ("Biomass", "Hydro Run-of-River", "Wind offshore", "Wind onshore", "Solar", "Geothermal")
+START = datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2024, 4, 1, tzinfo=datetime.timezone.utc)
+
+
+def ts(*args):
+    return int(datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def gap(start, end, step=HOUR):
+    return {'start': start, 'end': end, 'step': step, 'reason': 'missing_row', 'attempts': 0}
+
+
+# --- Prices ---
+
+def test_hourly_prices_pass_hourly_prices_through():
+    prices = {ts(2024, 3, 1, 0): 10.0, ts(2024, 3, 1, 1): 20.0, ts(2024, 3, 1, 3): 40.0}
+    assert fetch.hourly_prices(prices) == prices
+
+
+def test_hourly_prices_average_the_four_quarters():
+    hour = ts(2025, 10, 2, 12)
+    prices = {hour + i * QUARTER_HOUR: price for i, price in enumerate([1.0, 2.0, 3.0, 6.0])}
+    assert fetch.hourly_prices(prices) == {hour: 3.0}
+
+
+def test_hourly_prices_drop_a_quarter_hour_hour_with_only_its_first_quarter():
+    hour = ts(2025, 10, 2, 12)
+    prices = {hour + i * QUARTER_HOUR: 1.0 for i in range(4)}
+    # Only the :00 quarter of the next hour came back
+    prices[hour + HOUR] = 99.0
+    assert fetch.hourly_prices(prices) == {hour: 1.0}
+
+
+def test_quarter_hour_prices_spread_only_hourly_prices():
+    before = fetch.QUARTER_HOUR_PRICES_START - HOUR
+    after = fetch.QUARTER_HOUR_PRICES_START
+    prices = {before: 5.0, after: 1.0, after + QUARTER_HOUR: 2.0}
+    assert fetch.quarter_hour_prices(prices) == {
+        before: 5.0, before + 900: 5.0, before + 1800: 5.0, before + 2700: 5.0, after: 1.0, after + 900: 2.0,
+    }
+
+
+# --- Backfill windows ---
+
+def test_backfill_windows_request_a_month_with_several_runs_as_its_chunk():
+    gaps = [gap(ts(2024, 3, 5, 10), ts(2024, 3, 5, 12)), gap(ts(2024, 3, 20, 6), ts(2024, 3, 20, 6))]
+    assert fetch.backfill_windows(gaps, END) == [
+        ("2024-03-01T00:00Z", "2024-04-01T00:59Z", ts(2024, 3, 1), ts(2024, 3, 20, 6), True, False),
+    ]
+
+
+def test_backfill_windows_merge_close_runs_and_order_newest_first():
+    gaps = [
+        gap(ts(2024, 2, 10, 0), ts(2024, 2, 10, 1)),
+        # Six hours after the previous run: one window
+        gap(ts(2024, 2, 10, 8), ts(2024, 2, 10, 8)),
+        # The quarter-hourly index repeats the hour
+        gap(ts(2024, 2, 10, 8), ts(2024, 2, 10, 8) + 2700, QUARTER_HOUR),
+        gap(ts(2024, 3, 29, 23), ts(2024, 3, 29, 23)),
+    ]
+    assert fetch.backfill_windows(gaps, END) == [
+        ("2024-03-29T23:00Z", "2024-03-29T23:59Z", ts(2024, 3, 29, 23), ts(2024, 3, 29, 23), False, False),
+        ("2024-02-10T00:00Z", "2024-02-10T08:59Z", ts(2024, 2, 10, 0), ts(2024, 2, 10, 8), False, False),
+    ]
+
+
+def test_backfill_windows_split_a_range_at_the_month_boundary():
+    windows = fetch.backfill_windows([gap(ts(2024, 2, 29, 22), ts(2024, 3, 1, 1))], END)
+    assert [window[:2] for window in windows] == [
+        ("2024-03-01T00:00Z", "2024-03-01T01:59Z"),
+        ("2024-02-29T22:00Z", "2024-02-29T23:59Z"),
+    ]
+
+
+# --- Backfill against the stub server ---
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    with StubServer() as server:
+        monkeypatch.setattr(fetch, 'CLIENT', EnergyChartsClient(base_url=server.base_url))
+        monkeypatch.setattr(fetch, 'CACHE', ResponseCache(tmp_path / "cache"))
+        yield server
+
+
+def write_datasets(root, dropped=()):
+    """Hourly and 15-minute writers for February and March 2024 from the stub, without the `dropped` hours."""
+    writers = (
+        fetch.DatasetWriter(root / "hourly.csv", HEADER, None, root / "hourly_store", "hourly", HOUR),
+        fetch.DatasetWriter(root / "quarter.csv", HEADER, None, root / "quarter_store", "15-minute", QUARTER_HOUR),
+    )
+    chunks = list(fetch.month_chunks(START, END))
+    chunk_starts = [fetch.chunk_start_timestamp(start_str) for start_str, _, _ in chunks]
+    for i, (start_str, end_str, immutable) in enumerate(chunks):
+        hourly, quarter = fetch.fetch_load_chunk("de", start_str, end_str, immutable, LOAD_KEY, RENEWABLE_KEYS)
+        prices = fetch.fetch_price_chunk("de", start_str, end_str, immutable)
+        for hour in dropped:
+            hourly.pop(hour, None)
+            for offset in range(0, HOUR, QUARTER_HOUR):
+                quarter.pop(hour + offset, None)
+        before_ts = chunk_starts[i + 1] if i + 1 < len(chunks) else None
+        writers[1].commit(quarter, fetch.quarter_hour_prices(prices), chunk_starts[i], before_ts)
+        writers[0].commit(hourly, fetch.hourly_prices(prices), chunk_starts[i], before_ts, quarter_load=quarter)
+    return writers
+
+
+DROPPED = [ts(2024, 2, 10, 0), ts(2024, 3, 5, 10), ts(2024, 3, 5, 11), ts(2024, 3, 20, 6)]
+
+
+def test_backfill_restores_the_rows_of_a_full_fetch(tmp_path, stub):
+    (tmp_path / "full").mkdir()
+    (tmp_path / "holes").mkdir()
+    full = write_datasets(tmp_path / "full")
+    writers = write_datasets(tmp_path / "holes", DROPPED)
+    assert set(DROPPED) <= gap_slots(read_gaps(writers[0].csv_path)).keys()
+
+    requests = stub.counters['requests']
+    fetch.backfill_gaps(writers, "de", LOAD_KEY, RENEWABLE_KEYS, END)
+    # February's hole gets its own window; March has two and is requested as its month chunk
+    assert stub.counters['requests'] - requests == 4
+
+    for writer, reference in zip(writers, full):
+        assert writer.csv_path.read_bytes() == reference.csv_path.read_bytes()
+        assert gap_slots(read_gaps(writer.csv_path)).keys() == gap_slots(read_gaps(reference.csv_path)).keys()
+        assert read_store(root=writer.store_root).equals(read_store(root=reference.store_root))
+
+
+def test_backfill_sends_at_most_the_request_budget(tmp_path, stub, monkeypatch):
+    writers = write_datasets(tmp_path, DROPPED)
+    monkeypatch.setattr(fetch, 'BACKFILL_MAX_REQUESTS', 1)
+
+    requests = stub.counters['requests']
+    fetch.backfill_gaps(writers, "de", LOAD_KEY, RENEWABLE_KEYS, END)
+    assert stub.counters['requests'] - requests == 2
+
+    # The newest window (March) was filled; February waits for the next run
+    missing = gap_slots(read_gaps(writers[0].csv_path))
+    assert ts(2024, 2, 10, 0) in missing and missing[ts(2024, 2, 10, 0)]['attempts'] == 0
+    assert not {ts(2024, 3, 5, 10), ts(2024, 3, 5, 11), ts(2024, 3, 20, 6)} & missing.keys()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+
+def to_unix(value):
+    """Unix seconds of an int, a datetime or a string pandas can parse (naive values are UTC)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize('UTC')
+    return int(stamp.timestamp())
+
+
+class TimeIndex:
+    """
+    Period boundaries of a frame sorted by `timestamp_unix`, with the `year`
+    and `month` columns of load_hourly (UTC).
+
+    The row offsets of every year-month are computed once with np.searchsorted;
+    a lookup is a binary search over them (or over the timestamps, for date
+    ranges) and returns a positional slice of the frame, df.iloc[start:stop],
+    instead of a boolean mask over all rows. The slices share the frame's
+    data: treat them as read-only and copy before adding columns.
+    """
+
+    def __init__(self, df):
+        timestamps = df['timestamp_unix'].to_numpy(dtype=np.int64)
+        if np.any(timestamps[1:] < timestamps[:-1]):
+            raise ValueError("TimeIndex needs a frame sorted by timestamp_unix")
+        self.df = df
+        self.timestamps = timestamps
+        # Year-month of every row as months since year 0; non-decreasing like the timestamps
+        periods = df['year'].to_numpy(dtype=np.int64) * 12 + df['month'].to_numpy(dtype=np.int64) - 1
+        self.periods = np.unique(periods)
+        self.starts = np.searchsorted(periods, self.periods, side='left')
+        self.stops = np.searchsorted(periods, self.periods, side='right')
+
+    def _rows(self, first, last):
+        """Rows of the periods first..last (months since year 0, inclusive)."""
+        i = np.searchsorted(self.periods, first, side='left')
+        j = np.searchsorted(self.periods, last, side='right')
+        if i >= j:
+            return self.df.iloc[0:0]
+        return self.df.iloc[self.starts[i]:self.stops[j - 1]]
+
+    def month(self, year, month):
+        """Rows of one month."""
+        return self._rows(year * 12 + month - 1, year * 12 + month - 1)
+
+    def year(self, first, last=None):
+        """Rows of the year `first`, or of the years first..last."""
+        return self._rows(first * 12, (first if last is None else last) * 12 + 11)
+
+    def between(self, start=None, end=None):
+        """Rows from `start` (inclusive) to `end` (exclusive): unix seconds, datetimes or date strings."""
+        low = 0 if start is None else np.searchsorted(self.timestamps, to_unix(start), side='left')
+        high = len(self.timestamps) if end is None else np.searchsorted(self.timestamps, to_unix(end), side='left')
+        return self.df.iloc[low:max(low, high)]
+
+    def years(self):
+        """Years present, oldest first."""
+        return [int(year) for year in np.unique(self.periods // 12)]
+
+    def months(self):
+        """(year, month) pairs present, oldest first."""
+        return [(int(period // 12), int(period % 12 + 1)) for period in self.periods]
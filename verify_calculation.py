@@ -1,36 +1,33 @@
 
-import pandas as pd
 from pathlib import Path
 
+from capture_prices import load_capture_prices, load_capture_sums
+from data_loader import load_hourly
+from time_index import TimeIndex
+
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
 
 def main():
     print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['year'] = df['datetime'].dt.year
-    df['month'] = df['datetime'].dt.month
+    df = load_hourly(INPUT_FILE, columns=['solar_mw_avg', 'day_ahead_price_eur_mwh'])
     
-    # Filter for 2024
-    df_2024 = df[df['year'] == 2024].copy()
+    # Rows of 2024
+    df_2024 = TimeIndex(df).year(2024)
     
-    print(f"\n--- Data Quality Investigation 2024 ---")
+    print("\n--- Data Quality Investigation 2024 ---")
     print(f"Total Rows: {len(df_2024)}")
     print(f"Rows with NaN Solar: {df_2024['solar_mw_avg'].isna().sum()}")
     print(f"Rows with NaN Price: {df_2024['day_ahead_price_eur_mwh'].isna().sum()}")
     
-    # Calculate Revenue
-    df_2024['solar_revenue'] = df_2024['solar_mw_avg'] * df_2024['day_ahead_price_eur_mwh']
-    
     # 1. True Capture Price (Volume Weighted)
-    total_revenue = df_2024['solar_revenue'].sum()
-    total_generation = df_2024['solar_mw_avg'].sum()
-    vwap = total_revenue / total_generation
+    yearly = load_capture_sums(by=['year'], csv_path=INPUT_FILE)
+    yearly = yearly[yearly['year'] == 2024].iloc[0]
+    vwap = yearly['solar_revenue'] / yearly['solar_mwh']
     print(f"\n1. True Capture Price (Sum(Rev) / Sum(Gen)): {vwap:.2f} EUR/MWh")
     
     # 2. Simple Average of Monthly PV Prices
-    monthly_grouped = df_2024.groupby('month')[['solar_mw_avg', 'solar_revenue']].sum()
-    monthly_grouped['pv_price'] = monthly_grouped['solar_revenue'] / monthly_grouped['solar_mw_avg']
+    monthly_grouped = load_capture_prices(by=['year', 'month'], csv_path=INPUT_FILE)
+    monthly_grouped = monthly_grouped[monthly_grouped['year'] == 2024].set_index('month')
     
     simple_avg_monthly = monthly_grouped['pv_price'].mean()
     print(f"2. Simple Average of Monthly PV Prices: {simple_avg_monthly:.2f} EUR/MWh")
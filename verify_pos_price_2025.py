@@ -1,25 +1,27 @@
 
-import pandas as pd
 from pathlib import Path
 
+from capture_prices import load_capture_sums
+from data_loader import load_hourly
+from time_index import TimeIndex
+
 INPUT_FILE = Path("hourly_german_residual_load_and_prices_2024_present.csv")
 
 def main():
     print(f"Loading data from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
-    df['datetime'] = pd.to_datetime(df['datetime_utc'])
-    df['year'] = df['datetime'].dt.year
+    df = load_hourly(INPUT_FILE, columns=['solar_mw_avg', 'day_ahead_price_eur_mwh'])
     
-    # Filter for 2025
-    df_2025 = df[df['year'] == 2025].copy()
+    # Rows of 2025
+    df_2025 = TimeIndex(df).year(2025)
     
-    print(f"\n--- Analysis for 2025 ---")
+    print("\n--- Analysis for 2025 ---")
     
-    # Calculate Base Revenue
-    df_2025['solar_revenue'] = df_2025['solar_mw_avg'] * df_2025['day_ahead_price_eur_mwh']
+    # Yearly generation and revenue, all hours and positive-price hours only
+    sums = load_capture_sums(by=['year'], csv_path=INPUT_FILE)
+    sums = sums[sums['year'] == 2025].iloc[0]
     
-    total_gen = df_2025['solar_mw_avg'].sum()
-    total_rev = df_2025['solar_revenue'].sum()
+    total_gen = sums['solar_mwh']
+    total_rev = sums['solar_revenue']
     pv_price = total_rev / total_gen
     
     print(f"Total Generation: {total_gen:,.0f} MWh")
@@ -42,9 +44,8 @@ def main():
     print("-" * 30)
     
     # Calculate Positive Only
-    df_pos = df_2025[df_2025['day_ahead_price_eur_mwh'] >= 0]
-    pos_gen = df_pos['solar_mw_avg'].sum()
-    pos_rev = (df_pos['solar_mw_avg'] * df_pos['day_ahead_price_eur_mwh']).sum()
+    pos_gen = sums['solar_mwh_pos']
+    pos_rev = sums['solar_revenue_pos']
     
     # Note: Logic in previous script was: sum(positive_revenue) / sum(positive_generation)
     # But usually "curtailment" means you lose the generation volume too?
@@ -0,0 +1,55 @@
+import os
+
+# Production types summed as renewable generation (names as returned by `total_power`)
+DEFAULT_RENEWABLE_KEYS = frozenset({
+    "Biomass",
+    "Hydro Run-of-River",
+    "Wind offshore",
+    "Wind onshore",
+    "Solar",
+    "Geothermal",
+})
+DEFAULT_LOAD_KEY = "Load"
+
+# Bidding zones for the multi-country fetch. `country` selects the `total_power`
+# series, `bzn` the day-ahead price zone. Load and renewables are national, so
+# DK1 and DK2 share Denmark's load with their own prices. Production type names
+# differ between countries; override `load_key` / `renewable_keys` per zone
+# (check the names with inspect_api.py).
+ZONES = {
+    'de': {'country': 'de', 'bzn': 'DE-LU', 'load_key': "Load (incl. self-consumption)"},
+    'fr': {'country': 'fr', 'bzn': 'FR'},
+    'nl': {'country': 'nl', 'bzn': 'NL'},
+    'be': {'country': 'be', 'bzn': 'BE'},
+    'at': {'country': 'at', 'bzn': 'AT'},
+    'ch': {'country': 'ch', 'bzn': 'CH'},
+    'cz': {'country': 'cz', 'bzn': 'CZ'},
+    'pl': {'country': 'pl', 'bzn': 'PL'},
+    'dk1': {'country': 'dk', 'bzn': 'DK1'},
+    'dk2': {'country': 'dk', 'bzn': 'DK2'},
+}
+
+# Comma-separated zones to fetch in multi-country mode, e.g. "de,fr,nl,dk1"
+ZONES_ENV = "ENERGY_CHARTS_ZONES"
+
+
+class MissingProductionType(Exception):
+    """A `total_power` payload has no series for a zone's configured load key."""
+
+
+def zone_config(zone):
+    """Fetch settings of a zone with the defaults filled in. Raises KeyError for unknown zones."""
+    config = ZONES[zone]
+    return {
+        'zone': zone,
+        'country': config['country'],
+        'bzn': config['bzn'],
+        'load_key': config.get('load_key', DEFAULT_LOAD_KEY),
+        'renewable_keys': set(config.get('renewable_keys', DEFAULT_RENEWABLE_KEYS)),
+    }
+
+
+def configured_zones():
+    """Zones listed in ENERGY_CHARTS_ZONES, in the given order (empty if unset)."""
+    value = os.environ.get(ZONES_ENV, "")
+    return [z.strip().lower() for z in value.split(',') if z.strip()]